@@ -0,0 +1,164 @@
+# admission.py
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable
+
+# Admission priorities: lower is admitted first
+PRIORITY_METADATA = 0
+PRIORITY_QUERY = 1
+PRIORITY_HEAVY = 2
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight work: concurrent `do(key, fn)` calls with the same key share one
+    execution of `fn`, and every caller gets its result (or its exception). Nothing is kept afterwards.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {"executions": 0, "coalesced": 0, "in_flight": 0, "coalesced_wait_seconds": 0.0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> tuple[Any, bool]:
+        """Return `fn()`'s result and whether it was shared with an execution already in flight."""
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+                self.stats["executions"] += 1
+                self.stats["in_flight"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            started = time.perf_counter()
+            try:
+                return future.result(), True
+            finally:
+                with self._lock:
+                    self.stats["coalesced_wait_seconds"] += time.perf_counter() - started
+
+        try:
+            value = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value, False
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+                self.stats["in_flight"] -= 1
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return self.stats | {"coalesced_wait_seconds": round(self.stats["coalesced_wait_seconds"], 3)}
+
+
+class Overloaded(RuntimeError):
+    """The admission queue is full. `retry_after` is a hint in seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Caps concurrently running calls at `max_concurrency`. Callers over the cap wait in a priority
+    queue, where lower priorities go first and callers are FIFO within a priority. With `max_queue`
+    callers already waiting, new ones are rejected with Overloaded and a retry-after estimate from
+    the recent service time. Lives on one event loop; not thread-safe.
+    """
+
+    def __init__(self, max_concurrency: int = 8, max_queue: int = 64):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.running = 0
+        self._queue: list[tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._service_seconds: float | None = None
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+
+    def retry_after(self) -> float:
+        service = self._service_seconds or 1.0
+        return max(1.0, round(service * (self.queue_depth() + 1) / self.max_concurrency, 1))
+
+    def queue_depth(self, priority: int | None = None) -> int:
+        return sum(1 for p, _, future in self._queue if not future.done() and (priority is None or p == priority))
+
+    async def acquire(self, priority: int = PRIORITY_QUERY) -> float:
+        """Wait for a slot. Returns the seconds spent queued; raises Overloaded if the queue is full."""
+        if self.running < self.max_concurrency and not self.queue_depth():
+            self.running += 1
+            self.stats["admitted"] += 1
+            return 0.0
+        if self.queue_depth() >= self.max_queue:
+            self.stats["rejected"] += 1
+            retry_after = self.retry_after()
+            raise Overloaded(
+                f"Server busy: {self.running} calls running and {self.queue_depth()} queued. "
+                f"Retry in about {retry_after:.0f}s.",
+                retry_after,
+            )
+
+        started = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._sequence), future))
+        self.stats["queued"] += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Admitted just as the caller gave up: pass the slot on
+                self.release()
+            raise
+        waited = time.perf_counter() - started
+        self.stats["admitted"] += 1
+        self.stats["wait_seconds"] += waited
+        self.stats["max_wait_seconds"] = max(self.stats["max_wait_seconds"], waited)
+        return waited
+
+    def try_acquire(self, slots: int = 1) -> int:
+        """Take up to `slots` free slots without waiting, and none while callers are queued. Returns how many."""
+        if self.queue_depth():
+            return 0
+        granted = max(0, min(slots, self.max_concurrency - self.running))
+        self.running += granted
+        self.stats["admitted"] += granted
+        return granted
+
+    def release(self, service_seconds: float | None = None):
+        if service_seconds is not None:
+            # Exponentially weighted, for the retry-after estimate
+            previous = self._service_seconds
+            self._service_seconds = service_seconds if previous is None else 0.8 * previous + 0.2 * service_seconds
+        while self._queue:
+            _, _, future = heapq.heappop(self._queue)
+            if not future.done():
+                # The slot passes straight to the next caller, so `running` is unchanged
+                future.set_result(None)
+                return
+        self.running -= 1
+
+    def snapshot(self) -> dict[str, Any]:
+        return self.stats | {
+            "running": self.running,
+            "queue_depth": self.queue_depth(),
+            "queue_depth_metadata": self.queue_depth(PRIORITY_METADATA),
+            "queue_depth_query": self.queue_depth(PRIORITY_QUERY),
+            "queue_depth_heavy": self.queue_depth(PRIORITY_HEAVY),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "wait_seconds": round(self.stats["wait_seconds"], 3),
+            "max_wait_seconds": round(self.stats["max_wait_seconds"], 3),
+            "service_seconds": round(self._service_seconds, 4) if self._service_seconds is not None else None,
+        }
@@ -0,0 +1,114 @@
+# benchmarks/admission_load.py
+"""
+Load test for request coalescing and admission control, through the MCP tool
+handlers against a fake warehouse that sleeps `--latency` seconds per statement.
+
+  coalescing  N clients ask the identical question at once (result cache off):
+              callers admitted together share one statement, so the warehouse
+              runs it at most clients / concurrency times instead of N
+  priority    a burst of joins fills the warehouse, then catalog lookups arrive:
+              the lookups should be admitted ahead of the queued joins
+  backpressure a burst larger than the queue: the excess is rejected at once
+              with a retry-after hint instead of waiting
+
+    python benchmarks/admission_load.py --concurrency 2 --queue 6 --latency 0.3
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_databricks import install
+
+MONTHLY_TOTALS = {
+    "table_name": "item_basics",
+    "columns": ["category", "COUNT(*) AS lots", "SUM(sale_price) AS total"],
+    "where_clause": "auction_date >= '2024-05-01'",
+}
+
+
+def join_call(i: int) -> dict:
+    return {
+        "select_columns": ["item_basics.state", "MAX(bid_amount) AS top_bid"],
+        "from_table": "item_basics",
+        "join_tables": ["item_account_bidding"],
+        "where_clause": f"bid_amount > {i}",
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=2, help="WAREHOUSE_MAX_CONCURRENCY")
+    parser.add_argument("--queue", type=int, default=6, help="WAREHOUSE_MAX_QUEUE")
+    parser.add_argument("--latency", type=float, default=0.3)
+    return parser.parse_args()
+
+
+async def timed(coro) -> tuple[float, str | None]:
+    started = time.perf_counter()
+    try:
+        await coro
+        return time.perf_counter() - started, None
+    except Exception as e:
+        return time.perf_counter() - started, str(e)
+
+
+async def run(args, warehouse) -> dict:
+    import databricks_mcp as server
+
+    mcp = server.mcp
+    server.start_warmup()
+    while not server.metadata_store.ready:
+        await asyncio.sleep(0.05)
+    await mcp.call_tool("query_joined_views", join_call(-1))
+    warehouse.latency = args.latency
+    report = {}
+
+    warehouse.reset_counters()
+    results = await asyncio.gather(*(timed(mcp.call_tool("query_single_view", MONTHLY_TOTALS)) for _ in range(args.clients)))
+    report["coalescing"] = {
+        "clients": args.clients,
+        "warehouse_statements": len(warehouse.statements),
+        "max_seconds": round(max(seconds for seconds, _ in results), 3),
+        "flight": server.query_flight.snapshot(),
+    }
+
+    joins = [asyncio.create_task(timed(mcp.call_tool("query_joined_views", join_call(i)))) for i in range(args.queue)]
+    await asyncio.sleep(0.01)
+    lookups = [asyncio.create_task(timed(mcp.call_tool("list_table_relationships", {"source_table": "item_basics"})))
+               for _ in range(2)]
+    join_times = [seconds for seconds, _ in await asyncio.gather(*joins)]
+    lookup_times = [seconds for seconds, _ in await asyncio.gather(*lookups)]
+    report["priority"] = {
+        "queued_joins": args.queue,
+        "lookup_max_seconds": round(max(lookup_times), 3),
+        "join_max_seconds": round(max(join_times), 3),
+    }
+
+    burst = args.concurrency + args.queue + 4
+    results = await asyncio.gather(*(timed(mcp.call_tool("query_joined_views", join_call(1000 + i))) for i in range(burst)))
+    rejected = [(seconds, error) for seconds, error in results if error and "Server busy" in error]
+    report["backpressure"] = {
+        "burst": burst,
+        "rejected": len(rejected),
+        "rejected_max_seconds": round(max((s for s, _ in rejected), default=0), 4),
+        "example": rejected[0][1] if rejected else None,
+    }
+    report["admission"] = {w: a.snapshot() for w, a in server.warehouse_executor.admission.items()}
+    return report
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    os.environ.setdefault("DATABRICKS_POOL_SIZE", str(max(args.concurrency, 2)))
+    os.environ.setdefault("WAREHOUSE_MAX_CONCURRENCY", str(args.concurrency))
+    os.environ.setdefault("WAREHOUSE_MAX_QUEUE", str(args.queue))
+    os.environ.setdefault("RESULT_CACHE_TTL_SECONDS", "0")
+    os.environ.setdefault("RESULT_SUBSUMPTION", "0")
+    warehouse = install()
+    print(json.dumps(asyncio.run(run(args, warehouse)), indent=2))
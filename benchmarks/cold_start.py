@@ -0,0 +1,180 @@
+# benchmarks/cold_start.py
+"""
+Cold-start benchmark: launches the server as a fresh process per run against
+a fake warehouse and times what a desktop client waits for.
+
+  import    `import databricks_mcp` in a bare interpreter without credentials,
+            and which heavy modules that pulled in
+  stdio     spawn -> initialize -> tools/list -> first list_available_views
+  http      spawn -> port accepting -> SSE initialize -> tools/list -> first call
+
+Every run is a new process, so nothing is warm except the OS file cache and a
+metadata snapshot left on disk by an unmeasured priming run.
+
+    python benchmarks/cold_start.py --runs 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+HEAVY_MODULES = ("sqlglot", "pyarrow", "pandas", "fastapi", "databricks.sql")
+IMPORT_PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import databricks_mcp
+seconds = time.perf_counter() - started
+print(json.dumps({{"seconds": seconds, "heavy_modules": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--serve", choices=("stdio", "http"), help=argparse.SUPPRESS)
+    parser.add_argument("--directory", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def serve(args):
+    """Child process: the server on a fake warehouse, reporting its own import time on stderr."""
+    from benchmarks.fake_databricks import FakeWarehouse, install
+
+    install(FakeWarehouse(directory=args.directory))
+    started = time.perf_counter()
+    import databricks_mcp as server
+    print(json.dumps({"import_seconds": time.perf_counter() - started}), file=sys.stderr, flush=True)
+    if args.serve == "http":
+        import uvicorn
+
+        server.mcp.settings.port = args.port
+        uvicorn.run(server.http_app(), host="127.0.0.1", port=args.port, log_level="warning")
+    else:
+        server.mcp.run(transport="stdio")
+
+
+def summarize(runs: list[dict[str, float]]) -> dict[str, float]:
+    return {key: round(statistics.median(run[key] for run in runs), 4) for key in runs[0]}
+
+
+def measure_import(runs: int) -> dict:
+    env = {k: v for k, v in os.environ.items() if not k.startswith("DATABRICKS_")}
+    env["METADATA_SNAPSHOT_PATH"] = os.path.join(tempfile.mkdtemp(), "absent.sqlite")
+    samples, heavy = [], []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        probe = json.loads(output.strip().splitlines()[-1])
+        samples.append({"import_seconds": probe["seconds"], "process_seconds": time.perf_counter() - started})
+        heavy = probe["heavy_modules"]
+    return summarize(samples) | {"heavy_modules_loaded": heavy, "credentials": "none"}
+
+
+async def session_timings(session, started: float) -> dict[str, float]:
+    await session.initialize()
+    timings = {"initialize_seconds": time.perf_counter() - started}
+    await session.list_tools()
+    timings["list_tools_seconds"] = time.perf_counter() - started
+    await session.call_tool("list_available_views", {})
+    timings["first_call_seconds"] = time.perf_counter() - started
+    return timings
+
+
+def child_command(mode: str, directory: str, port: int = 0) -> list[str]:
+    return [sys.executable, os.path.abspath(__file__), "--serve", mode, "--directory", directory, "--port", str(port)]
+
+
+def child_import_seconds(log_path: str) -> float | None:
+    with open(log_path) as log:
+        for line in log:
+            if line.startswith('{"import_seconds"'):
+                return json.loads(line)["import_seconds"]
+    return None
+
+
+async def measure_stdio(directory: str) -> dict[str, float]:
+    from mcp import ClientSession
+    from mcp.client.stdio import StdioServerParameters, stdio_client
+
+    params = StdioServerParameters(command=sys.executable, args=child_command("stdio", directory)[1:], env=dict(os.environ), cwd=ROOT)
+    with tempfile.NamedTemporaryFile("w+", suffix=".log", delete=False) as errlog:
+        started = time.perf_counter()
+        async with stdio_client(params, errlog=errlog) as (read, write):
+            async with ClientSession(read, write) as session:
+                timings = await session_timings(session, started)
+    return timings | {"server_import_seconds": child_import_seconds(errlog.name)}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def measure_http(directory: str) -> dict[str, float]:
+    from mcp import ClientSession
+    from mcp.client.sse import sse_client
+
+    port = free_port()
+    with tempfile.NamedTemporaryFile("w+", suffix=".log", delete=False) as errlog:
+        started = time.perf_counter()
+        process = subprocess.Popen(child_command("http", directory, port), cwd=ROOT, stdout=subprocess.DEVNULL, stderr=errlog)
+        try:
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError(f"HTTP server exited early; see {errlog.name}")
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=0.05).close()
+                    break
+                except OSError:
+                    await asyncio.sleep(0.01)
+            listening = time.perf_counter() - started
+            async with sse_client(f"http://127.0.0.1:{port}/sse") as (read, write):
+                async with ClientSession(read, write) as session:
+                    timings = await session_timings(session, started)
+        finally:
+            # uvicorn waits for open SSE streams on SIGTERM; nothing here needs a clean shutdown
+            process.kill()
+            process.wait()
+    return {"listening_seconds": listening} | timings | {"server_import_seconds": child_import_seconds(errlog.name)}
+
+
+async def main(args):
+    from benchmarks.fake_databricks import FakeWarehouse
+
+    # Built once up front so server processes reuse it instead of building their own
+    directory = FakeWarehouse().directory
+    os.environ["METADATA_SNAPSHOT_PATH"] = os.path.join(directory, "metadata_snapshot.sqlite")
+    os.environ["METADATA_REFRESH_SECONDS"] = "3600"
+
+    # Priming run: writes the metadata snapshot a returning desktop session would find on disk
+    await measure_stdio(directory)
+    deadline = time.monotonic() + 30
+    while not os.path.exists(os.environ["METADATA_SNAPSHOT_PATH"]) and time.monotonic() < deadline:
+        await measure_stdio(directory)
+
+    report = {"import": measure_import(args.runs)}
+    report["stdio"] = summarize([await measure_stdio(directory) for _ in range(args.runs)])
+    report["http"] = summarize([await measure_http(directory) for _ in range(args.runs)])
+    report["runs"] = args.runs
+    return report
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.serve:
+        serve(args)
+    else:
+        print(json.dumps(asyncio.run(main(args)), indent=2))
@@ -0,0 +1,91 @@
+# benchmarks/column_index_bench.py
+"""
+Time typo suggestions and column search on a synthetic catalog the size of
+the gold layer: difflib.get_close_matches over every column name (the
+original approach) against the trigram ColumnIndex.
+
+    python benchmarks/column_index_bench.py --views 400 --columns 40
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from difflib import get_close_matches
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from column_index import ColumnIndex
+
+SUBJECTS = ["item", "lot", "bid", "buyer", "seller", "account", "auction", "invoice", "payment", "region",
+            "category", "asset", "title", "inspection", "transport", "fee", "tax", "listing", "watch", "offer",
+            "equipment", "vehicle", "make", "model", "serial", "odometer", "engine", "hours", "location", "yard",
+            "consignor", "contract", "reserve", "premium", "refund", "dispute", "shipping", "photo", "marketing", "campaign"]
+MEASURES = ["id", "name", "amount", "count", "date", "status", "type", "price", "total", "code",
+            "city", "state", "score", "flag", "usd", "pct", "rank", "time", "source", "notes",
+            "year", "month", "zip", "email", "phone", "url", "desc", "min", "max", "avg"]
+
+
+def synthetic_catalog(views: int, columns: int, seed: int = 7) -> dict[str, list[dict[str, str]]]:
+    rng = random.Random(seed)
+    catalog = {}
+    for v in range(views):
+        names = set()
+        while len(names) < columns:
+            names.add(f"{rng.choice(SUBJECTS)}_{rng.choice(MEASURES)}" + (f"_{rng.randint(1, 30)}" if rng.random() < 0.5 else ""))
+        catalog[f"view_{v:03d}"] = [
+            {"column_name": name, "data_type": "STRING", "description": f"The {name.replace('_', ' ')} of the record"}
+            for name in sorted(names)
+        ]
+    return catalog
+
+
+def typo(name: str, rng: random.Random) -> str:
+    i = rng.randrange(len(name))
+    return name[:i] + name[i + 1:] if rng.random() < 0.5 else name[:i] + rng.choice("aeiost") + name[i:]
+
+
+def per_call_ms(func, inputs) -> float:
+    started = time.perf_counter()
+    for value in inputs:
+        func(value)
+    return (time.perf_counter() - started) * 1000 / len(inputs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--views", type=int, default=400)
+    parser.add_argument("--columns", type=int, default=40)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+
+    catalog = synthetic_catalog(args.views, args.columns)
+    started = time.perf_counter()
+    index = ColumnIndex(catalog)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    rng = random.Random(11)
+    all_names = sorted({c["column_name"] for columns in catalog.values() for c in columns})
+    misspelled = [typo(rng.choice(all_names), rng) for _ in range(args.lookups)]
+    one_view = "view_000"
+    view_names = [c["column_name"] for c in catalog[one_view]]
+
+    print(json.dumps({
+        "views": args.views,
+        "columns": len(index),
+        "distinct_names": len(all_names),
+        "index_build_ms": round(build_ms, 1),
+        "per_lookup_ms": {
+            "difflib_all_columns": round(per_call_ms(lambda n: get_close_matches(n, all_names, n=3), misspelled[:20]), 3),
+            "index_suggest_all_columns": round(per_call_ms(lambda n: index.suggest(n), misspelled), 3),
+            "difflib_one_view": round(per_call_ms(lambda n: get_close_matches(n, view_names, n=3), misspelled), 3),
+            "index_suggest_one_view": round(per_call_ms(lambda n: index.suggest(n, [one_view]), misspelled), 3),
+            "index_views_for": round(per_call_ms(index.views_for, all_names[:args.lookups]), 4),
+            "index_search": round(per_call_ms(lambda n: index.search(n, limit=20), misspelled), 3),
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/concurrency_load.py
+"""
+Load test: N simulated clients call a query tool at once through the MCP tool
+handlers against a fake warehouse that sleeps `--latency` seconds per statement.
+With non-blocking handlers the batch should finish in about max(latency),
+not sum(latency).
+
+    python benchmarks/concurrency_load.py --clients 8 --latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_databricks import install
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.5)
+    return parser.parse_args()
+
+
+async def call_clients(mcp, clients: int, offset: int) -> float:
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        mcp.call_tool("query_single_view", {
+            "table_name": "item_basics",
+            "columns": ["state", "COUNT(*) AS lots"],
+            # Distinct filters so no call is answered by the result cache
+            "where_clause": f"sale_price > {offset + i}",
+        })
+        for i in range(clients)
+    ))
+    return time.perf_counter() - started
+
+
+async def run(args) -> dict:
+    import databricks_mcp
+
+    databricks_mcp.start_warmup()
+    while not databricks_mcp.metadata_store.ready:
+        await asyncio.sleep(0.05)
+    # Warm the pool and the column cache before injecting latency
+    await call_clients(databricks_mcp.mcp, args.clients, offset=-10_000)
+    warehouse.latency = args.latency
+
+    started = time.perf_counter()
+    for i in range(args.clients):
+        await databricks_mcp.mcp.call_tool("query_single_view", {
+            "table_name": "item_basics",
+            "columns": ["state", "COUNT(*) AS lots"],
+            "where_clause": f"sale_price > {20_000 + i}",
+        })
+    sequential = time.perf_counter() - started
+
+    concurrent = await call_clients(databricks_mcp.mcp, args.clients, offset=0)
+    return {
+        "clients": args.clients,
+        "latency_seconds": args.latency,
+        "sum_latency_seconds": round(args.clients * args.latency, 3),
+        "sequential_seconds": round(sequential, 3),
+        "concurrent_seconds": round(concurrent, 3),
+        "concurrent_over_max_latency": round(concurrent / args.latency, 2),
+        "executor": databricks_mcp.warehouse_executor.stats,
+    }
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    os.environ.setdefault("DATABRICKS_POOL_SIZE", str(args.clients))
+    os.environ.setdefault("RESULT_CACHE_TTL_SECONDS", "0")
+    warehouse = install()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
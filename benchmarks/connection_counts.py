@@ -0,0 +1,74 @@
+# benchmarks/connection_counts.py
+"""
+Run every tool once against the fake connector and report how many warehouse
+connections and statements each call cost.
+
+    python benchmarks/connection_counts.py
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_databricks import install
+
+warehouse = install()
+
+import databricks_mcp  # noqa: E402  (needs the fake installed first)
+
+TOOL_CALLS = [
+    ("list_available_views", {}),
+    ("get_table_views_metadata", {"table_views": ["item_basics", "item_account_bidding", "people_master"]}),
+    ("list_table_relationships", {"source_table": "item_account_bidding"}),
+    ("plan_join", {"from_table": "item_basics", "join_tables": ["item_account_bidding", "people_master"]}),
+    ("query_single_view", {
+        "table_name": "item_basics",
+        "columns": ["state", "COUNT(*) AS lots", "SUM(sale_price) AS total"],
+        "where_clause": "category = 'Construction'",
+    }),
+    ("query_joined_views", {
+        "select_columns": ["item_basics.state", "MAX(bid_amount) AS top_bid"],
+        "from_table": "item_basics",
+        "join_tables": ["item_account_bidding"],
+    }),
+    ("fetch_recent_query_context", {}),
+]
+
+
+def main():
+    # Let the background metadata snapshot load so tools answer from it
+    databricks_mcp.start_warmup()
+    deadline = time.monotonic() + 30
+    while not databricks_mcp.metadata_store.ready and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    report = []
+    for name, arguments in TOOL_CALLS:
+        pool_before = databricks_mcp.connection_pool.snapshot()
+        warehouse.reset_counters()
+        result = getattr(databricks_mcp, name)(**arguments)
+        pool_after = databricks_mcp.connection_pool.snapshot()
+        report.append({
+            "tool": name,
+            "connections_opened": warehouse.connections_opened,
+            "checkouts": pool_after["checkouts"] - pool_before["checkouts"],
+            "statements": len(warehouse.statements),
+            "ok": not (isinstance(result, str) and result.startswith(("Error", "Invalid"))),
+        })
+
+    # Expire every warehouse session: the next call should reconnect transparently
+    warehouse.expire_sessions()
+    result = databricks_mcp.query_single_view("people_master", ["state", "COUNT(*) AS people"])
+    reconnect = {"ok": not result.startswith("Error"), "reconnects": databricks_mcp.connection_pool.snapshot()["reconnects"]}
+
+    print(json.dumps({
+        "tools": report,
+        "reconnect_after_expiry": reconnect,
+        "pool": databricks_mcp.connection_pool.snapshot(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
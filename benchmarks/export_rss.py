@@ -0,0 +1,119 @@
+# benchmarks/export_rss.py
+"""
+Peak memory of export_query as the exported row count grows. Each export
+runs in a fresh process against a prebuilt fake warehouse and reports its
+peak RSS growth over the idle, imported server. Streaming exports should
+stay flat; the inline query path (query_single_view with the same limit,
+which materializes the result) is measured alongside for contrast.
+
+    python benchmarks/export_rss.py --rows 25000 100000 400000 --formats csv parquet xlsx
+"""
+import argparse
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+COLUMNS = ["item_id", "item_name", "category", "state", "auction_date", "sale_price", "seller_account_id"]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[25_000, 100_000, 400_000])
+    parser.add_argument("--formats", nargs="+", default=["csv", "parquet", "xlsx"])
+    parser.add_argument("--no-inline", action="store_true", help="skip the inline comparison")
+    parser.add_argument("--child", choices=("export", "inline"), help=argparse.SUPPRESS)
+    parser.add_argument("--directory", help=argparse.SUPPRESS)
+    parser.add_argument("--format", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(args):
+    from benchmarks.fake_databricks import FakeWarehouse, install
+
+    install(FakeWarehouse(directory=args.directory))
+    os.environ["EXPORT_DIR"] = tempfile.mkdtemp(prefix="exports_")
+    import databricks_mcp as server
+
+    # Load metadata and the deferred imports before the baseline
+    server.export_query("item_basics", COLUMNS, limit=10, file_format=args.format or "csv")
+    server.query_single_view("item_basics", COLUMNS, limit=10)
+    gc.collect()
+    before = current_rss_mb()
+
+    limit = args.rows[0]
+    started = time.perf_counter()
+    if args.child == "export":
+        result = server.export_query("item_basics", COLUMNS, limit=limit, file_format=args.format)
+        if "error" in result:
+            raise SystemExit(result["error"])
+        rows, size = result["rows"], result["bytes"]
+    else:
+        output = server.query_single_view("item_basics", COLUMNS, limit=limit, output_format="csv")
+        rows, size = output.count("\n"), len(output.encode())
+    seconds = time.perf_counter() - started
+    print(json.dumps({
+        "rows": rows,
+        "bytes": size,
+        "seconds": round(seconds, 2),
+        "rss_before_mb": round(before, 1),
+        "peak_growth_mb": round(max(peak_rss_mb() - before, 0), 1),
+    }))
+
+
+def run_child(directory: str, mode: str, rows: int, file_format: str | None = None) -> dict:
+    command = [sys.executable, os.path.abspath(__file__), "--child", mode, "--directory", directory, "--rows", str(rows)]
+    if file_format:
+        command += ["--format", file_format]
+    env = dict(os.environ, METADATA_SNAPSHOT="0", RESULT_CACHE_TTL_SECONDS="0", WAREHOUSE_REQUEST_TIMEOUT_SECONDS="600")
+    output = subprocess.run(command, cwd=ROOT, env=env, capture_output=True, text=True)
+    if output.returncode:
+        raise RuntimeError(output.stderr.strip().splitlines()[-1])
+    return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main(args):
+    from benchmarks.fake_databricks import FakeWarehouse
+
+    started = time.perf_counter()
+    directory = FakeWarehouse(item_rows=max(args.rows), bids_per_item=1).directory
+    report = {"warehouse_build_seconds": round(time.perf_counter() - started, 1), "exports": {}, "inline": {}}
+    for file_format in args.formats:
+        report["exports"][file_format] = {rows: run_child(directory, "export", rows, file_format) for rows in args.rows}
+    if not args.no_inline:
+        report["inline"] = {rows: run_child(directory, "inline", rows) for rows in args.rows}
+    growth = {
+        file_format: [runs[rows]["peak_growth_mb"] for rows in args.rows]
+        for file_format, runs in report["exports"].items()
+    }
+    # Flat: the largest export grows peak RSS by less than twice the smallest, plus a small allowance
+    report["flat"] = {file_format: values[-1] <= 2 * values[0] + 16 for file_format, values in growth.items()}
+    return report
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.child:
+        child(args)
+    else:
+        report = main(args)
+        print(json.dumps(report, indent=2))
+        if not all(report["flat"].values()):
+            sys.exit(1)
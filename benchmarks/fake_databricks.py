@@ -0,0 +1,473 @@
+# benchmarks/fake_databricks.py
+"""
+Local stand-in for `databricks.sql`, backed by SQLite.
+Statements are transpiled from the Databricks dialect with sqlglot, and the
+`main.prod_gold` / `main.ai_data_assets` schemas are attached as SQLite databases.
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any
+
+import sqlglot
+from sqlglot import exp
+
+try:
+    from databricks.sql.types import Row
+except ImportError:  # connector not installed: plain tuples are close enough
+    Row = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+SCHEMAS = ("prod_gold", "ai_data_assets")
+
+VIEWS = {
+    "item_basics": [
+        ("item_id", "BIGINT", "Unique lot identifier", "100001"),
+        ("item_name", "STRING", "Lot title shown on the listing", "2012 John Deere 310K Backhoe"),
+        ("category", "STRING", "Top level equipment category", "Construction"),
+        ("state", "STRING", "State the item is located in", "KS"),
+        ("auction_date", "DATE", "Date the auction closed", "2024-05-01"),
+        ("sale_price", "DOUBLE", "Winning bid amount in USD", "45250.0"),
+        ("seller_account_id", "BIGINT", "Account id of the seller", "5001"),
+    ],
+    "item_account_bidding": [
+        ("item_id", "BIGINT", "Lot the bid was placed on", "100001"),
+        ("account_id", "BIGINT", "Bidder account id", "7001"),
+        ("bid_amount", "DOUBLE", "Bid amount in USD", "1200.0"),
+        ("bid_time", "TIMESTAMP", "When the bid was placed", "2024-04-30 18:22:01"),
+        ("is_winning_bid", "BOOLEAN", "True for the bid that won the lot", "false"),
+    ],
+    "people_master": [
+        ("account_id", "BIGINT", "Account id", "7001"),
+        ("person_name", "STRING", "Account holder name", "Pat Smith"),
+        ("state", "STRING", "Account billing state", "MO"),
+        ("email", "STRING", "Contact email", "pat@example.com"),
+    ],
+}
+
+# Present in prod_gold but missing from the catalog, to exercise the SHOW COLUMNS fallback
+UNCATALOGED_VIEWS = {
+    "auction_events": [
+        ("auction_id", "BIGINT", "Auction identifier", "9001"),
+        ("auction_date", "DATE", "Date the auction closed", "2024-05-01"),
+        ("region", "STRING", "Sales region", "Midwest"),
+    ],
+}
+
+RELATIONSHIPS = [
+    ("item_account_bidding", "item_id", "item_basics", "item_id", "many_to_one"),
+    ("item_account_bidding", "account_id", "people_master", "account_id", "many_to_one"),
+    ("item_basics", "seller_account_id", "people_master", "account_id", "many_to_one"),
+]
+
+SQLITE_TYPES = {"BIGINT": "INTEGER", "DOUBLE": "REAL", "BOOLEAN": "INTEGER"}
+
+
+class DistinctCount:
+    """approx_count_distinct, exactly (sqlglot writes it as APPROX_DISTINCT for SQLite)."""
+
+    def __init__(self):
+        self.values = set()
+
+    def step(self, value):
+        if value is not None:
+            self.values.add(value)
+
+    def finalize(self):
+        return len(self.values)
+
+
+class TopK:
+    """approx_top_k(expr, k), exactly; the array of {item, count} structs comes back as a JSON string."""
+
+    def __init__(self):
+        self.counts: dict[Any, int] = {}
+        self.k = 5
+
+    def step(self, value, k):
+        self.k = k
+        if value is not None:
+            self.counts[value] = self.counts.get(value, 0) + 1
+
+    def finalize(self):
+        top = sorted(self.counts.items(), key=lambda item: (-item[1], str(item[0])))[: self.k]
+        return json.dumps([{"item": item, "count": count} for item, count in top])
+
+
+class FakeWarehouse:
+    """
+    Synthetic warehouse shared by every fake connection. Counts connections and statements.
+    `latency` is added to every statement and `connect_latency` to every new session.
+    `slow_statements` maps a substring to extra seconds for statements containing it,
+    to model heavy rollups; a cursor's cancel() interrupts them. `EXPLAIN COST` estimates
+    scans at `row_bytes` per row.
+    `bids_per_item` sizes item_account_bidding, and `extra_views` adds catalogued filler
+    views of `extra_view_columns` columns each, to model a catalog of hundreds of gold views.
+    """
+
+    def __init__(
+        self,
+        item_rows: int = 500,
+        directory: str | None = None,
+        latency: float = 0.0,
+        connect_latency: float = 0.0,
+        bids_per_item: int = 4,
+        extra_views: int = 0,
+        extra_view_columns: int = 30,
+        slow_statements: dict[str, float] | None = None,
+        row_bytes: int = 64,
+    ):
+        self.directory = directory or tempfile.mkdtemp(prefix="fake_databricks_")
+        self.item_rows = item_rows
+        self.bids_per_item = bids_per_item
+        self.extra_views = {
+            f"gold_view_{v:03d}": [
+                ("item_id", "BIGINT", "Lot identifier", "100001"),
+                *(
+                    (f"metric_{v % 7}_{c:02d}", "DOUBLE", f"Synthetic measure {c} of view {v}", "1.0")
+                    for c in range(extra_view_columns - 1)
+                ),
+            ]
+            for v in range(extra_views)
+        }
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.slow_statements = dict(slow_statements or {})
+        self.row_bytes = row_bytes
+        self.lock = threading.Lock()
+        self.connections_opened = 0
+        self.connections_closed = 0
+        self.statements: list[str] = []
+        self.cancelled: list[str] = []
+        self.session_generation = 0
+        self._build()
+
+    def path(self, schema: str) -> str:
+        return os.path.join(self.directory, f"{schema}.db")
+
+    def _build(self):
+        conn = self.raw_connection()
+        for view, columns in (VIEWS | UNCATALOGED_VIEWS | self.extra_views).items():
+            cols = ", ".join(f"{name} {SQLITE_TYPES.get(dtype, 'TEXT')}" for name, dtype, _, _ in columns)
+            conn.execute(f"CREATE TABLE IF NOT EXISTS prod_gold.{view} ({cols})")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS ai_data_assets.all_table_description_metadata (
+                table_name TEXT, description TEXT, usage TEXT);
+            CREATE TABLE IF NOT EXISTS ai_data_assets.all_column_metadata (
+                source_table TEXT, column_name TEXT, description TEXT, data_type TEXT,
+                example_value TEXT, table_view TEXT);
+            CREATE TABLE IF NOT EXISTS ai_data_assets.key_relationships (
+                source_table TEXT, foreign_key TEXT, primary_key_table TEXT, primary_key TEXT,
+                relationship TEXT);
+        """)
+        if conn.execute("SELECT COUNT(*) FROM ai_data_assets.all_column_metadata").fetchone()[0] == 0:
+            self._populate(conn)
+        conn.commit()
+        conn.close()
+
+    def _populate(self, conn: sqlite3.Connection):
+        for view, columns in (VIEWS | self.extra_views).items():
+            conn.execute(
+                "INSERT INTO ai_data_assets.all_table_description_metadata VALUES (?, ?, ?)",
+                (view, f"Synthetic {view.replace('_', ' ')} view", f"Use for {view} questions"),
+            )
+            conn.executemany(
+                "INSERT INTO ai_data_assets.all_column_metadata VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (view, name, desc, dtype, example, json.dumps([f"main.prod_gold.{view}"]))
+                    for name, dtype, desc, example in columns
+                ],
+            )
+        conn.executemany("INSERT INTO ai_data_assets.key_relationships VALUES (?, ?, ?, ?, ?)", RELATIONSHIPS)
+
+        states = ["KS", "MO", "NE", "OK", "TX", "IA"]
+        categories = ["Construction", "Ag Equipment", "Trucks", "Vehicles", "Real Estate"]
+        accounts = max(self.item_rows // 5, 1)
+        conn.executemany(
+            "INSERT INTO prod_gold.item_basics VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    100000 + i,
+                    f"Lot {i}",
+                    categories[i % len(categories)],
+                    states[i % len(states)],
+                    f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+                    round(500 + (i * 7919) % 90000 + 0.5, 2),
+                    5000 + i % accounts,
+                )
+                for i in range(self.item_rows)
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO prod_gold.item_account_bidding VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    100000 + i // self.bids_per_item,
+                    5000 + (i * 31) % accounts,
+                    round(100 + (i * 104729) % 50000 + 0.25, 2),
+                    f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d} 12:{i % 60:02d}:00",
+                    int(i % 4 == 3),
+                )
+                for i in range(self.item_rows * self.bids_per_item)
+            ],
+        )
+        conn.executemany(
+            "INSERT INTO prod_gold.people_master VALUES (?, ?, ?, ?)",
+            [
+                (5000 + i, f"Person {i}", states[i % len(states)], f"person{i}@example.com")
+                for i in range(accounts)
+            ],
+        )
+
+    def raw_connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        conn.create_aggregate("APPROX_DISTINCT", 1, DistinctCount)
+        conn.create_aggregate("APPROX_TOP_K", 2, TopK)
+        for schema in SCHEMAS:
+            conn.execute(f"ATTACH DATABASE '{self.path(schema)}' AS {schema}")
+        return conn
+
+    def connect(self, **kwargs) -> "FakeConnection":
+        """Drop-in replacement for `databricks.sql.connect`."""
+        if self.connect_latency:
+            time.sleep(self.connect_latency)
+        with self.lock:
+            self.connections_opened += 1
+        return FakeConnection(self)
+
+    def expire_sessions(self):
+        """Invalidate every open session, as the warehouse does after its idle timeout."""
+        with self.lock:
+            self.session_generation += 1
+
+    def reset_counters(self):
+        with self.lock:
+            self.connections_opened = 0
+            self.connections_closed = 0
+            self.statements.clear()
+            self.cancelled.clear()
+
+    def statement_latency(self, operation: str) -> float:
+        text = operation.lower()
+        return self.latency + sum(s for pattern, s in self.slow_statements.items() if pattern.lower() in text)
+
+
+class FakeConnection:
+    def __init__(self, warehouse: FakeWarehouse):
+        self.warehouse = warehouse
+        self.raw = warehouse.raw_connection()
+        self.generation = warehouse.session_generation
+        self.open = True
+
+    def cursor(self, *args, **kwargs) -> "FakeCursor":
+        if not self.open:
+            raise RuntimeError("Invalid SessionHandle: connection is closed")
+        return FakeCursor(self)
+
+    def close(self):
+        if self.open:
+            self.open = False
+            self.raw.close()
+            with self.warehouse.lock:
+                self.warehouse.connections_closed += 1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def to_sqlite(sql: str) -> str:
+    """Transpile a Databricks statement to SQLite, dropping the `main` catalog."""
+    tree = sqlglot.parse_one(sql, read="databricks")
+    for table in tree.find_all(exp.Table):
+        if table.args.get("catalog") is not None:
+            table.set("catalog", None)
+    for explode in list(tree.find_all(exp.Explode)):
+        # EXPLODE(table_view) over a JSON array column -> json_each table-valued function
+        select = explode.find_ancestor(exp.Select)
+        alias = explode.parent.alias if isinstance(explode.parent, exp.Alias) else "value"
+        select.join(exp.Anonymous(this="json_each", expressions=[explode.this.copy()]), copy=False)
+        target = explode.parent if isinstance(explode.parent, exp.Alias) else explode
+        target.replace(exp.alias_(exp.column("value", table="json_each"), alias))
+    for shift in list(tree.find_all(exp.TsOrDsAdd, exp.DateAdd)):
+        # DATE_ADD / DATE_SUB(date, n) -> DATE(date, (n) || ' day')
+        days = exp.DPipe(this=exp.Paren(this=shift.expression.copy()), expression=exp.Literal.string(" day"))
+        shift.replace(exp.Anonymous(this="DATE", expressions=[shift.this.copy(), days]))
+    return tree.sql(dialect="sqlite")
+
+
+def format_size(size: float) -> str:
+    """Spark's rendering of a byte count in plan statistics, e.g. `1.5 MiB`."""
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024 or unit == "GiB":
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+
+class FakeCursor:
+    def __init__(self, connection: FakeConnection):
+        self.connection = connection
+        self.description = None
+        self._rows: list[tuple] = []
+        self._position = 0
+        # Open SQLite cursor for query results, read as they are fetched like a server-side cursor
+        self._source = None
+        self._make_row = tuple
+        self.closed = False
+        self._cancelled = threading.Event()
+
+    def execute(self, operation: str, parameters=None, **kwargs):
+        warehouse = self.connection.warehouse
+        if not self.connection.open or self.closed or self.connection.generation != warehouse.session_generation:
+            raise RuntimeError("Invalid SessionHandle: session expired")
+        with warehouse.lock:
+            warehouse.statements.append(operation)
+        latency = warehouse.statement_latency(operation)
+        if latency:
+            self._cancelled.wait(latency)
+        if self._cancelled.is_set():
+            self._raise_cancelled(operation)
+
+        stripped = operation.strip()
+        if stripped.upper().startswith("EXPLAIN COST"):
+            columns = ["plan"]
+            values = [(self._explain_cost(stripped[len("EXPLAIN COST"):]),)]
+        elif stripped.upper().startswith("SHOW COLUMNS IN"):
+            table = stripped.split()[-1].split(".")[-1]
+            raw = self.connection.raw.execute(f"PRAGMA prod_gold.table_info({table})").fetchall()
+            if not raw:
+                raise RuntimeError(f"[TABLE_OR_VIEW_NOT_FOUND] The table or view `{table}` cannot be found.")
+            columns = ["col_name", "data_type"]
+            values = [(r[1], r[2]) for r in raw]
+        else:
+            try:
+                raw_cursor = self.connection.raw.execute(to_sqlite(stripped), list(parameters or []))
+                columns = [d[0] for d in raw_cursor.description or []]
+            except sqlite3.OperationalError:
+                if self._cancelled.is_set():
+                    self._raise_cancelled(operation)
+                raise
+            values = []
+
+        self.description = [(name, None, None, None, None, None, None) for name in columns]
+        if Row is not None and columns:
+            self._make_row = Row(*columns)
+        else:
+            self._make_row = lambda *v: tuple(v)
+        self._rows = [self._make_row(*v) for v in values]
+        self._position = 0
+        self._source = None if values or not columns else raw_cursor
+        return self
+
+    def _explain_cost(self, sql: str) -> str:
+        """
+        A Spark-style optimized logical plan with statistics. Each scanned view reports the rows left
+        after the WHERE predicates that only reference it, the way partition pruning and data skipping
+        shrink a real scan, at `row_bytes` per row.
+        """
+        tree = sqlglot.parse_one(sql, read="databricks")
+        tables = list(tree.find_all(exp.Table))
+        where = tree.args.get("where")
+        conjuncts = list(where.this.flatten()) if where is not None and isinstance(where.this, exp.And) else (
+            [where.this] if where is not None else []
+        )
+        lines = ["== Optimized Logical Plan ==", "Project [...], Statistics(sizeInBytes=1.0 B)"]
+        for table in tables:
+            names = {table.name, table.alias_or_name}
+            own = [
+                c.copy() for c in conjuncts
+                if all(col.table in names if col.table else len(tables) == 1 for col in c.find_all(exp.Column))
+            ]
+            count = exp.select("COUNT(*)").from_(table.copy())
+            if own:
+                count = count.where(*own)
+            rows = self.connection.raw.execute(to_sqlite(count.sql(dialect="databricks"))).fetchone()[0]
+            size = rows * self.connection.warehouse.row_bytes
+            lines.append(
+                f"+- Relation main.prod_gold.{table.name}[...] parquet, "
+                f"Statistics(sizeInBytes={format_size(size)}, rowCount={rows})"
+            )
+        return "\n".join(lines)
+
+    def fetchall(self) -> list[Any]:
+        if self._source is not None:
+            return self._read(self._source.fetchall())
+        rows = self._rows[self._position:]
+        self._position = len(self._rows)
+        return rows
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def fetchmany(self, size: int) -> list[Any]:
+        if self._source is not None:
+            return self._read(self._source.fetchmany(size))
+        rows = self._rows[self._position:self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def _read(self, values: list[tuple]) -> list[Any]:
+        try:
+            return [self._make_row(*v) for v in values]
+        finally:
+            if self._cancelled.is_set():
+                self._raise_cancelled("fetch")
+
+    def fetchall_arrow(self):
+        return self._to_arrow(self.fetchall())
+
+    def fetchmany_arrow(self, size: int):
+        return self._to_arrow(self.fetchmany(size))
+
+    def _to_arrow(self, rows: list[Any]):
+        names = [d[0] for d in self.description or []]
+        columns = list(zip(*rows)) if rows else [[] for _ in names]
+        return pa.Table.from_arrays([pa.array(list(values)) for values in columns], names=names)
+
+    def _raise_cancelled(self, operation: str):
+        with self.connection.warehouse.lock:
+            self.connection.warehouse.cancelled.append(operation)
+        raise RuntimeError("[OPERATION_CANCELED] The statement was cancelled.")
+
+    def cancel(self):
+        """Like the connector, callable from another thread while execute() is running."""
+        self._cancelled.set()
+        try:
+            self.connection.raw.interrupt()
+        except sqlite3.Error:
+            pass
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def install(warehouse: FakeWarehouse | None = None) -> FakeWarehouse:
+    """Point `databricks.sql.connect` at a fake warehouse and set dummy credentials."""
+    import databricks.sql
+
+    warehouse = warehouse or FakeWarehouse()
+    databricks.sql.connect = warehouse.connect
+    for key, value in {
+        "DATABRICKS_HOST": "fake.cloud.databricks.com",
+        "DATABRICKS_HTTP_PATH": "/sql/1.0/warehouses/fake",
+        "DATABRICKS_TOKEN": "fake-token",
+        "METADATA_SNAPSHOT_PATH": os.path.join(warehouse.directory, "metadata_snapshot.sqlite"),
+    }.items():
+        os.environ.setdefault(key, value)
+    return warehouse
@@ -0,0 +1,111 @@
+# benchmarks/profile_check.py
+"""
+profile_view against a fake warehouse: every requested column is profiled by
+one aggregate statement, a repeat call (or get_table_views_metadata with
+include_profile) is answered from the profile cache without a statement, and
+the figures match exact values computed directly in SQLite. For contrast,
+the response size of the 200-row sample a model pulls today to get a feel
+for a view.
+
+    python benchmarks/profile_check.py --rows 20000
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_databricks import FakeWarehouse, install
+
+VIEW = "item_basics"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--top-k", type=int, default=5)
+    return parser.parse_args()
+
+
+def text(content) -> str:
+    return "".join(getattr(part, "text", "") for part in content)
+
+
+def profile_statements(warehouse) -> int:
+    return sum("APPROX_COUNT_DISTINCT" in statement.upper() for statement in warehouse.statements)
+
+
+def exact_mismatches(warehouse, profile: dict) -> list[str]:
+    conn = warehouse.raw_connection()
+    table = f"prod_gold.{VIEW}"
+    mismatches = []
+    if profile["row_count"] != conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]:
+        mismatches.append("row_count")
+    for column, stats in profile["columns"].items():
+        nulls, distinct, low, high = conn.execute(
+            f"SELECT SUM({column} IS NULL), COUNT(DISTINCT {column}), MIN({column}), MAX({column}) FROM {table}"
+        ).fetchone()
+        if stats["null_fraction"] != round(nulls / profile["row_count"], 4):
+            mismatches.append(f"{column}.null_fraction")
+        if (stats["approx_distinct"], stats["min"], stats["max"]) != (distinct, low, high):
+            mismatches.append(f"{column}.distinct/min/max")
+        if "top_values" in stats:
+            counts = [count for _, count in conn.execute(
+                f"SELECT {column}, COUNT(*) AS n FROM {table} GROUP BY {column} ORDER BY n DESC LIMIT ?", (len(stats["top_values"]),)
+            )]
+            if [entry["count"] for entry in stats["top_values"]] != counts:
+                mismatches.append(f"{column}.top_values")
+    conn.close()
+    return mismatches
+
+
+async def run(args, warehouse) -> dict:
+    import databricks_mcp as server
+
+    mcp = server.mcp
+    server.start_warmup()
+    while not server.metadata_store.ready:
+        await asyncio.sleep(0.05)
+
+    warehouse.reset_counters()
+    sample = text(await mcp.call_tool("query_single_view", {"table_name": VIEW, "limit": 200}))
+
+    warehouse.reset_counters()
+    first = text(await mcp.call_tool("profile_view", {"table_name": VIEW, "top_k": args.top_k}))
+    first_statements = profile_statements(warehouse)
+
+    warehouse.reset_counters()
+    repeat = text(await mcp.call_tool("profile_view", {"table_name": VIEW, "columns": ["state", "category"], "top_k": args.top_k}))
+    repeat_statements = profile_statements(warehouse)
+
+    warehouse.reset_counters()
+    await mcp.call_tool("get_table_views_metadata", {"table_views": [VIEW], "include_profile": True})
+    metadata_statements = profile_statements(warehouse)
+
+    profile = json.loads(first)
+    mismatches = exact_mismatches(warehouse, profile)
+    return {
+        "rows": args.rows,
+        "columns_profiled": len(profile["columns"]),
+        "profile_statements": first_statements,
+        "repeat_statements": repeat_statements,
+        "repeat_subset_matches": json.loads(repeat)["columns"]["state"] == profile["columns"]["state"],
+        "metadata_with_profile_statements": metadata_statements,
+        "profile_bytes": len(first.encode()),
+        "sample_200_rows_bytes": len(sample.encode()),
+        "exact": not mismatches,
+        "mismatches": mismatches,
+        "profile_cache": server.profile_cache.stats(),
+    }
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    os.environ.setdefault("RESULT_CACHE_TTL_SECONDS", "0")
+    warehouse = install(FakeWarehouse(item_rows=args.rows))
+    report = asyncio.run(run(args, warehouse))
+    print(json.dumps(report, indent=2))
+    if not report["exact"] or report["profile_statements"] != 1 or report["repeat_statements"] or report["metadata_with_profile_statements"]:
+        sys.exit(1)
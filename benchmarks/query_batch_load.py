@@ -0,0 +1,116 @@
+# benchmarks/query_batch_load.py
+"""
+A post-auction report's worth of independent queries, issued the way a model
+does today (one query_single_view call after another) and as one
+run_query_batch call, against a fake warehouse that sleeps `--latency`
+seconds per statement. Outputs must match; the batch should take about
+ceil(queries / concurrency) statement latencies instead of one per query.
+A deliberately invalid spec checks that failures are reported per query.
+
+    python benchmarks/query_batch_load.py --latency 0.3 --concurrency 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_databricks import install
+
+REPORT = {
+    "totals": {"table_name": "item_basics", "columns": ["COUNT(*) AS lots", "SUM(sale_price) AS gross"]},
+    "by_category": {
+        "table_name": "item_basics", "columns": ["category", "COUNT(*) AS lots", "SUM(sale_price) AS gross"],
+        "order_by": "gross DESC",
+    },
+    "by_state": {"table_name": "item_basics", "columns": ["state", "AVG(sale_price) AS avg_price"], "order_by": "state"},
+    "top_lots": {
+        "table_name": "item_basics", "columns": ["item_id", "item_name", "sale_price"],
+        "order_by": "sale_price DESC", "limit": 10,
+    },
+    "top_bids": {
+        "table_name": "item_account_bidding", "columns": ["account_id", "MAX(bid_amount) AS top_bid"],
+        "order_by": "top_bid DESC", "limit": 10,
+    },
+    "winning_bids": {"table_name": "item_account_bidding", "columns": ["COUNT(*) AS wins"], "where_clause": "is_winning_bid = true"},
+    "recent": {"table_name": "item_basics", "columns": ["COUNT(*) AS lots"], "where_clause": "auction_date >= '2024-06-01'"},
+    "bids_by_state": {
+        "table_name": "item_basics", "join_tables": ["item_account_bidding"],
+        "columns": ["item_basics.state", "COUNT(*) AS bids"], "order_by": "bids DESC",
+    },
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--concurrency", type=int, default=4, help="BATCH_MAX_CONCURRENCY")
+    return parser.parse_args()
+
+
+def text(content) -> str:
+    return "".join(getattr(part, "text", "") for part in content)
+
+
+async def run(args, warehouse) -> dict:
+    import databricks_mcp as server
+
+    mcp = server.mcp
+    server.start_warmup()
+    while not server.metadata_store.ready:
+        await asyncio.sleep(0.05)
+    warehouse.latency = args.latency
+
+    sequential, started = {}, time.perf_counter()
+    for spec_id, spec in REPORT.items():
+        if spec.get("join_tables"):
+            arguments = {"select_columns": spec["columns"], "from_table": spec["table_name"]} | {
+                k: v for k, v in spec.items() if k not in ("columns", "table_name")
+            }
+            sequential[spec_id] = text(await mcp.call_tool("query_joined_views", arguments))
+        else:
+            sequential[spec_id] = text(await mcp.call_tool("query_single_view", spec))
+    sequential_seconds = time.perf_counter() - started
+
+    specs = [{"id": spec_id} | spec for spec_id, spec in REPORT.items()]
+    specs.append({"id": "broken", "table_name": "item_basics", "columns": ["no_such_column"]})
+    warehouse.reset_counters()
+    started = time.perf_counter()
+    batch = json.loads(text(await mcp.call_tool("run_query_batch", {"queries": specs})))
+    batch_seconds = time.perf_counter() - started
+
+    mismatched = [
+        spec_id for spec_id in REPORT
+        if batch["results"][spec_id].get("output") != sequential[spec_id]
+    ]
+    return {
+        "queries": len(REPORT),
+        "latency": args.latency,
+        "sequential_seconds": round(sequential_seconds, 3),
+        "batch_seconds": round(batch_seconds, 3),
+        "speedup": round(sequential_seconds / batch_seconds, 2),
+        "batch_statements": len(warehouse.statements),
+        "outputs_match": not mismatched,
+        "mismatched": mismatched,
+        "per_query_seconds": {spec_id: r.get("seconds") for spec_id, r in batch["results"].items()},
+        "partial_failure": batch["results"]["broken"],
+        "succeeded": batch["succeeded"],
+        "failed": batch["failed"],
+    }
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    # Both runs must reach the warehouse, so nothing is served from the result cache
+    os.environ.setdefault("RESULT_CACHE_TTL_SECONDS", "0")
+    os.environ.setdefault("RESULT_SUBSUMPTION", "0")
+    os.environ.setdefault("BATCH_MAX_CONCURRENCY", str(args.concurrency))
+    os.environ.setdefault("DATABRICKS_POOL_SIZE", str(max(args.concurrency, 4)))
+    warehouse = install()
+    report = asyncio.run(run(args, warehouse))
+    print(json.dumps(report, indent=2))
+    if not report["outputs_match"]:
+        sys.exit(1)
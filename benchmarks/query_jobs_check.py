@@ -0,0 +1,97 @@
+# benchmarks/query_jobs_check.py
+"""
+Exercise the query job tools against the fake connector with a slow statement:
+submit returns at once, status moves from queued/running to succeeded, results
+page by offset, a running job is cancelled on the warehouse, and the
+per-session quota rejects extra jobs.
+
+    python benchmarks/query_jobs_check.py --slow-seconds 2
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_databricks import FakeWarehouse, install
+
+ROLLUP = {
+    "table_name": "item_account_bidding",
+    "columns": ["account_id", "COUNT(*) AS bids", "MAX(bid_amount) AS top_bid"],
+    "group_by": ["account_id"],
+}
+
+
+def wait_for(server, job_id: str, timeout: float) -> tuple[dict, list[str]]:
+    states = []
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = server.get_query_status(job_id)
+        if not states or states[-1] != status["state"]:
+            states.append(status["state"])
+        if status["state"] in ("succeeded", "failed", "cancelled"):
+            return status, states
+        time.sleep(0.05)
+    return status, states
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slow-seconds", type=float, default=2.0, help="time added to statements reading item_account_bidding")
+    args = parser.parse_args()
+
+    warehouse = install(FakeWarehouse(item_rows=500, slow_statements={"item_account_bidding": args.slow_seconds}))
+    os.environ.setdefault("JOBS_MAX_PER_SESSION", "2")
+    import databricks_mcp as server
+
+    report = {}
+
+    started = time.perf_counter()
+    job = server.submit_query(**ROLLUP, where_clause="bid_amount > 0")
+    report["submit_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    status, states = wait_for(server, job["job_id"], args.slow_seconds * 5)
+    first = server.get_query_result(job["job_id"], page_size=50)
+    second = server.get_query_result(job["job_id"], offset=50, page_size=50)
+    report["completed"] = {
+        "states": states,
+        "rows": status.get("rows"),
+        "running_seconds": status.get("running_seconds"),
+        "first_page_hint": first.splitlines()[-1],
+        "second_page_lines": len(second.splitlines()),
+    }
+
+    resubmitted = server.submit_query(**ROLLUP, where_clause="bid_amount > 0")
+    report["resubmitted_from_cache"] = resubmitted.get("from_cache")
+
+    job = server.submit_query(**ROLLUP, where_clause="bid_amount > 1")
+    time.sleep(min(0.3, args.slow_seconds / 4))
+    started = time.perf_counter()
+    server.cancel_query(job["job_id"])
+    status, states = wait_for(server, job["job_id"], args.slow_seconds * 5)
+    report["cancelled"] = {
+        "states": states,
+        "seconds_to_stop": round(time.perf_counter() - started, 3),
+        "warehouse_cancelled": len(warehouse.cancelled),
+        "result": server.get_query_result(job["job_id"]),
+    }
+
+    jobs = [server.submit_query(**ROLLUP, where_clause=f"bid_amount > {i + 10}") for i in range(3)]
+    report["quota"] = [j.get("state") or j.get("error") for j in jobs]
+    for j in jobs:
+        if "job_id" in j:
+            server.cancel_query(j["job_id"])
+
+    token = server.session_id_override.set("someone-else")
+    try:
+        report["other_session_sees_job"] = "error" not in server.get_query_status(job["job_id"])
+    finally:
+        server.session_id_override.reset(token)
+
+    report["jobs"] = server.job_manager.snapshot()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
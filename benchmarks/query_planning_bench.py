@@ -0,0 +1,160 @@
+# benchmarks/query_planning_bench.py
+"""
+Compare query construction time for a wide select list: the original
+regex/string-building path (each expression parsed once per helper) against
+query_builder.build_query (one cached parse and analysis per expression).
+
+    python benchmarks/query_planning_bench.py --columns 60
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlglot import parse_one
+from sqlglot.expressions import Column
+
+from query_builder import Join, build_query, parse_cache_info
+
+
+# --- The original query_joined_views construction, kept verbatim for comparison ---
+
+def extract_groupable_columns(select_columns: list[str]) -> list[str]:
+    groupable = []
+    aggregate_pattern = re.compile(r"\b(COUNT|SUM|AVG|MIN|MAX)\s*\(", re.IGNORECASE)
+    alias_pattern = re.compile(r"(?i)\s+AS\s+\w+$")
+
+    for col in select_columns:
+        if not aggregate_pattern.search(col):
+            col_clean = alias_pattern.sub("", col.strip())
+            groupable.append(col_clean)
+    return groupable
+
+
+def extract_column_names(sql_expr: str) -> set[str]:
+    try:
+        tree = parse_one(sql_expr)
+        return {
+            c.sql(dialect='ansi').replace("`", "")
+            for c in tree.find_all(Column)
+        }
+    except Exception:
+        return set()
+
+
+def is_valid_sql_column(col_expr: str, valid_columns: set[str], allowed_tables: list[str]) -> bool:
+    cols = extract_column_names(col_expr)
+    for col in cols:
+        if "." in col:
+            if not any(col.startswith(f"{tbl}.") for tbl in allowed_tables):
+                return False
+        elif col not in valid_columns:
+            return False
+    return True
+
+
+def disambiguate_column(expr: str, preferred_table: str) -> str:
+    try:
+        tree = parse_one(expr)
+        for col in tree.find_all(Column):
+            if col.name.upper() == "ITEM_ID" and col.table is None:
+                col.set("this", "item_id")
+                col.set("table", preferred_table)
+        return tree.sql()
+    except Exception:
+        return expr
+
+
+def legacy_build(select_columns, from_table, join_tables, valid_columns, where_clause, group_by, order_by, limit) -> str:
+    invalid = [col for col in select_columns if not is_valid_sql_column(col, valid_columns, join_tables + [from_table])]
+    if invalid:
+        raise ValueError(invalid)
+    select_columns = [disambiguate_column(col, from_table) for col in select_columns]
+    query = f"SELECT {', '.join(select_columns)} FROM main.prod_gold.{from_table}"
+    for join_table in join_tables:
+        if join_table == from_table:
+            continue
+        query += f" INNER JOIN main.prod_gold.{join_table} ON {from_table}.item_id = {join_table}.item_id"
+    if where_clause:
+        query += f" WHERE {where_clause}"
+    has_aggregates = any(re.search(r"\b(COUNT|SUM|AVG|MIN|MAX)\s*\(", col, re.IGNORECASE) for col in select_columns)
+    group_by_final = set(group_by or []) | (set(extract_groupable_columns(select_columns)) if has_aggregates else set())
+    if has_aggregates and group_by_final:
+        query += f" GROUP BY {', '.join(group_by_final)}"
+    if order_by:
+        query += f" ORDER BY {order_by}"
+    return query + f" LIMIT {limit}"
+
+
+def wide_select(count: int) -> tuple[list[str], set[str]]:
+    """`count` select expressions over item_basics / item_account_bidding: plain, qualified and aggregate."""
+    base = ["item_id", "item_name", "category", "state", "auction_date", "seller_account_id"]
+    numeric = ["sale_price", "bid_count", "bid_amount"]
+    select = list(base)
+    i = 0
+    while len(select) < count:
+        column = numeric[i % len(numeric)]
+        select.append([
+            f"SUM({column}) AS sum_{column}_{i}",
+            f"AVG({column}) AS avg_{column}_{i}",
+            f"MAX(CASE WHEN state = 'KS' THEN {column} END) AS ks_{column}_{i}",
+            f"ROUND({column} * 1.1, 2) AS adj_{column}_{i}",
+            f"item_account_bidding.{column}",
+        ][i % 5])
+        i += 1
+    return select, set(base + numeric)
+
+
+def best_of(repeat: int, func) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--columns", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    select, valid_columns = wide_select(args.columns)
+    where, order_by = "category = 'Construction' AND sale_price > 1000", "state DESC"
+    joins = [Join("item_account_bidding", "item_basics.item_id = item_account_bidding.item_id")]
+
+    legacy = best_of(args.repeat, lambda: legacy_build(
+        select, "item_basics", ["item_account_bidding"], valid_columns, where, None, order_by, 200,
+    ))
+
+    def plan(columns):
+        return build_query(
+            columns, "item_basics", valid_columns, joins=joins,
+            where=where, order_by=order_by, limit=200, item_id_table="item_basics",
+        ).to_sql()
+
+    # Cold: expressions never seen before (the dialect itself is warmed up by the first build)
+    plan(["item_name"])
+    started = time.perf_counter()
+    plan(select)
+    cold = time.perf_counter() - started
+    warm = best_of(args.repeat, lambda: plan(select))
+
+    print(json.dumps({
+        "select_expressions": len(select),
+        "legacy_ms": round(legacy * 1000, 2),
+        "build_query_cold_ms": round(cold * 1000, 2),
+        "build_query_warm_ms": round(warm * 1000, 2),
+        "speedup_cold": round(legacy / cold, 2),
+        "speedup_warm": round(legacy / warm, 2),
+        "parse_cache": parse_cache_info(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
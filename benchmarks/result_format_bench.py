@@ -0,0 +1,74 @@
+# benchmarks/result_format_bench.py
+"""
+Compare the tool output encodings on a 10k-row auction lot fixture: bytes
+produced and build time, against the original "\\n".join(str(row)) output.
+
+    python benchmarks/result_format_bench.py --rows 10000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pyarrow as pa
+from databricks.sql.types import Row
+
+from result_format import OUTPUT_FORMATS, Result
+
+
+def fixture(rows: int) -> pa.Table:
+    states = ["KS", "MO", "NE", "OK", "TX", "IA"]
+    categories = ["Construction", "Ag Equipment", "Trucks", "Vehicles", "Real Estate"]
+    return pa.table({
+        "item_id": pa.array(range(100000, 100000 + rows), pa.int64()),
+        "item_name": [f"Lot {i} 2012 John Deere 310K Backhoe" for i in range(rows)],
+        "category": [categories[i % 5] for i in range(rows)],
+        "state": [states[i % 6] for i in range(rows)],
+        "auction_date": [f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}" for i in range(rows)],
+        "sale_price": [round(500 + (i * 7919) % 90000 + 0.5, 2) for i in range(rows)],
+        "bid_count": pa.array([i % 37 for i in range(rows)], pa.int32()),
+        "seller_account_id": pa.array([5000 + i % 2000 for i in range(rows)], pa.int64()),
+    })
+
+
+def best_of(repeat: int, func) -> tuple[float, str]:
+    best, output = float("inf"), ""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = func()
+        best = min(best, time.perf_counter() - started)
+    return best, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    table = fixture(args.rows)
+    make_row = Row(*table.column_names)
+    connector_rows = [make_row(*values) for values in zip(*(c.to_pylist() for c in table.columns))]
+    result = Result.from_arrow(table)
+
+    seconds, output = best_of(args.repeat, lambda: "\n".join(str(row) for row in connector_rows))
+    baseline = {"format": "str(row) baseline", "bytes": len(output.encode()), "build_ms": round(seconds * 1000, 2)}
+    report = [baseline]
+    for output_format in OUTPUT_FORMATS:
+        seconds, output = best_of(args.repeat, lambda: result.format(output_format))
+        size = len(output.encode())
+        report.append({
+            "format": output_format,
+            "bytes": size,
+            "build_ms": round(seconds * 1000, 2),
+            "bytes_vs_baseline": round(size / baseline["bytes"], 3),
+            "time_vs_baseline": round(seconds * 1000 / baseline["build_ms"], 3),
+        })
+    print(json.dumps({"rows": args.rows, "results": report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
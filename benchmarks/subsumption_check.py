@@ -0,0 +1,134 @@
+# benchmarks/subsumption_check.py
+"""
+Verify local query subsumption against the warehouse. Each case caches a
+base query, then runs follow-up queries twice: on the fake warehouse, and
+computed locally from the cached base result. Results must match (row order
+too when the follow-up has ORDER BY; floats to 1e-9 relative, since sums
+may add up in a different order), and follow-ups that cannot be proven
+equivalent must fall through to the warehouse. Exits 1 on any mismatch.
+
+    python benchmarks/subsumption_check.py --rows 5000
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_databricks import FakeWarehouse, install
+
+# (name, base query, follow-up, answered locally?) in query_single_view argument shapes
+CONSTRUCTION = {"table_name": "item_basics", "columns": ["*"], "where_clause": "category = 'Construction'", "limit": 100_000}
+BIDS = {
+    "table_name": "item_account_bidding",
+    "columns": ["item_id", "account_id", "bid_amount", "is_winning_bid"],
+    "where_clause": "bid_amount > 1000",
+    "limit": 100_000,
+}
+CASES = [
+    ("same filter, fewer columns", CONSTRUCTION, {"columns": ["item_id", "state"], "where_clause": "category = 'Construction'"}, True),
+    ("added equality", CONSTRUCTION, {"columns": ["item_id", "sale_price"], "where_clause": "category = 'Construction' AND state = 'KS'"}, True),
+    ("added IN and range", CONSTRUCTION, {"where_clause": "category = 'Construction' AND state IN ('KS', 'MO') AND sale_price > 20000"}, True),
+    ("added OR / BETWEEN", CONSTRUCTION, {"where_clause": "category = 'Construction' AND (sale_price BETWEEN 1000 AND 5000 OR state = 'TX')"}, True),
+    ("added NOT", CONSTRUCTION, {"where_clause": "category = 'Construction' AND NOT state = 'KS'"}, True),
+    ("added LIKE", CONSTRUCTION, {"columns": ["item_id", "item_name"], "where_clause": "category = 'Construction' AND item_name LIKE 'Lot 1%'"}, True),
+    ("added date range", CONSTRUCTION, {"where_clause": "category = 'Construction' AND auction_date >= '2024-06-01'"}, True),
+    ("top 10 by price", CONSTRUCTION, {
+        "columns": ["item_id", "item_name", "sale_price"], "where_clause": "category = 'Construction'",
+        "order_by": "sale_price DESC", "limit": 10,
+    }, True),
+    ("order by alias", CONSTRUCTION, {
+        "columns": ["item_id", "sale_price AS price"], "where_clause": "category = 'Construction' AND state = 'NE'",
+        "order_by": "price", "limit": 5,
+    }, True),
+    ("rollup by state", CONSTRUCTION, {
+        "columns": ["state", "COUNT(*) AS lots", "SUM(sale_price) AS total", "AVG(sale_price) AS avg_price",
+                    "MIN(auction_date) AS first_auction", "MAX(sale_price) AS top_price"],
+        "where_clause": "category = 'Construction'", "order_by": "state",
+    }, True),
+    ("global distinct count", CONSTRUCTION, {
+        "columns": ["COUNT(DISTINCT state) AS states", "COUNT(seller_account_id) AS sellers"],
+        "where_clause": "category = 'Construction' AND sale_price < 30000",
+    }, True),
+    ("boolean filter and rollup", BIDS, {
+        "columns": ["is_winning_bid", "COUNT(*) AS bids", "MAX(bid_amount) AS top_bid"],
+        "where_clause": "bid_amount > 1000 AND bid_amount <= 25000", "order_by": "is_winning_bid",
+    }, True),
+    ("drops the base filter", CONSTRUCTION, {"where_clause": "state = 'KS'"}, False),
+    ("expression filter", CONSTRUCTION, {"where_clause": "category = 'Construction' AND sale_price * 2 > 1000"}, False),
+    ("unaliased aggregate", CONSTRUCTION, {"columns": ["state", "COUNT(*)"], "where_clause": "category = 'Construction'"}, False),
+    ("different view", CONSTRUCTION, {"table_name": "people_master", "columns": ["state"], "where_clause": None}, False),
+]
+
+
+def values_match(left, right) -> bool:
+    if isinstance(left, float) or isinstance(right, float):
+        return left is not None and right is not None and math.isclose(left, right, rel_tol=1e-9)
+    return left == right
+
+
+def rows_match(expected: list[tuple], actual: list[tuple], ordered: bool) -> bool:
+    if len(expected) != len(actual):
+        return False
+    if not ordered:
+        key = lambda row: tuple((v is None, str(v)) for v in row)  # noqa: E731
+        expected, actual = sorted(expected, key=key), sorted(actual, key=key)
+    return all(len(a) == len(b) and all(map(values_match, a, b)) for a, b in zip(expected, actual))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000, help="item_basics rows in the fake warehouse")
+    args = parser.parse_args()
+
+    warehouse = install(FakeWarehouse(item_rows=args.rows))
+    import databricks_mcp as server
+    from result_format import fetch_result
+
+    def plan_for(spec):
+        spec = {"columns": ["*"], "where_clause": None, "group_by": None, "order_by": None, "limit": 200} | spec
+        return server.plan_single_view_query(
+            spec["table_name"], spec["columns"], spec["where_clause"], spec["group_by"], spec["order_by"], spec["limit"],
+        )
+
+    report, failures = [], 0
+    for name, base, follow_up, expect_local in CASES:
+        server.result_cache.clear()
+        base_plan = plan_for(base)
+        server.run_query(base_plan.to_sql(), base_plan)
+
+        plan = plan_for(base | follow_up)
+        with server.get_connection() as conn:
+            cursor = conn.cursor()
+            started = time.perf_counter()
+            cursor.execute(plan.to_sql())
+            expected = fetch_result(cursor)
+            warehouse_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        local = server.result_subsumption.answer(plan)
+        local_ms = (time.perf_counter() - started) * 1000
+
+        entry = {"case": name, "answered_locally": local is not None, "expected_locally": expect_local}
+        ok = (local is not None) == expect_local
+        if local is not None:
+            result = local[0]
+            entry["identical"] = result.columns == expected.columns and rows_match(
+                expected.to_rows(), result.to_rows(), ordered=bool(plan.order_by),
+            )
+            entry |= {"rows": result.num_rows, "warehouse_ms": round(warehouse_ms, 2), "local_ms": round(local_ms, 2)}
+            ok = ok and entry["identical"]
+        entry["ok"] = ok
+        failures += not ok
+        report.append(entry)
+
+    print(json.dumps({"cases": report, "failures": failures, "subsumption": server.result_subsumption.snapshot()}, indent=2))
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
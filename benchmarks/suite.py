@@ -0,0 +1,299 @@
+# benchmarks/suite.py
+"""
+Offline benchmark suite. Runs the MCP tool handlers against the SQLite-backed
+fake warehouse and writes one JSON report:
+
+  tool_latency       per-tool latency (cold call, then warm p50/p95/mean) and
+                     warehouse statements per call
+  throughput         calls per second with N concurrent clients
+  memory_per_session traced allocation per client session (query history)
+  serialization      build time and size of each output format
+
+    python benchmarks/suite.py --output before.json
+    python benchmarks/suite.py --output after.json --compare before.json
+
+With --compare, metrics that got worse by more than --threshold are listed
+and the exit status is 1, so the suite can gate a change in CI.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_databricks import FakeWarehouse, install
+
+# Tool calls timed by tool_latency. "{i}" is replaced per iteration so query results are not
+# served from the result cache; calls without it measure the warm, cached path.
+TOOL_CALLS = [
+    ("list_available_views", {}),
+    ("get_table_views_metadata", {"table_views": ["item_basics", "item_account_bidding", "people_master"]}),
+    ("list_table_relationships", {"source_table": "item_account_bidding"}),
+    ("find_columns", {"query": "bid amount"}),
+    ("plan_join", {"from_table": "item_basics", "join_tables": ["item_account_bidding", "people_master"]}),
+    ("query_single_view", {
+        "table_name": "item_basics",
+        "columns": ["state", "COUNT(*) AS lots", "SUM(sale_price) AS total"],
+        "where_clause": "sale_price > {i}",
+    }),
+    ("query_single_view:cached", {
+        "table_name": "item_basics",
+        "columns": ["state", "COUNT(*) AS lots", "SUM(sale_price) AS total"],
+        "where_clause": "category = 'Construction'",
+    }),
+    ("query_single_view:wide", {
+        "table_name": "item_basics",
+        "columns": ["*"],
+        "where_clause": "sale_price > {i}",
+        "limit": 1000,
+    }),
+    ("query_joined_views", {
+        "select_columns": ["item_basics.state", "MAX(bid_amount) AS top_bid", "COUNT(*) AS bids"],
+        "from_table": "item_basics",
+        "join_tables": ["item_account_bidding"],
+        "where_clause": "bid_amount > {i}",
+    }),
+    ("fetch_recent_query_context", {}),
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000, help="item_basics rows in the fake warehouse")
+    parser.add_argument("--bids-per-item", type=int, default=4)
+    parser.add_argument("--extra-views", type=int, default=200, help="filler views added to the catalog")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every statement")
+    parser.add_argument("--iterations", type=int, default=30, help="warm calls per tool")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent clients for throughput")
+    parser.add_argument("--calls-per-client", type=int, default=20)
+    parser.add_argument("--sessions", type=int, default=200, help="sessions for memory_per_session")
+    parser.add_argument("--serialize-rows", type=int, default=10_000)
+    parser.add_argument("--output", help="write the report here as well as to stdout")
+    parser.add_argument("--compare", help="baseline report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="relative change counted as a regression")
+    return parser.parse_args()
+
+
+def fill(args: dict[str, Any], i: int) -> dict[str, Any]:
+    return {k: v.replace("{i}", str(i)) if isinstance(v, str) else v for k, v in args.items()}
+
+
+def summarize(samples: list[float]) -> dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(ordered) * 1000, 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+async def tool_latency(server, warehouse: FakeWarehouse, iterations: int) -> dict[str, Any]:
+    report = {}
+    for label, arguments in TOOL_CALLS:
+        tool = label.split(":")[0]
+        warehouse.reset_counters()
+        started = time.perf_counter()
+        await server.mcp.call_tool(tool, fill(arguments, 0))
+        cold = time.perf_counter() - started
+
+        samples = []
+        warehouse.reset_counters()
+        for i in range(1, iterations + 1):
+            started = time.perf_counter()
+            await server.mcp.call_tool(tool, fill(arguments, i))
+            samples.append(time.perf_counter() - started)
+        report[label] = {
+            "cold_ms": round(cold * 1000, 3),
+            **summarize(samples),
+            "statements_per_call": round(len(warehouse.statements) / iterations, 2),
+        }
+    return report
+
+
+async def throughput(server, clients: int, calls_per_client: int) -> dict[str, Any]:
+    samples: list[float] = []
+
+    async def client(c: int):
+        for i in range(calls_per_client):
+            started = time.perf_counter()
+            await server.mcp.call_tool("query_single_view", {
+                "table_name": "item_basics",
+                "columns": ["state", "COUNT(*) AS lots"],
+                "where_clause": f"sale_price > {100_000 + c * calls_per_client + i}",
+            })
+            samples.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    elapsed = time.perf_counter() - started
+    return {
+        "clients": clients,
+        "calls": clients * calls_per_client,
+        "seconds": round(elapsed, 3),
+        "calls_per_second": round(clients * calls_per_client / elapsed, 1),
+        **summarize(samples),
+    }
+
+
+def memory_per_session(server, sessions: int) -> dict[str, Any]:
+    """Allocation retained per session after a few identical queries (results come from the shared cache)."""
+    queries = [
+        {"table_name": "item_basics", "columns": ["state", "COUNT(*) AS lots"], "where_clause": f"category = '{c}'"}
+        for c in ("Construction", "Trucks", "Vehicles", "Ag Equipment", "Real Estate")
+    ]
+    for query in queries:
+        server.query_single_view(**query)
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for s in range(sessions):
+        token = server.session_id_override.set(f"bench-session-{s}")
+        try:
+            for query in queries:
+                server.query_single_view(**query)
+        finally:
+            server.session_id_override.reset(token)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    from query_context_manager import SESSION_CONTEXTS
+    registry = SESSION_CONTEXTS.snapshot()
+    return {
+        "sessions": sessions,
+        "queries_per_session": len(queries),
+        "traced_bytes_per_session": round((after - before) / sessions),
+        "registry_sessions": registry["sessions"],
+        "registry_approx_bytes_per_session": round(registry["approx_bytes"] / max(registry["sessions"], 1)),
+    }
+
+
+def serialization(rows: int) -> dict[str, Any]:
+    from benchmarks.result_format_bench import best_of, fixture
+    from result_format import OUTPUT_FORMATS, Result
+
+    result = Result.from_arrow(fixture(rows))
+    report = {}
+    for output_format in OUTPUT_FORMATS:
+        seconds, output = best_of(3, lambda: result.format(output_format))
+        report[output_format] = {"build_ms": round(seconds * 1000, 2), "bytes": len(output.encode())}
+    return {"rows": rows, "formats": report}
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(report: Any, prefix: str = "") -> dict[str, float]:
+    if isinstance(report, dict):
+        flat = {}
+        for key, value in report.items():
+            flat |= flatten(value, f"{prefix}.{key}" if prefix else key)
+        return flat
+    if isinstance(report, (int, float)) and not isinstance(report, bool):
+        return {prefix: float(report)}
+    return {}
+
+
+# Metric name patterns and which direction is better
+LOWER_IS_BETTER = re.compile(r"(_ms|seconds|bytes|statements_per_call|bytes_per_session)$")
+HIGHER_IS_BETTER = re.compile(r"per_second$")
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], threshold: float) -> dict[str, Any]:
+    """Relative change of every comparable metric; regressions are changes in the worse direction beyond `threshold`."""
+    now, before = flatten(current["results"]), flatten(baseline["results"])
+    changes, regressions = {}, []
+    for metric in sorted(now.keys() & before.keys()):
+        old, new = before[metric], now[metric]
+        if old == 0 or old == new:
+            continue
+        change = (new - old) / abs(old)
+        changes[metric] = {"baseline": old, "current": new, "change": round(change, 3)}
+        worse = change > threshold if LOWER_IS_BETTER.search(metric) else (
+            change < -threshold if HIGHER_IS_BETTER.search(metric) else False
+        )
+        if worse:
+            regressions.append(metric)
+    return {
+        "baseline_revision": baseline.get("meta", {}).get("revision"),
+        # Figures are only comparable when both runs used the same workload
+        "same_arguments": baseline.get("meta", {}).get("arguments") == current["meta"]["arguments"],
+        "threshold": threshold,
+        "regressions": regressions,
+        "changes": changes,
+    }
+
+
+async def run(args, warehouse: FakeWarehouse) -> dict[str, Any]:
+    started = time.perf_counter()
+    import databricks_mcp as server
+    import_seconds = time.perf_counter() - started
+
+    server.start_warmup()
+    while not server.metadata_store.ready:
+        await asyncio.sleep(0.05)
+    warehouse.latency = args.latency
+
+    return {
+        "startup": {"import_seconds": round(import_seconds, 3)},
+        "tool_latency": await tool_latency(server, warehouse, args.iterations),
+        "throughput": await throughput(server, args.clients, args.calls_per_client),
+        "memory_per_session": memory_per_session(server, args.sessions),
+        "serialization": serialization(args.serialize_rows),
+    }
+
+
+def main():
+    args = parse_args()
+    warehouse = FakeWarehouse(
+        item_rows=args.rows,
+        bids_per_item=args.bids_per_item,
+        extra_views=args.extra_views,
+    )
+    install(warehouse)
+    # Fresh session store so memory figures are not affected by earlier runs
+    os.environ.setdefault("SESSION_SNAPSHOT_DIR", os.path.join(warehouse.directory, "sessions"))
+    os.environ.setdefault("SESSION_MAX_COUNT", str(args.sessions + 16))
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "arguments": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        },
+        "results": asyncio.run(run(args, warehouse)),
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            report["comparison"] = compare(report, json.load(f), args.threshold)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+    if report.get("comparison", {}).get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+# cache.py
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Hashable, Iterable
+
+_MISSING = object()
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "stale_until", "size")
+
+    def __init__(self, value: Any, expires_at: float, stale_until: float, size: int = 0):
+        self.value = value
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+        self.size = size
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with per-entry TTL.
+
+    - Entries are fresh for `ttl` seconds. For a further `stale_ttl` seconds a read returns the
+      stale value immediately and refreshes it in the background (stale-while-revalidate).
+    - At most `max_size` entries are kept; the least recently used entry is evicted first.
+      With `max_bytes` and a `sizeof` weigher, entries are also evicted to stay within a byte budget.
+    - Concurrent misses for the same key share a single load (single-flight). Loader exceptions
+      are propagated to every waiter and never cached.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_size: int = 1024,
+        ttl: float = 900,
+        stale_ttl: float = 0,
+        max_bytes: int | None = None,
+        sizeof: Callable[[Any], int] | None = None,
+    ):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._bytes = 0
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._inflight: dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.counters = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "loads": 0,
+            "load_errors": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+    def _store(self, key: Hashable, value: Any, ttl: float | None = None):
+        size = self.sizeof(value) if self.sizeof else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            # Larger than the whole budget: never worth caching
+            self._remove(key)
+            return
+        now = time.monotonic()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        self._remove(key)
+        self._entries[key] = _Entry(value, expires_at, expires_at + self.stale_ttl, size)
+        self._bytes += size
+        while len(self._entries) > self.max_size or (self.max_bytes is not None and self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self.counters["evictions"] += 1
+
+    def _remove(self, key: Hashable) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._bytes -= entry.size
+        return True
+
+    def _lookup(self, key: Hashable, now: float) -> tuple[Any, bool]:
+        """Return (value, is_stale) or (_MISSING, False). Caller holds the lock."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING, False
+        if now < entry.expires_at:
+            self._entries.move_to_end(key)
+            return entry.value, False
+        if now < entry.stale_until:
+            self._entries.move_to_end(key)
+            return entry.value, True
+        self._remove(key)
+        self.counters["expirations"] += 1
+        return _MISSING, False
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a fresh or stale cached value without loading."""
+        with self._lock:
+            value, stale = self._lookup(key, time.monotonic())
+            if value is _MISSING:
+                self.counters["misses"] += 1
+                return default
+            self.counters["stale_hits" if stale else "hits"] += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._remove(key)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        with self._lock:
+            doomed = [key for key in self._entries if predicate(key)]
+            for key in doomed:
+                self._remove(key)
+            return len(doomed)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return self._lookup(key, time.monotonic())[0] is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _load(self, key: Hashable, loader: Callable[[], Any], future: Future):
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+                self.counters["load_errors"] += 1
+            future.set_exception(e)
+            return
+        with self._lock:
+            self._inflight.pop(key, None)
+            self.counters["loads"] += 1
+            self._store(key, value)
+        future.set_result(value)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for `key`, calling `loader()` once across concurrent misses."""
+        with self._lock:
+            value, stale = self._lookup(key, time.monotonic())
+            if value is not _MISSING:
+                self.counters["stale_hits" if stale else "hits"] += 1
+                if stale and key not in self._inflight:
+                    future = self._inflight[key] = Future()
+                    threading.Thread(
+                        target=self._load, args=(key, loader, future), name=f"{self.name}-revalidate", daemon=True
+                    ).start()
+                return value
+            self.counters["misses"] += 1
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if owner:
+            self._load(key, loader, future)
+        value = future.result()
+        if value is _MISSING:
+            # A batched load we were waiting on did not produce this key
+            return self.get_or_load(key, loader)
+        return value
+
+    def get_many_or_load(
+        self,
+        keys: Iterable[Hashable],
+        loader: Callable[[list[Hashable]], dict[Hashable, Any]],
+    ) -> dict[Hashable, Any]:
+        """
+        Batched `get_or_load`: keys missing from the cache are loaded with one `loader(missing)` call.
+        Keys already being loaded by another caller are awaited instead of reloaded.
+        Keys the loader does not return are left out of the result and not cached.
+        """
+        results: dict[Hashable, Any] = {}
+        waiting: dict[Hashable, Future] = {}
+        owned: dict[Hashable, Future] = {}
+        with self._lock:
+            now = time.monotonic()
+            for key in dict.fromkeys(keys):
+                value, stale = self._lookup(key, now)
+                if value is not _MISSING and not stale:
+                    self.counters["hits"] += 1
+                    results[key] = value
+                    continue
+                self.counters["misses"] += 1
+                if key in self._inflight:
+                    waiting[key] = self._inflight[key]
+                else:
+                    owned[key] = self._inflight[key] = Future()
+
+        if owned:
+            try:
+                loaded = loader(list(owned))
+            except BaseException as e:
+                with self._lock:
+                    for key in owned:
+                        self._inflight.pop(key, None)
+                    self.counters["load_errors"] += 1
+                for future in owned.values():
+                    future.set_exception(e)
+                raise
+            with self._lock:
+                self.counters["loads"] += 1
+                for key in owned:
+                    self._inflight.pop(key, None)
+                    if key in loaded:
+                        self._store(key, loaded[key])
+            for key, future in owned.items():
+                future.set_result(loaded.get(key, _MISSING))
+                if key in loaded:
+                    results[key] = loaded[key]
+
+        for key, future in waiting.items():
+            value = future.result()
+            if value is not _MISSING:
+                results[key] = value
+        return results
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["stale_hits"] + self.counters["misses"]
+            return self.counters | {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hit_rate": round((self.counters["hits"] + self.counters["stale_hits"]) / lookups, 4) if lookups else None,
+            }
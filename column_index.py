@@ -0,0 +1,162 @@
+# column_index.py
+import heapq
+import re
+from collections import Counter
+from typing import Any, Iterable
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def trigrams(text: str) -> set[str]:
+    """Character trigrams of a lowercased, space-padded name (so short names and prefixes still match)."""
+    padded = f"  {text.lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def words(text: str | None) -> set[str]:
+    return set(_WORD.findall(text.lower())) if text else set()
+
+
+class ColumnIndex:
+    """
+    Immutable lookup structure over catalog columns, built once per metadata snapshot.
+
+    - a column name -> views map (case-insensitive) for exact lookups
+    - a trigram inverted index over distinct column names for typo suggestions
+    - a word inverted index over column name parts and descriptions for free-text search
+    """
+
+    def __init__(self, columns_by_view: dict[str, list[dict[str, Any]]]):
+        # Every (view, column) pair with its catalog fields
+        self.entries: list[dict[str, Any]] = []
+        self.views: set[str] = set()
+        # Distinct lowercased column names, their display form, and the entries that carry them
+        self._names: list[str] = []
+        self._display: list[str] = []
+        self._name_ids: dict[str, int] = {}
+        self._entries_by_name: list[list[int]] = []
+        self._views_by_name: list[set[str]] = []
+        self._gram_sets: list[frozenset[str]] = []
+        self._gram_counts: list[int] = []
+        self._grams: dict[str, list[int]] = {}
+        self._names_by_view: dict[str, list[int]] = {}
+        self._words: dict[str, set[int]] = {}
+
+        for view, columns in columns_by_view.items():
+            self.views.add(view)
+            for column in columns:
+                name = column.get("column_name")
+                if not name:
+                    continue
+                entry_id = len(self.entries)
+                self.entries.append({
+                    "view": view,
+                    "column_name": name,
+                    "data_type": column.get("data_type"),
+                    "description": column.get("description"),
+                })
+                key = name.lower()
+                name_id = self._name_ids.get(key)
+                if name_id is None:
+                    name_id = self._add_name(key, name)
+                self._entries_by_name[name_id].append(entry_id)
+                if view not in self._views_by_name[name_id]:
+                    self._views_by_name[name_id].add(view)
+                    self._names_by_view.setdefault(view, []).append(name_id)
+                for word in words(name.replace("_", " ")) | words(column.get("description")):
+                    self._words.setdefault(word, set()).add(entry_id)
+
+    @classmethod
+    def from_names(cls, names_by_view: dict[str, Iterable[str]]) -> "ColumnIndex":
+        """Build an index from bare column names, e.g. columns described with SHOW COLUMNS."""
+        return cls({view: [{"column_name": name} for name in names] for view, names in names_by_view.items()})
+
+    def _add_name(self, key: str, display: str) -> int:
+        name_id = len(self._names)
+        self._name_ids[key] = name_id
+        self._names.append(key)
+        self._display.append(display)
+        self._entries_by_name.append([])
+        self._views_by_name.append(set())
+        grams = frozenset(trigrams(key))
+        self._gram_sets.append(grams)
+        self._gram_counts.append(len(grams))
+        for gram in grams:
+            self._grams.setdefault(gram, []).append(name_id)
+        return name_id
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def has_view(self, view: str) -> bool:
+        return view in self.views
+
+    def views_for(self, column_name: str) -> list[str]:
+        """Views that have a column with exactly this name (case-insensitive)."""
+        name_id = self._name_ids.get(column_name.lower())
+        return sorted(self._views_by_name[name_id]) if name_id is not None else []
+
+    def _similar(self, name: str, views: set[str] | None, cutoff: float, n: int) -> list[tuple[float, int]]:
+        """The `n` best (score, name id) pairs by Dice coefficient over trigram sets, best first."""
+        grams = trigrams(name)
+        sizes = self._gram_counts
+        scoped = None
+        if views is not None:
+            scoped = [name_id for view in views for name_id in self._names_by_view.get(view, ())]
+        if scoped is not None and len(scoped) <= 512:
+            # Few candidates: intersect trigram sets directly instead of walking the postings
+            shared = {name_id: len(grams & self._gram_sets[name_id]) for name_id in scoped}
+        else:
+            shared = Counter()
+            for gram in grams:
+                shared.update(self._grams.get(gram, ()))
+        scored = [
+            (2 * count / (len(grams) + sizes[name_id]), name_id)
+            for name_id, count in shared.items()
+            if 2 * count >= cutoff * (len(grams) + sizes[name_id])
+        ]
+        if views is not None:
+            scored = [s for s in scored if not views.isdisjoint(self._views_by_name[s[1]])]
+        return heapq.nsmallest(n, scored, key=lambda s: (-s[0], self._names[s[1]]))
+
+    def suggest(self, name: str, views: Iterable[str] | None = None, n: int = 3, cutoff: float = 0.5) -> list[str]:
+        """Closest column names to a misspelled `name`, optionally only those present in `views`."""
+        views = set(views) if views is not None else None
+        return [
+            self._display[name_id]
+            for _, name_id in self._similar(name, views, cutoff, n + 1)
+            if self._names[name_id] != name.lower()
+        ][:n]
+
+    def search(self, query: str, views: Iterable[str] | None = None, limit: int = 20) -> list[dict[str, Any]]:
+        """
+        Find columns by name or description. Exact name matches rank first, then similar names,
+        then columns whose name parts or description contain every word of the query.
+        """
+        views = set(views) if views else None
+        results: list[dict[str, Any]] = []
+        seen: set[int] = set()
+
+        def in_scope(entry_id: int) -> bool:
+            return views is None or self.entries[entry_id]["view"] in views
+
+        for score, name_id in self._similar(query.replace(" ", "_"), views, 0.4, limit):
+            match = "name" if score == 1.0 else "similar_name"
+            for entry_id in self._entries_by_name[name_id]:
+                if in_scope(entry_id):
+                    seen.add(entry_id)
+                    results.append(self.entries[entry_id] | {"match": match, "score": round(score, 3)})
+                    if len(results) >= limit:
+                        return results
+
+        query_words = words(query.replace("_", " "))
+        if query_words:
+            postings = sorted((self._words.get(word, set()) for word in query_words), key=len)
+            found = (e for e in set.intersection(*postings) if e not in seen and in_scope(e))
+            for entry_id in heapq.nsmallest(limit - len(results), found, key=self._entry_order):
+                results.append(self.entries[entry_id] | {"match": "description", "score": 0.35})
+        return results
+
+    def _entry_order(self, entry_id: int) -> tuple[str, str]:
+        entry = self.entries[entry_id]
+        return entry["view"], entry["column_name"]
@@ -0,0 +1,304 @@
+# connection_pool.py
+import functools
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable
+
+from metrics import phase
+
+# Messages the Databricks connector raises once a warehouse session is gone
+SESSION_EXPIRED_MARKERS = (
+    "invalid sessionhandle",
+    "session is closed",
+    "session already closed",
+    "sessionalreadyclosed",
+    "cursoralreadyclosed",
+    "connection is closed",
+    "invalid operationhandle",
+)
+
+
+# Cursor methods timed as the "fetch" phase of a tool call
+FETCH_METHODS = frozenset({"fetchall", "fetchmany", "fetchone", "fetchall_arrow", "fetchmany_arrow"})
+
+
+def is_session_expired(error: Exception) -> bool:
+    """Return True if the error means the underlying warehouse session is no longer usable."""
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in SESSION_EXPIRED_MARKERS)
+
+
+class _PoolEntry:
+    def __init__(self, raw: Any):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.last_checked = self.created_at
+
+
+class PooledCursor:
+    """Cursor proxy that reconnects once if the session expired underneath it."""
+
+    def __init__(self, owner: "PooledConnection", args, kwargs):
+        self._owner = owner
+        self._args = args
+        self._kwargs = kwargs
+        self._cursor = owner._entry.raw.cursor(*args, **kwargs)
+
+    def execute(self, operation: str, parameters=None, **kwargs):
+        with phase("execute"):
+            try:
+                self._cursor.execute(operation, parameters, **kwargs)
+            except Exception as e:
+                if not is_session_expired(e):
+                    raise
+                self._owner._reconnect()
+                self._cursor = self._owner._entry.raw.cursor(*self._args, **self._kwargs)
+                self._cursor.execute(operation, parameters, **kwargs)
+        return self
+
+    def close(self):
+        try:
+            self._cursor.close()
+        except Exception:
+            pass
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._cursor, name)
+        if name in FETCH_METHODS:
+            @functools.wraps(attr)
+            def fetch(*args, **kwargs):
+                with phase("fetch"):
+                    return attr(*args, **kwargs)
+            return fetch
+        return attr
+
+
+class PooledConnection:
+    """Connection proxy handed out by the pool. Cursors are closed when it is returned."""
+
+    def __init__(self, pool: "ConnectionPool", entry: _PoolEntry):
+        self._pool = pool
+        self._entry = entry
+        self._cursors: list[PooledCursor] = []
+
+    def cursor(self, *args, **kwargs) -> PooledCursor:
+        cursor = PooledCursor(self, args, kwargs)
+        self._cursors.append(cursor)
+        return cursor
+
+    def _reconnect(self):
+        self._pool._discard(self._entry)
+        self._entry = self._pool._open()
+        self._pool.stats["reconnects"] += 1
+
+    def _close_cursors(self):
+        for cursor in self._cursors:
+            cursor.close()
+        self._cursors.clear()
+
+    def __getattr__(self, name: str):
+        return getattr(self._entry.raw, name)
+
+
+class ConnectionPool:
+    """
+    Bounded pool of warehouse connections.
+    Idle connections are evicted after `max_idle_seconds`, recycled after `max_lifetime_seconds`,
+    and pinged with `SELECT 1` on checkout if they have not been used for `health_check_seconds`.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        max_size: int = 4,
+        max_idle_seconds: float = 300,
+        max_lifetime_seconds: float = 3600,
+        health_check_seconds: float = 60,
+        checkout_timeout: float = 30,
+    ):
+        self.connect = connect
+        self.max_size = max_size
+        self.max_idle_seconds = max_idle_seconds
+        self.max_lifetime_seconds = max_lifetime_seconds
+        self.health_check_seconds = health_check_seconds
+        self.checkout_timeout = checkout_timeout
+        self._idle: deque[_PoolEntry] = deque()
+        self._size = 0
+        self._lock = threading.Condition()
+        self._reaper: threading.Thread | None = None
+        self._reaper_stop = threading.Event()
+        self.stats = {
+            "opened": 0,
+            "closed": 0,
+            "checkouts": 0,
+            "reused": 0,
+            "reconnects": 0,
+            "failed_health_checks": 0,
+        }
+
+    def _open(self) -> _PoolEntry:
+        entry = _PoolEntry(self.connect())
+        with self._lock:
+            self.stats["opened"] += 1
+        return entry
+
+    def _close_raw(self, entry: _PoolEntry):
+        try:
+            entry.raw.close()
+        except Exception:
+            pass
+        with self._lock:
+            self.stats["closed"] += 1
+
+    def _discard(self, entry: _PoolEntry):
+        """Close a checked-out connection without returning its slot to the pool."""
+        self._close_raw(entry)
+
+    def _expired(self, entry: _PoolEntry, now: float) -> bool:
+        return (
+            now - entry.created_at > self.max_lifetime_seconds
+            or now - entry.last_used > self.max_idle_seconds
+            or not getattr(entry.raw, "open", True)
+        )
+
+    def _healthy(self, entry: _PoolEntry, now: float) -> bool:
+        if now - entry.last_checked < self.health_check_seconds:
+            return True
+        try:
+            cursor = entry.raw.cursor()
+            try:
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+            finally:
+                cursor.close()
+        except Exception:
+            with self._lock:
+                self.stats["failed_health_checks"] += 1
+            return False
+        entry.last_checked = now
+        return True
+
+    def acquire(self) -> _PoolEntry:
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            stale = []
+            entry = None
+            with self._lock:
+                now = time.monotonic()
+                while self._idle:
+                    candidate = self._idle.pop()
+                    if self._expired(candidate, now):
+                        stale.append(candidate)
+                        self._size -= 1
+                        continue
+                    entry = candidate
+                    break
+                if entry is None and self._size < self.max_size:
+                    self._size += 1
+                    reserve = True
+                else:
+                    reserve = False
+                if entry is None and not reserve and not stale:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise TimeoutError(
+                            f"Timed out waiting for a warehouse connection (pool size {self.max_size})."
+                        )
+                    self._lock.wait(remaining)
+                    continue
+
+            for old in stale:
+                self._close_raw(old)
+
+            if entry is not None:
+                if self._healthy(entry, time.monotonic()):
+                    with self._lock:
+                        self.stats["reused"] += 1
+                    return entry
+                self._close_raw(entry)
+                with self._lock:
+                    self._size -= 1
+                    self._lock.notify()
+                continue
+
+            if reserve:
+                try:
+                    return self._open()
+                except Exception:
+                    with self._lock:
+                        self._size -= 1
+                        self._lock.notify()
+                    raise
+
+    def release(self, entry: _PoolEntry, suspect: bool = False):
+        entry.last_used = time.monotonic()
+        if suspect:
+            # Force a ping before the next caller gets this connection
+            entry.last_checked = float("-inf")
+        with self._lock:
+            self._idle.append(entry)
+            self._lock.notify()
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection for the duration of a `with` block."""
+        pooled = PooledConnection(self, self.acquire())
+        with self._lock:
+            self.stats["checkouts"] += 1
+        failed = False
+        try:
+            yield pooled
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            pooled._close_cursors()
+            self.release(pooled._entry, suspect=failed)
+
+    def evict_idle(self) -> int:
+        """Close idle connections past their idle or lifetime limits. Returns the number closed."""
+        with self._lock:
+            now = time.monotonic()
+            keep, stale = deque(), []
+            for entry in self._idle:
+                (stale if self._expired(entry, now) else keep).append(entry)
+            self._idle = keep
+            self._size -= len(stale)
+            self._lock.notify_all()
+        for entry in stale:
+            self._close_raw(entry)
+        return len(stale)
+
+    def start_reaper(self, interval_seconds: float = 60):
+        """Run `evict_idle` periodically on a daemon thread so idle sessions are released server-side."""
+        def run():
+            while not self._reaper_stop.wait(interval_seconds):
+                self.evict_idle()
+
+        if self._reaper is None:
+            self._reaper = threading.Thread(target=run, name="connection-pool-reaper", daemon=True)
+            self._reaper.start()
+
+    def close_all(self):
+        self._reaper_stop.set()
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+        for entry in idle:
+            self._close_raw(entry)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return self.stats | {"size": self._size, "idle": len(self._idle), "max_size": self.max_size}
@@ -1,53 +1,312 @@
 from typing import Any
 from mcp.server.fastmcp import FastMCP
-import databricks.sql
 import os
 from dotenv import load_dotenv
 from difflib import get_close_matches
-from functools import lru_cache
 import inspect
-from fastapi import Request
-from query_context_manager import get_context
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import contextvars
+import threading
+import uuid
+import weakref
+from contextlib import asynccontextmanager
+from query_context_manager import SESSION_CONTEXTS, get_context, record_query
+from connection_pool import ConnectionPool
+from metadata_store import MetadataStore
+from cache import TTLCache
+from warehouse_executor import WarehouseExecutor
+from admission import PRIORITY_HEAVY, PRIORITY_METADATA, PRIORITY_QUERY, Overloaded, SingleFlight
+from result_cache import CachedResult, canonicalize
+from result_format import OUTPUT_FORMATS, Result, fetch_result
+from result_pages import ResultPager
+from result_export import EXPORT_FORMATS, export_cursor, export_path, prune_exports
+from query_cost import DATE_TYPES, Preflight, PreflightOutcome
+from query_subsumption import SubsumptionIndex
+from query_jobs import CANCELLED, FAILED, JobManager, QuotaExceeded
+from query_builder import Join, QueryPlan, build_query
+from view_profile import build_profile_query, parse_profile
+from column_index import ColumnIndex
+from lazy_imports import load_all as load_deferred_imports
+from join_planner import RelationshipGraph
+import metrics
+from metrics import MetricsRegistry
+import time
 import re
-from sqlglot import parse_one
-from sqlglot.expressions import Column
+import json
 
 load_dotenv()
-mcp = FastMCP("databricks")
 
-try:
-    from starlette.requests import Request as StarletteRequest
-    if isinstance(request := mcp.current_request, StarletteRequest):
-        session_id = request.headers.get("x-session-id", "default")
-    else:
-        session_id = "default"
-except Exception:
-    session_id = "default"
+@asynccontextmanager
+async def server_lifespan(server: FastMCP):
+    # Runs when a client session starts (per connection over SSE); the warm-up itself starts once
+    start_warmup()
+    yield {}
+
+mcp = FastMCP("databricks", lifespan=server_lifespan)
+
+# Set to pin tool calls to a session explicitly (e.g. from a batch or a benchmark)
+session_id_override: contextvars.ContextVar[str | None] = contextvars.ContextVar("session_id_override", default=None)
 
-context = get_context(session_id)
+# A random key per MCP connection, dropped with it. id() would be reused by a later connection
+# once this one is freed, handing it the old connection's query context and jobs.
+connection_keys: "weakref.WeakKeyDictionary[Any, str]" = weakref.WeakKeyDictionary()
+connection_keys_lock = threading.Lock()
 
-# Load credentials
+def current_session_id() -> str:
+    """
+    Resolve the calling client's session for the current tool call:
+    a session id in the request _meta, else the MCP connection itself.
+    (mcp 1.6's request context carries no HTTP request, so headers are not consulted.)
+    """
+    if override := session_id_override.get():
+        return override
+    try:
+        request_context = mcp.get_context().request_context
+    except ValueError:  # called outside a request, e.g. directly from Python
+        return "default"
+    meta_extra = getattr(request_context.meta, "model_extra", None) or {}
+    for key in ("session_id", "sessionId"):
+        if value := meta_extra.get(key):
+            return str(value)
+    with connection_keys_lock:
+        key = connection_keys.get(request_context.session)
+        if key is None:
+            key = connection_keys[request_context.session] = f"connection-{uuid.uuid4().hex}"
+    return key
+
+# Load credentials. They are checked on first connect, so the server starts and lists its tools without them.
 server_hostname = os.getenv("DATABRICKS_HOST")
 http_path = os.getenv("DATABRICKS_HTTP_PATH")
 access_token = os.getenv("DATABRICKS_TOKEN")
 
-if not all([server_hostname, http_path, access_token]):
-    raise EnvironmentError("Missing Databricks credentials in environment variables.")
+def open_connection():
+    if not all([server_hostname, http_path, access_token]):
+        raise EnvironmentError("Missing Databricks credentials in environment variables.")
+    import databricks.sql  # deferred: the connector is slow to import and not needed to register tools
+
+    with metrics.phase("connect"):
+        return databricks.sql.connect(
+            server_hostname=server_hostname,
+            http_path=http_path,
+            access_token=access_token,
+        )
+
+connection_pool = ConnectionPool(
+    open_connection,
+    max_size=int(os.getenv("DATABRICKS_POOL_SIZE", "4")),
+    max_idle_seconds=float(os.getenv("DATABRICKS_POOL_MAX_IDLE_SECONDS", "300")),
+    max_lifetime_seconds=float(os.getenv("DATABRICKS_POOL_MAX_LIFETIME_SECONDS", "3600")),
+    health_check_seconds=float(os.getenv("DATABRICKS_POOL_HEALTH_CHECK_SECONDS", "60")),
+)
+connection_pool.start_reaper()
+
+warehouse_executor = WarehouseExecutor(
+    max_workers=int(os.getenv("WAREHOUSE_EXECUTOR_THREADS", "16")),
+    max_concurrency=int(os.getenv("WAREHOUSE_MAX_CONCURRENCY", str(connection_pool.max_size))),
+    timeout=float(os.getenv("WAREHOUSE_REQUEST_TIMEOUT_SECONDS", "120")),
+    max_queue=int(os.getenv("WAREHOUSE_MAX_QUEUE", "64")),
+)
+
+# Identical statements already running are shared instead of executed again
+query_flight = SingleFlight("queries")
 
 def get_connection():
-    return databricks.sql.connect(
-        server_hostname=server_hostname,
-        http_path=http_path,
-        access_token=access_token,
-    )
-    
+    """Check out a pooled warehouse connection. Use as `with get_connection() as conn:`."""
+    return connection_pool.connection()
+
+metadata_store = MetadataStore(
+    os.getenv("METADATA_SNAPSHOT_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".metadata_snapshot.sqlite")),
+    get_connection,
+    refresh_seconds=float(os.getenv("METADATA_REFRESH_SECONDS", "3600")),
+    max_age_seconds=float(os.getenv("METADATA_SNAPSHOT_MAX_AGE_SECONDS", "86400")),
+)
+metadata_snapshot_enabled = os.getenv("METADATA_SNAPSHOT", "1") != "0"
+if metadata_snapshot_enabled:
+    # Local file only; the refresh from the warehouse starts with the warm-up
+    metadata_store.load_from_disk()
+
+# Live-path metadata caches, shared by every session
+metadata_cache_ttl = float(os.getenv("METADATA_CACHE_TTL_SECONDS", "900"))
+metadata_cache_stale = float(os.getenv("METADATA_CACHE_STALE_SECONDS", "3600"))
+metadata_cache_size = int(os.getenv("METADATA_CACHE_MAX_ENTRIES", "1024"))
+allowed_views_cache = TTLCache("allowed_views", max_size=1, ttl=metadata_cache_ttl, stale_ttl=metadata_cache_stale)
+valid_columns_cache = TTLCache("valid_columns", max_size=metadata_cache_size, ttl=metadata_cache_ttl, stale_ttl=metadata_cache_stale)
+table_columns_cache = TTLCache("table_columns", max_size=metadata_cache_size, ttl=metadata_cache_ttl)
+column_index_cache = TTLCache("column_index", max_size=1, ttl=metadata_cache_ttl, stale_ttl=metadata_cache_stale)
+relationship_graph_cache = TTLCache("relationship_graph", max_size=1, ttl=metadata_cache_ttl, stale_ttl=metadata_cache_stale)
+
+# Column profiles (profile_view) keyed by (view, column, top_k); data statistics drift slowly, so they live longer
+profile_cache = TTLCache(
+    "view_profiles",
+    max_size=int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", "4096")),
+    ttl=float(os.getenv("PROFILE_CACHE_TTL_SECONDS", "3600")),
+)
+profile_max_columns = int(os.getenv("PROFILE_MAX_COLUMNS", "50"))
+
+def clear_metadata_caches(reloaded_tables: list[str]):
+    for cache in (allowed_views_cache, valid_columns_cache, table_columns_cache, column_index_cache, relationship_graph_cache):
+        cache.clear()
+    # New column metadata may add, drop or retype columns of any view, so profiles start over
+    if "all_column_metadata" in reloaded_tables:
+        profile_cache.clear()
+
+metadata_store.reload_listeners.append(clear_metadata_caches)
+
+# Query results keyed by canonical SQL; keys carry the views read so they can be invalidated per view
+result_cache = TTLCache(
+    "query_results",
+    max_size=int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "512")),
+    ttl=float(os.getenv("RESULT_CACHE_TTL_SECONDS", "300")),
+    max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    sizeof=lambda result: result.size,
+)
+
+# Recent cached results that narrower follow-up queries can be computed from locally
+result_subsumption = SubsumptionIndex(
+    result_cache.get,
+    max_entries=int(os.getenv("RESULT_SUBSUMPTION_MAX_ENTRIES", "64")),
+)
+subsumption_enabled = os.getenv("RESULT_SUBSUMPTION", "1") != "0"
+
+def run_query(query: str, plan: QueryPlan | None = None) -> tuple[Result, float | None]:
+    """
+    Execute a generated query, answering from the result cache when an equivalent query ran recently,
+    or computing it locally when `plan` only narrows, aggregates or re-sorts a cached result.
+    Returns the result and, when it came from the cache, the age of the cached result in seconds.
+    """
+    key = canonicalize(query)
+    cached = result_cache.get(key)
+    metrics.cache_lookup(cached is not None)
+    if cached is not None:
+        metrics.add_rows(cached.result.num_rows)
+        return cached.result, cached.age_seconds
+
+    if plan is not None and subsumption_enabled:
+        with metrics.phase("local"):
+            local = result_subsumption.answer(plan)
+        if local is not None:
+            metrics.add_rows(local[0].num_rows)
+            return local
+
+    def execute() -> Result:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            return fetch_result(cursor)
+
+    # Callers that join a running execution spend their wait in the "execute" phase
+    with metrics.phase("execute"):
+        result, shared = query_flight.do(key, execute)
+    metrics.add_rows(result.num_rows)
+    if shared:
+        return result, None
+
+    result_cache.set(key, CachedResult(result))
+    if plan is not None and subsumption_enabled:
+        result_subsumption.register(key, plan, result)
+    return result, None
+
+# Open server-side cursors for paginated results, each on its own session so pages never hold a pool slot
+result_pager = ResultPager(
+    connection_pool.connect,
+    idle_seconds=float(os.getenv("PAGINATION_IDLE_SECONDS", "300")),
+    max_open=int(os.getenv("PAGINATION_MAX_OPEN", "4")),
+    max_total=int(os.getenv("PAGINATION_MAX_OPEN_TOTAL", "32")),
+    max_page_size=int(os.getenv("PAGINATION_MAX_PAGE_SIZE", "10000")),
+)
+result_pager.start_reaper()
+
+def cache_job_result(query: str, result: Result):
+    result_cache.set(canonicalize(query), CachedResult(result))
+
+def job_slot():
+    """A heavy admission slot for a running query job, so jobs count against the warehouse's limit."""
+    return warehouse_executor.slot(http_path, PRIORITY_HEAVY)
+
+# Background jobs for queries that may outlast the client's tool timeout, each on its own session.
+# They run at most JOBS_MAX_WORKERS at a time, always fewer than the warehouse's admission limit,
+# so tool calls keep at least one slot however many jobs are queued.
+job_manager = JobManager(
+    connection_pool.connect,
+    max_workers=max(1, min(int(os.getenv("JOBS_MAX_WORKERS", "2")), warehouse_executor.max_concurrency - 1)),
+    per_session_limit=int(os.getenv("JOBS_MAX_PER_SESSION", "3")),
+    retention_seconds=float(os.getenv("JOBS_RETENTION_SECONDS", "1800")),
+    max_retained=int(os.getenv("JOBS_MAX_RETAINED", "64")),
+    max_bytes=int(os.getenv("JOBS_MAX_RESULT_BYTES", str(128 * 1024 * 1024))),
+    on_result=cache_job_result,
+    admit=job_slot,
+    timeout_seconds=float(os.getenv("JOBS_TIMEOUT_SECONDS", "3600")),
+)
+job_manager.start_reaper()
+job_page_size = int(os.getenv("JOBS_PAGE_SIZE", "1000"))
+# Rows a job may return; larger results belong in export_query, which streams them to a file
+job_max_rows = int(os.getenv("JOBS_MAX_ROWS", "100000"))
+
+def explain_query(query: str) -> str:
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"EXPLAIN COST {query}")
+        return "\n".join(str(row[0]) for row in cursor.fetchall())
+
+# Optional EXPLAIN-based scan budget for generated queries (PREFLIGHT_MODE=warn, reject or narrow)
+query_preflight = Preflight(
+    explain_query,
+    mode=os.getenv("PREFLIGHT_MODE", "off"),
+    max_scan_bytes=float(os.getenv("PREFLIGHT_MAX_SCAN_BYTES")) if os.getenv("PREFLIGHT_MAX_SCAN_BYTES") else None,
+    max_scan_rows=float(os.getenv("PREFLIGHT_MAX_SCAN_ROWS")) if os.getenv("PREFLIGHT_MAX_SCAN_ROWS") else None,
+    partition_columns=json.loads(os.getenv("PREFLIGHT_PARTITION_COLUMNS", "{}")),
+    narrow_days=int(os.getenv("PREFLIGHT_NARROW_DAYS", "90")),
+    ttl=float(os.getenv("PREFLIGHT_CACHE_TTL_SECONDS", "3600")),
+)
+
+def preflight(plan: QueryPlan) -> PreflightOutcome:
+    """Cost-check a plan before it runs. Queries the result cache can answer cost nothing and skip it."""
+    if not query_preflight.enabled or canonicalize(plan.to_sql()) in result_cache:
+        return PreflightOutcome(plan)
+
+    def date_columns() -> dict[str, list[str]]:
+        return {
+            result["view"]: [
+                col["column_name"] for col in result["columns"]
+                if str(col.get("data_type") or "").upper().startswith(DATE_TYPES)
+            ]
+            for result in get_table_views_metadata(plan.tables)
+            if "view" in result and "columns" in result
+        }
+
+    try:
+        return query_preflight.check(plan, date_columns)
+    except Exception as e:
+        # EXPLAIN is advisory: a failure to estimate never blocks the query itself
+        return PreflightOutcome(plan, note=f"(preflight skipped: {e})")
+
+default_output_format = os.getenv("RESULT_FORMAT", "csv")
+
+def format_page(result: Result, page_token: str | None, output_format: str) -> str:
+    output = format_output(result, None, output_format)
+    if page_token:
+        output += f'\nMore rows available. Call fetch_next_page with page_token="{page_token}".'
+    return output
+
+def format_output(result: Result, cached_age: float | None, output_format: str) -> str:
+    with metrics.phase("format"):
+        output = result.format(output_format) if result.num_rows else "No results found."
+    if cached_age is not None:
+        output = f"(cached result from {cached_age:.0f}s ago)\n{output}"
+    return output
+
 # ✅ Guardrail
 #ALLOWED_VIEWS = {
 #    "item_basics", "item_account_bidding", "people_master"
 #}
 
-@lru_cache
 def get_allowed_views() -> set[str]:
+    if metadata_store.ready:
+        return metadata_store.allowed_views()
+    return allowed_views_cache.get_or_load("allowed_views", load_allowed_views)
+
+def load_allowed_views() -> set[str]:
     query = """
         SELECT DISTINCT EXPLODE(table_view) AS full_view_name
         FROM main.ai_data_assets.all_column_metadata
@@ -59,8 +318,153 @@ def get_allowed_views() -> set[str]:
         # Normalize by stripping schema prefix
         return {row[0].split('.')[-1].lower() for row in cursor.fetchall()}
 
+def get_column_index() -> ColumnIndex:
+    if metadata_store.ready:
+        return metadata_store.column_index
+    return column_index_cache.get_or_load("column_index", load_column_index)
+
+def load_column_index() -> ColumnIndex:
+    query = """
+        SELECT DISTINCT source_table, column_name, description, data_type
+        FROM main.ai_data_assets.all_column_metadata
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query)
+        rows = cursor.fetchall()
+    columns_by_view: dict[str, list[dict[str, Any]]] = {}
+    for row in rows:
+        columns_by_view.setdefault(row[0], []).append({
+            "column_name": row[1],
+            "description": row[2],
+            "data_type": row[3],
+        })
+    return ColumnIndex(columns_by_view)
+
+def get_relationship_graph() -> RelationshipGraph:
+    if metadata_store.ready:
+        return metadata_store.join_graph
+    return relationship_graph_cache.get_or_load("relationship_graph", load_relationship_graph)
+
+def load_relationship_graph() -> RelationshipGraph:
+    query = """
+        SELECT source_table, foreign_key, primary_key_table, primary_key, relationship
+        FROM main.ai_data_assets.key_relationships
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query)
+        return RelationshipGraph(cursor.fetchall())
+
+# Startup work deferred off the import path, started by the first client session (or by start_warmup())
+warmup_enabled = os.getenv("STARTUP_WARMUP", "1") != "0"
+warmup_status: dict[str, Any] = {"started": None, "seconds": None, "imports": [], "error": None}
+warmup_lock = threading.Lock()
+
+def start_warmup() -> bool:
+    """
+    Start the background warm-up once: the metadata snapshot refresh (or, without a snapshot, the live
+    view, column and relationship caches) and the deferred imports, so the first tool calls pay for neither.
+    Returns False when it already started or STARTUP_WARMUP=0.
+    """
+    with warmup_lock:
+        if not warmup_enabled or warmup_status["started"] is not None:
+            return False
+        warmup_status["started"] = time.time()
+
+    def run():
+        started = time.perf_counter()
+        try:
+            if metadata_snapshot_enabled:
+                metadata_store.start_background_refresh()
+            warmup_status["imports"] = load_deferred_imports()
+            if not metadata_snapshot_enabled:
+                get_allowed_views()
+                get_column_index()
+                get_relationship_graph()
+        except Exception as e:
+            warmup_status["error"] = f"Warm-up failed: {e}"
+        finally:
+            warmup_status["seconds"] = round(time.perf_counter() - started, 3)
+
+    threading.Thread(target=run, name="startup-warmup", daemon=True).start()
+    return True
+
+def suggest_columns(unknown_columns: list[str], columns_by_view: dict[str, list[str]]) -> tuple[dict[str, list[str]], dict[str, list[str]]]:
+    """
+    Typo suggestions for unknown column references, drawn from the queried views only,
+    plus the other views that have an unknown column under exactly that name.
+    """
+    views = list(columns_by_view)
+    try:
+        index = get_column_index()
+    except Exception:
+        index = None
+    if index is None or not all(index.has_view(view) for view in views):
+        # Views described with SHOW COLUMNS are not in the catalog index
+        index = ColumnIndex.from_names(columns_by_view)
+
+    suggestions, elsewhere = {}, {}
+    for ref in unknown_columns:
+        table, _, name = ref.rpartition(".")
+        if table:
+            suggestions[ref] = [f"{view}.{name}" for view in get_close_matches(table, views, n=1)]
+            continue
+        suggestions[ref] = index.suggest(name, views)
+        if other_views := [view for view in index.views_for(name) if view not in columns_by_view]:
+            elsewhere[ref] = other_views
+    return suggestions, elsewhere
+
+def invalid_columns_message(prefix: str, plan, columns_by_view: dict[str, list[str]]) -> str:
+    suggestions, elsewhere = suggest_columns(plan.unknown_columns, columns_by_view)
+    message = f"{prefix}: {plan.invalid} — Suggestions: {suggestions}"
+    if elsewhere:
+        message += f" — Found in other views: {elsewhere}"
+    return message
+
 registered_tools = {}
 
+# Rolling per-tool latency, phase, row and payload histograms
+server_metrics = MetricsRegistry(
+    window_seconds=float(os.getenv("METRICS_WINDOW_SECONDS", "300")),
+    max_samples=int(os.getenv("METRICS_MAX_SAMPLES", "2048")),
+)
+
+def call_outcome(result: Any) -> str:
+    """Tools report failures as return values: "Error ..." strings or {"error": ...} objects."""
+    if isinstance(result, str):
+        if result.startswith("Error"):
+            return "error"
+        if result.startswith(("Invalid", "Unknown", "No join path", "Do not include", "Query too expensive")):
+            return "rejected"
+    elif isinstance(result, dict) and "error" in result:
+        return "error"
+    elif isinstance(result, list) and result and isinstance(result[0], dict) and "error" in result[0]:
+        return "error"
+    return "ok"
+
+def response_bytes(result: Any) -> int:
+    if isinstance(result, str):
+        return len(result.encode())
+    return len(json.dumps(result, default=str))
+
+def instrument(func):
+    """Record wall time, phase breakdown, rows, payload size, cache use and outcome for each call."""
+    @functools.wraps(func)
+    def instrumented(*args, **kwargs):
+        with metrics.tool_call(func.__name__) as call:
+            if call is None:  # called from inside another tool: accounted to the outer call
+                return func(*args, **kwargs)
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                server_metrics.record_call(call, time.perf_counter() - call.started, None, "exception")
+                raise
+            server_metrics.record_call(call, time.perf_counter() - call.started, response_bytes(result), call_outcome(result))
+            return result
+
+    return instrumented
+
 def track_tool(func):
     signature = inspect.signature(func)
     doc = inspect.getdoc(func)
@@ -72,20 +476,90 @@ def track_tool(func):
         "parameters": param_info,
         "doc": doc
     }
-    return func
+    return instrument(func)
 
 original_tool = mcp.tool
 
+# Admission order when the warehouse is at its concurrency limit: catalog lookups and
+# bookkeeping first, then single-view queries, then joins. Unlisted tools count as queries;
+# a callable picks the priority from the call's arguments.
+TOOL_PRIORITIES = {
+    "list_available_views": PRIORITY_METADATA,
+    # include_profile scans each uncached view in full, so it waits with the other heavy work
+    "get_table_views_metadata": lambda include_profile=False, **_: PRIORITY_HEAVY if include_profile else PRIORITY_METADATA,
+    "find_columns": PRIORITY_METADATA,
+    "list_table_relationships": PRIORITY_METADATA,
+    "plan_join": PRIORITY_METADATA,
+    "refresh_metadata_snapshot": PRIORITY_METADATA,
+    "invalidate_query_cache": PRIORITY_METADATA,
+    "fetch_recent_query_context": PRIORITY_METADATA,
+    "get_query_status": PRIORITY_METADATA,
+    "cancel_query": PRIORITY_METADATA,
+    "get_server_metrics": PRIORITY_METADATA,
+    "list_available_tools": PRIORITY_METADATA,
+    "query_joined_views": PRIORITY_HEAVY,
+    "export_query": PRIORITY_HEAVY,
+    "run_query_batch": PRIORITY_HEAVY,
+    "profile_view": PRIORITY_HEAVY,
+}
+
+# Tools that never reach the warehouse; they skip admission so a busy warehouse cannot hold them up
+ADMISSION_EXEMPT_TOOLS = {
+    "get_query_status",
+    "get_query_result",
+    "cancel_query",
+    "get_server_metrics",
+    "fetch_recent_query_context",
+    "invalidate_query_cache",
+    "list_available_tools",
+}
+
+# Tools allowed longer than WAREHOUSE_REQUEST_TIMEOUT_SECONDS
+TOOL_TIMEOUTS = {
+    "export_query": float(os.getenv("EXPORT_TIMEOUT_SECONDS", "1800")),
+}
+
+def async_tool(func):
+    """Async handler for a blocking tool: the call runs on the warehouse executor, not the event loop."""
+    if inspect.iscoroutinefunction(func):
+        return func
+
+    priority = TOOL_PRIORITIES.get(func.__name__, PRIORITY_QUERY)
+    timeout = TOOL_TIMEOUTS.get(func.__name__)
+    admit = func.__name__ not in ADMISSION_EXEMPT_TOOLS
+
+    @functools.wraps(func)
+    async def handler(*args, **kwargs):
+        token = metrics.queued_since.set(time.perf_counter())
+        try:
+            return await warehouse_executor.run(
+                func, *args, warehouse=http_path, priority=priority(**kwargs) if callable(priority) else priority,
+                timeout=timeout, admit=admit, **kwargs,
+            )
+        except Overloaded:
+            server_metrics.inc("tool_calls_total", tool=func.__name__, outcome="overloaded")
+            raise
+        finally:
+            metrics.queued_since.reset(token)
+
+    return handler
+
 def tracked_tool(*args, **kwargs):
     def wrapper(func):
         tracked_func = track_tool(func)
-        return original_tool(*args, **kwargs)(tracked_func)
+        original_tool(*args, **kwargs)(async_tool(tracked_func))
+        # Module-level callers keep the plain function
+        return tracked_func
     return wrapper
 
 mcp.tool = tracked_tool
 
-@lru_cache
 def get_valid_columns_for(table_name: str) -> set[str]:
+    if metadata_store.ready:
+        return metadata_store.column_names(table_name)
+    return valid_columns_cache.get_or_load(table_name, lambda: load_valid_columns_for(table_name))
+
+def load_valid_columns_for(table_name: str) -> set[str]:
     query = """
         SELECT DISTINCT column_name
         FROM main.ai_data_assets.all_column_metadata
@@ -96,6 +570,8 @@ def get_valid_columns_for(table_name: str) -> set[str]:
         cursor.execute(query, [table_name])
         return {row[0] for row in cursor.fetchall()}
     
+AND_SPLIT = re.compile(r'\s+AND\s+', re.IGNORECASE)
+
 def extract_filters(where_clause: str | None) -> dict[str, str]:
     """
     Extract filters from a WHERE clause string.
@@ -104,7 +580,7 @@ def extract_filters(where_clause: str | None) -> dict[str, str]:
     if not where_clause:
         return {}
     filters = {}
-    for clause in re.split(r'\s+AND\s+', where_clause, flags=re.IGNORECASE):
+    for clause in AND_SPLIT.split(where_clause):
         if '=' in clause:
             key, val = clause.split('=', 1)
             filters[key.strip()] = val.strip().strip("'\"")
@@ -120,15 +596,21 @@ def list_available_views() -> list[dict[str, str]]:
     If the data needed is not avaliable in the originally selected views, select additional views to query.
     If the data needed is not available in any of the views, inform the user that the data is not available and suggest alternative approaches based on the data that is avaliable.
     """
+    if metadata_store.ready:
+        return metadata_store.list_views()
+
     query = """
         SELECT table_name, description, usage
         FROM main.ai_data_assets.all_table_description_metadata
     """
     
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute(query)
-        rows = cursor.fetchall()
+    def fetch_rows() -> list:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            return cursor.fetchall()
+
+    rows, _ = query_flight.do("list_available_views", fetch_rows)
     
     return [
         {
@@ -139,146 +621,238 @@ def list_available_views() -> list[dict[str, str]]:
         for row in rows
     ]
     
-def ensure_table_metadata(table_views: list[str]):
-    """Load column metadata for the given views and store it in session context if not already present."""
-    context_table_meta = context.get("table_metadata", {})
+def load_table_columns(table_views: list[str]) -> dict[str, list[str]]:
+    """Column names per view, loaded in one batch. Views that errored are left out so they are retried."""
+    return {
+        result["view"]: [col["column_name"] for col in result["columns"] if "column_name" in col]
+        for result in get_table_views_metadata(table_views)
+        if "view" in result and "columns" in result
+    }
 
-    missing = [view for view in table_views if view not in context_table_meta]
-    if not missing:
-        return  # nothing to do
 
-    results = get_table_views_metadata(missing)
+def ensure_table_metadata(table_views: list[str]) -> dict[str, list[str]]:
+    """Return column names for the given views from the shared cache, loading any missing views in one batch."""
+    return table_columns_cache.get_many_or_load(table_views, load_table_columns)
 
-    for result in results:
-        if "view" in result and "columns" in result:
-            context_table_meta[result["view"]] = [
-                col["column_name"] for col in result["columns"] if "column_name" in col
-            ]
 
-    context.set("table_metadata", context_table_meta)
+def fetch_column_metadata(views: list[str], limit: int = 200) -> dict[str, list[dict[str, Any]]]:
+    """
+    Fetch catalog column metadata for many views in one round trip.
+    Rows are split by view on the client and capped at `limit` columns per view.
+    """
+    if not views:
+        return {}
+    placeholders = ", ".join("?" for _ in views)
+    query = f"""
+        SELECT
+            source_table,
+            column_name,
+            description,
+            data_type,
+            example_value
+        FROM main.ai_data_assets.all_column_metadata
+        WHERE source_table IN ({placeholders})
+        GROUP BY source_table, column_name, description, data_type, example_value
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, list(views))
+        rows = cursor.fetchall()
+
+    by_view: dict[str, list[dict[str, Any]]] = {view: [] for view in views}
+    for row in rows:
+        columns = by_view.get(row[0])
+        if columns is None or len(columns) >= limit:
+            continue
+        columns.append({
+            "column_name": row[1],
+            "description": row[2],
+            "data_type": row[3],
+            "example_value": row[4],
+        })
+    return by_view
+
+
+def show_columns(view: str) -> list[dict[str, Any]]:
+    """Describe a view straight from the warehouse when the catalog has no metadata for it."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f"SHOW COLUMNS IN main.prod_gold.{view}")
+        fallback_rows = cursor.fetchall()
+    return [
+        {
+            "column_name": c[0],
+            "description": "N/A",
+            "data_type": c[1] if len(c) > 1 else None,
+            "example_value": None
+        }
+        for c in fallback_rows
+    ]
+
+
+def fetch_show_columns(views: list[str]) -> dict[str, list[dict[str, Any]] | Exception]:
+    """Run the `SHOW COLUMNS` fallback for several views concurrently, one pooled connection each."""
+    if not views:
+        return {}
+    results: dict[str, list[dict[str, Any]] | Exception] = {}
+    workers = min(len(views), connection_pool.max_size)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="show-columns") as executor:
+        futures = {executor.submit(show_columns, view): view for view in views}
+        for future, view in futures.items():
+            try:
+                results[view] = future.result()
+            except Exception as e:
+                results[view] = e
+    return results
 
 
 @mcp.tool()
 def get_table_views_metadata(
     table_views: list[str],
-    limit: int = 200
+    limit: int = 200,
+    include_profile: bool = False
 ) -> list[dict[str, Any]]:
     """
     Return structured column metadata (column name, description, type, notes, examples) for one or more table views.
     Each result groups columns under its corresponding view name. Falls back to `SHOW COLUMNS` if metadata is missing.
+    Set include_profile to add each column's profile from profile_view (null fraction, approximate distinct count,
+    min / max, top values); this scans each view once unless its profile is cached.
     """
     # allowed_views = ALLOWED_VIEWS
-    output = []
+    views = list(dict.fromkeys(table_views))
 
-    for view in table_views:
-        #if view not in allowed_views:
-        #    output.append({"view": view, "error": f"Invalid table name: {view}"})
-        #    continue
+    try:
+        if metadata_store.ready:
+            found = metadata_store.columns_for(views, limit)
+        else:
+            found = fetch_column_metadata(views, limit)
+    except Exception as e:
+        return [{"view": view, "error": f"Error fetching metadata: {e}"} for view in views]
 
-        qualified_view = f"main.prod_gold.{view}"
+    fallbacks = fetch_show_columns([view for view in views if not found.get(view)])
 
-        try:
-            query = """
-                SELECT
-                    column_name,
-                    description,
-                    data_type,
-                    example_value
-                FROM main.ai_data_assets.all_column_metadata
-                WHERE source_table = ?
-                GROUP BY column_name, description, data_type, example_value
-                LIMIT ?
-            """
-
-            with get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute(query, [view, limit])
-                rows = cursor.fetchall()
-
-            if rows:
-                output.append({
-                    "view": view,
-                    "columns": [
-                        {
-                            "column_name": row[0],
-                            "description": row[1],
-                            "data_type": row[2],
-                            "example_value": row[3],
-                        }
-                        for row in rows
-                    ]
-                })
-            else:
-                # fallback to SHOW COLUMNS
-                with get_connection() as conn:
-                    cursor = conn.cursor()
-                    cursor.execute(f"SHOW COLUMNS IN {qualified_view}")
-                    fallback_rows = cursor.fetchall()
-
-                output.append({
-                    "view": view,
-                    "columns": [
-                        {
-                            "column_name": c[0],
-                            "description": "N/A",
-                            "data_type": c[1],
-                            "example_value": None
-                        }
-                        for c in fallback_rows
-                    ]
-                })
+    output = []
+    for view in views:
+        if found.get(view):
+            output.append({"view": view, "columns": found[view]})
+        elif isinstance(fallbacks.get(view), Exception):
+            output.append({"view": view, "error": f"Error fetching metadata: {fallbacks[view]}"})
+        else:
+            output.append({"view": view, "columns": fallbacks.get(view, [])})
 
-        except Exception as e:
-            output.append({
-                "view": view,
-                "error": f"Error fetching metadata: {e}"
-            })
-    context_table_meta = context.get("table_metadata", {})
     for result in output:
-        if "view" in result and "columns" in result:
-            context_table_meta[result["view"]] = [
+        if "view" in result and "columns" in result and len(result["columns"]) < limit:
+            table_columns_cache.set(result["view"], [
                 col["column_name"] for col in result["columns"] if "column_name" in col
+            ])
+
+    if include_profile:
+        for result in output:
+            if "columns" not in result:
+                continue
+            profiled = [col for col in result["columns"] if "column_name" in col][:profile_max_columns]
+            try:
+                profile = view_profile(result["view"], profiled)
+            except Exception as e:
+                result["profile_error"] = f"Error profiling {result['view']}: {e}"
+                continue
+            # Copies: the column dicts may belong to the metadata snapshot's index
+            stats = {
+                column: {k: v for k, v in column_profile.items() if k != "data_type"}
+                for column, column_profile in profile["columns"].items()
+            }
+            result["row_count"] = profile["row_count"]
+            result["columns"] = [
+                col | {"profile": stats[col["column_name"]]} if col.get("column_name") in stats else col
+                for col in result["columns"]
             ]
-    context.set("table_metadata", context_table_meta)
 
     return output
 
 
-def extract_groupable_columns(select_columns: list[str]) -> list[str]:
+def load_view_profiles(view: str, columns: list[tuple[str, str | None]], top_k: int) -> dict[tuple[str, str, int], dict[str, Any]]:
+    """Profile `columns` of a view in one aggregate scan, as profile_cache entries."""
+    result, _ = run_query(build_profile_query(view, columns, top_k))
+    row_count, profiles = parse_profile(dict(zip(result.columns, result.to_rows()[0])), columns)
+    profiled_at = time.time()
+    return {
+        (view, column, top_k): profile | {"row_count": row_count, "profiled_at": profiled_at}
+        for column, profile in profiles.items()
+    }
+
+
+def view_profile(view: str, columns: list[dict[str, Any]], top_k: int = 5) -> dict[str, Any]:
     """
-    Extracts columns that are not aggregate expressions for use in GROUP BY.
-    Strips aliases and functions to return clean column references.
+    Profiles for the given column metadata entries, from profile_cache where possible; the columns
+    missing from it are profiled together in one query.
     """
-    groupable = []
-    aggregate_pattern = re.compile(r"\b(COUNT|SUM|AVG|MIN|MAX)\s*\(", re.IGNORECASE)
-    alias_pattern = re.compile(r"(?i)\s+AS\s+\w+$")
+    types = {col["column_name"]: col.get("data_type") for col in columns}
+    cached = profile_cache.get_many_or_load(
+        [(view, column, top_k) for column in types],
+        lambda missing: load_view_profiles(view, [(key[1], types[key[1]]) for key in missing], top_k),
+    )
+    profiles = {key[1]: profile for key, profile in cached.items()}
+    latest = max(profiles.values(), key=lambda profile: profile["profiled_at"], default=None)
+    return {
+        "row_count": latest["row_count"] if latest else None,
+        "profiled_seconds_ago": round(time.time() - min(p["profiled_at"] for p in profiles.values())) if profiles else None,
+        "columns": {
+            column: {k: v for k, v in profile.items() if k not in ("row_count", "profiled_at")}
+            for column, profile in profiles.items()
+        },
+    }
 
-    for col in select_columns:
-        if not aggregate_pattern.search(col):
-            col_clean = alias_pattern.sub("", col.strip())
-            groupable.append(col_clean)
-    return groupable
 
+@mcp.tool()
+def profile_view(table_name: str, columns: list[str] | None = None, top_k: int = 5) -> dict[str, Any]:
+    """
+    Profile a view before querying it instead of sampling raw rows: its row count and, per column, the null
+    fraction, approximate distinct count, min / max and the top_k most frequent values with their counts
+    (no top values for floating-point columns). Counts are approximate.
+    Pass columns to profile only those; by default the view's first 50 columns are profiled.
+    Everything is computed in one aggregate scan and cached, so asking again does not rescan the view.
+    """
+    if not 0 <= top_k <= 100:
+        return {"error": "top_k must be between 0 and 100."}
+    metadata = get_table_views_metadata([table_name])[0]
+    if "error" in metadata:
+        return metadata
+    available = {col["column_name"]: col for col in metadata["columns"] if "column_name" in col}
+    if not available:
+        return {"error": f"Unknown view {table_name!r}. Use list_available_views to see the views."}
+
+    if columns:
+        columns = list(dict.fromkeys(columns))
+        unknown = [column for column in columns if column not in available]
+        if unknown:
+            suggestions, _ = suggest_columns(unknown, {table_name: list(available)})
+            return {"error": f"Invalid columns: {unknown} — Suggestions: {suggestions}"}
+    else:
+        columns = list(available)[:profile_max_columns]
 
-def extract_column_names(sql_expr: str) -> set[str]:
     try:
-        tree = parse_one(sql_expr)
-        return {
-            c.sql(dialect='ansi').replace("`", "")
-            for c in tree.find_all(Column)
-        }
-    except Exception:
-        return set()
-
-def is_valid_sql_column(col_expr: str, valid_columns: set[str], allowed_tables: list[str]) -> bool:
-    cols = extract_column_names(col_expr)
-    for col in cols:
-        if "." in col:
-            if not any(col.startswith(f"{tbl}.") for tbl in allowed_tables):
-                return False
-        elif col not in valid_columns:
-            return False
-    return True
+        profile = view_profile(table_name, [available[column] for column in columns], top_k)
+    except Exception as e:
+        return {"error": f"Error profiling {table_name}: {e}"}
+    output = {"view": table_name} | profile
+    if len(columns) < len(available):
+        output["note"] = f"Profiled {len(columns)} of {len(available)} columns; pass columns to choose others."
+    return output
+
+
+@mcp.tool()
+def find_columns(query: str, views: list[str] | None = None, limit: int = 20) -> list[dict[str, Any]]:
+    """
+    Find which views have a column, by exact or approximate column name or by words in its description.
+    Use this when you know what data you need but not which view holds it, or to correct a misspelled column.
+    Pass views to search only those views.
+    """
+    try:
+        return get_column_index().search(query, views, limit)
+    except Exception as e:
+        return [{"error": f"Error searching columns: {e}"}]
+
+
 def clean_where_clause(where: str) -> str:
     """Strip quotes around entire clause and remove escaping for quotes."""
     where = where.strip()
@@ -287,34 +861,8 @@ def clean_where_clause(where: str) -> str:
     where = where.encode().decode('unicode_escape')  # unescape escaped quotes
     return where
 
-def disambiguate_column(expr: str, preferred_table: str) -> str:
-    """
-    Disambiguate column references in SQL expressions by setting the preferred table for item_id.
-    This is useful when item_id is used without a table prefix.
-    """
-    try:
-        tree = parse_one(expr)
-        for col in tree.find_all(Column):
-            if col.name.upper() == "ITEM_ID" and col.table is None:
-                col.set("this", "item_id")
-                col.set("table", preferred_table)
-        return tree.sql()
-    except Exception:
-        return expr  # fallback to original if parsing fails
-
-@mcp.tool()
-def query_single_view(
-    table_name: str,
-    columns: list[str] = ["*"],
-    where_clause: str | None = None,
-    group_by: list[str] | None = None,
-    order_by: str | None = None,
-    limit: int = 200
-) -> str:
-    """
-    Query a single table view using filters, grouping, and aggregation logic. 
-    Use this when a join is not required and the data resides in a single view.
-    """
+def parse_clause_lists(group_by, order_by):
+    """Clients sometimes send group_by / order_by as JSON text; decode them when they are."""
     if isinstance(group_by, str):
         try:
             group_by = json.loads(group_by)
@@ -325,145 +873,223 @@ def query_single_view(
             order_by = json.loads(order_by)
         except Exception:
             pass
+    return group_by, order_by
+
+
+def plan_single_view_query(
+    table_name: str,
+    columns: list[str],
+    where_clause: str | None,
+    group_by: list[str] | None,
+    order_by: str | None,
+    limit: int,
+) -> QueryPlan | str:
+    """Validate query_single_view arguments into a QueryPlan, or return the message saying why they are invalid."""
+    group_by, order_by = parse_clause_lists(group_by, order_by)
 
     #if table_name not in ALLOWED_VIEWS:
     #    return f"Invalid table name: {table_name}"
 
-    full_table_name = f"main.prod_gold.{table_name}"
-    ensure_table_metadata([table_name])
-    valid_columns = set(context.get("table_metadata", {}).get(table_name, []))
+    valid_columns = set(ensure_table_metadata([table_name]).get(table_name, []))
 
     #valid_columns = get_valid_columns_for(full_table_name)
 
     if columns == ["*"]:
         columns = list(valid_columns)
-    else:
-        invalid = [col for col in columns if not is_valid_sql_column(col, valid_columns, [table_name])]
-        if invalid:
-            suggestions = [get_close_matches(col, valid_columns, n=3) for col in invalid]
-            return f"Invalid columns: {invalid} — Suggestions: {suggestions}"
 
     if where_clause and any(kw in where_clause.lower() for kw in ["limit", "order by", "group by"]):
         return "Do not include LIMIT, ORDER BY, or GROUP BY in the where_clause. Use the respective parameters."
 
-    try:
-        col_str = ", ".join(columns)
-        query = f"SELECT {col_str} FROM {full_table_name}"
-        if where_clause:
-            where_clause = clean_where_clause(where_clause)
-            query += f" WHERE {where_clause}"
-
-        has_aggregates = any(re.search(r"\b(COUNT|SUM|AVG|MIN|MAX)\s*\(", col, re.IGNORECASE) for col in columns)
-        group_by_final = set(group_by or []) | (set(extract_groupable_columns(columns)) if has_aggregates else set())
-        if has_aggregates and group_by_final:
-            query += f" GROUP BY {', '.join(group_by_final)}"
-
-        if order_by:
-            query += f" ORDER BY {order_by}"
-        query += f" LIMIT {limit}"
-
-        with get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query)
-            results = cursor.fetchall()
-
-        context.add_query({
-            "table_name": table_name,
-            "columns": columns,
-            "filters": extract_filters(where_clause),
-            "sql": query,
-        })
-
-        return "\n".join(str(row) for row in results) if results else "No results found."
-
-    except Exception as e:
-        return f"Error querying {table_name}: {e}"
+    if where_clause:
+        where_clause = clean_where_clause(where_clause)
+    plan = build_query(
+        columns, table_name, valid_columns,
+        where=where_clause, group_by=group_by, order_by=order_by, limit=limit,
+    )
+    if plan.invalid:
+        return invalid_columns_message("Invalid columns", plan, {table_name: list(valid_columns)})
+    return plan
 
 
-@mcp.tool()
-def query_joined_views(
+def plan_joined_query(
     select_columns: list[str],
     from_table: str,
     join_tables: list[str],
-    where_clause: str | None = None,
-    group_by: list[str] | None = None,
-    order_by: str | None = None,
-    limit: int = 200
-) -> str:
-    """Perform inner joins across multiple views using item_id as the join key. 
-    Supports filtering, grouping, and selecting columns across views."""
-    if isinstance(group_by, str):
-        try:
-            group_by = json.loads(group_by)
-        except Exception:
-            group_by = [group_by]
-    if isinstance(order_by, str):
-        try:
-            order_by = json.loads(order_by)
-        except Exception:
-            pass
+    where_clause: str | None,
+    group_by: list[str] | None,
+    order_by: str | None,
+    limit: int,
+    join_conditions: dict[str, str] | None,
+) -> QueryPlan | str:
+    """Validate query_joined_views arguments into a QueryPlan, or return the message saying why they are invalid."""
+    group_by, order_by = parse_clause_lists(group_by, order_by)
 
     #if from_table not in ALLOWED_VIEWS:
     #    return f"Invalid base table: {from_table}"
     #if any(tbl not in ALLOWED_VIEWS for tbl in join_tables):
     #    return f"One or more join tables are invalid."
 
-    full_table_name = f"main.prod_gold.{from_table}"
+    if isinstance(join_conditions, str):
+        try:
+            join_conditions = json.loads(join_conditions)
+        except Exception:
+            return "join_conditions must be an object mapping a view to its ON condition."
+    join_conditions = join_conditions or {}
+
+    try:
+        join_plan = get_relationship_graph().plan(from_table, join_tables)
+    except Exception as e:
+        return f"Error planning join: {e}"
+    views = join_plan.tables + join_plan.unreachable
+
     #valid_columns = get_valid_columns_for(full_table_name)
-    ensure_table_metadata([from_table] + join_tables)
-    context_table_meta = context.get("table_metadata", {})
+    context_table_meta = ensure_table_metadata(views)
     valid_columns = set()
-    for view in [from_table] + join_tables:
+    for view in views:
         valid_columns.update(context_table_meta.get(view, []))
 
-    invalid = [col for col in select_columns if not is_valid_sql_column(col, valid_columns, join_tables + [from_table])]
-
-    if invalid:
-        return f"Invalid select columns: {invalid}"
+    joins = [Join(step.table, join_conditions.get(step.table, step.on)) for step in join_plan.steps]
+    for table in join_plan.unreachable:
+        if table in join_conditions:
+            joins.append(Join(table, join_conditions[table]))
+        elif all("item_id" in context_table_meta.get(view, []) for view in (from_table, table)):
+            joins.append(Join(table, f"{from_table}.item_id = {table}.item_id"))
+        else:
+            return (
+                f"No join path from {from_table} to {table} in key_relationships and no shared item_id column. "
+                f"Pass join_conditions={{\"{table}\": \"<condition>\"}} to join it explicitly."
+            )
+
+    if where_clause:
+        where_clause = clean_where_clause(where_clause)
+    plan = build_query(
+        select_columns, from_table, valid_columns,
+        joins=joins,
+        where=where_clause, group_by=group_by, order_by=order_by, limit=limit,
+        # A bare item_id refers to the first joined view that has one
+        item_id_table=next((view for view in views if "item_id" in context_table_meta.get(view, [])), from_table),
+    )
+    if plan.invalid:
+        return invalid_columns_message("Invalid select columns", plan, {
+            view: context_table_meta.get(view, []) for view in views
+        })
+    return plan
 
-    try:
-        select_columns = [disambiguate_column(col, from_table) for col in select_columns]
-        select_str = ", ".join(select_columns)
-        query = f"SELECT {select_str} FROM {full_table_name}"
 
-        for join_table in join_tables:
-            if join_table == from_table:
-                continue
-            query += f" INNER JOIN main.prod_gold.{join_table} ON {from_table}.item_id = {join_table}.item_id"
+@mcp.tool()
+def query_single_view(
+    table_name: str,
+    columns: list[str] = ["*"],
+    where_clause: str | None = None,
+    group_by: list[str] | None = None,
+    order_by: str | None = None,
+    limit: int = 200,
+    page_size: int | None = None,
+    output_format: str | None = None
+) -> str:
+    """
+    Query a single table view using filters, grouping, and aggregation logic. 
+    Use this when a join is not required and the data resides in a single view.
+    Set page_size to return the first page of a large result plus a page_token for fetch_next_page;
+    limit then caps the total rows across all pages.
+    output_format is one of csv (default), tsv, json (column-oriented), markdown or rows.
+    Queries estimated to scan too much may be refused with suggested filters, or limited to a recent date range.
+    For slow queries that may exceed the client's timeout, use submit_query instead.
+    """
+    output_format = output_format or default_output_format
+    if output_format not in OUTPUT_FORMATS:
+        return f"Invalid output_format: {output_format}. Use one of: {', '.join(OUTPUT_FORMATS)}"
 
-        if where_clause:
-            where_clause = clean_where_clause(where_clause)
-            query += f" WHERE {where_clause}"
+    plan = plan_single_view_query(table_name, columns, where_clause, group_by, order_by, limit)
+    if isinstance(plan, str):
+        return plan
 
-        has_aggregates = any(re.search(r"\b(COUNT|SUM|AVG|MIN|MAX)\s*\(", col, re.IGNORECASE) for col in select_columns)
-        group_by_final = set(group_by or []) | (set(extract_groupable_columns(select_columns)) if has_aggregates else set())
-        if has_aggregates and group_by_final:
-            query += f" GROUP BY {', '.join(group_by_final)}"
+    try:
+        checked = preflight(plan)
+        if checked.rejection:
+            return checked.rejection
+        plan = checked.plan
+        query = plan.to_sql()
+
+        if page_size:
+            results, page_token = result_pager.open(query, page_size, limit, current_session_id())
+            output = format_page(results, page_token, output_format)
+        else:
+            results, cached_age = run_query(query, plan)
+            output = format_output(results, cached_age, output_format)
+    except Exception as e:
+        return f"Error querying {table_name}: {e}"
 
-        if order_by:
-            query += f" ORDER BY {order_by}"
-        query += f" LIMIT {limit}"
+    record_query(current_session_id(), {
+        "table_name": table_name,
+        "columns": plan.columns,
+        "filters": extract_filters(plan.where),
+        "sql": query,
+    })
+    return f"{checked.note}\n{output}" if checked.note else output
 
-        with get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute(query)
-            results = cursor.fetchall()
-
-        context.add_query({
-            "tables": [from_table] + join_tables,
-            "columns": select_columns,
-            "filters": extract_filters(where_clause),
-            "join": f"{from_table} + {join_tables}",
-            "sql": query,
-        })
 
-        return "\n".join(str(row) for row in results) if results else "No results found."
+@mcp.tool()
+def query_joined_views(
+    select_columns: list[str],
+    from_table: str,
+    join_tables: list[str],
+    where_clause: str | None = None,
+    group_by: list[str] | None = None,
+    order_by: str | None = None,
+    limit: int = 200,
+    page_size: int | None = None,
+    output_format: str | None = None,
+    join_conditions: dict[str, str] | None = None
+) -> str:
+    """Perform inner joins across multiple views. Join keys come from key_relationships (see plan_join),
+    adding intermediate views when two views are only related through a third; views with no known
+    relationship are joined on item_id. Pass join_conditions ({view: "ON condition"}) to override a join.
+    Supports filtering, grouping, and selecting columns across views.
+    Set page_size to page through large results with fetch_next_page.
+    output_format is one of csv (default), tsv, json (column-oriented), markdown or rows.
+    Queries estimated to scan too much may be refused with suggested filters, or limited to a recent date range.
+    For slow queries that may exceed the client's timeout, use submit_query instead."""
+    output_format = output_format or default_output_format
+    if output_format not in OUTPUT_FORMATS:
+        return f"Invalid output_format: {output_format}. Use one of: {', '.join(OUTPUT_FORMATS)}"
+
+    plan = plan_joined_query(
+        select_columns, from_table, join_tables, where_clause, group_by, order_by, limit, join_conditions,
+    )
+    if isinstance(plan, str):
+        return plan
 
+    try:
+        checked = preflight(plan)
+        if checked.rejection:
+            return checked.rejection
+        plan = checked.plan
+        query = plan.to_sql()
+
+        if page_size:
+            results, page_token = result_pager.open(query, page_size, limit, current_session_id())
+            output = format_page(results, page_token, output_format)
+        else:
+            results, cached_age = run_query(query, plan)
+            output = format_output(results, cached_age, output_format)
     except Exception as e:
         return f"Error performing join: {e}"
 
+    record_query(current_session_id(), {
+        "tables": plan.tables,
+        "columns": plan.columns,
+        "filters": extract_filters(plan.where),
+        "join": f"{from_table} + {join_tables}",
+        "sql": query,
+    })
+    return f"{checked.note}\n{output}" if checked.note else output
+
 @mcp.tool()
 def list_table_relationships(source_table: str) -> list[dict[str, str]]:
+    if metadata_store.ready:
+        return metadata_store.relationships_for(source_table)
+
     query = """
         SELECT source_table, foreign_key, primary_key_table, primary_key, relationship
         FROM main.ai_data_assets.key_relationships
@@ -486,16 +1112,462 @@ def list_table_relationships(source_table: str) -> list[dict[str, str]]:
 
 
 
+@mcp.tool()
+def plan_join(from_table: str, join_tables: list[str]) -> dict[str, Any]:
+    """
+    Plan how to join views using the key_relationships catalog, without querying the warehouse.
+    Returns each join in order with its ON condition, any intermediate views needed to connect
+    the requested ones, alternative conditions where two views are related more than one way,
+    and views with no known relationship. query_joined_views applies the same plan.
+    """
+    try:
+        return get_relationship_graph().plan(from_table, join_tables).to_dict()
+    except Exception as e:
+        return {"error": f"Error planning join: {e}"}
+
+
+@mcp.tool()
+def refresh_metadata_snapshot(force: bool = False) -> dict[str, Any]:
+    """
+    Refresh the local snapshot of the view, column and relationship catalog.
+    Only catalog tables that changed are reloaded unless `force` is set. Use this if a view or column was just added.
+    """
+    try:
+        return metadata_store.refresh(force=force) | {"status": metadata_store.status()}
+    except Exception as e:
+        return {"error": f"Error refreshing metadata snapshot: {e}", "status": metadata_store.status()}
+
+
+@mcp.tool()
+def fetch_next_page(page_token: str, page_size: int | None = None, output_format: str | None = None) -> str:
+    """
+    Fetch the next page of a paginated query_single_view or query_joined_views result.
+    Pass the page_token from the previous page. Tokens expire after a few idle minutes.
+    """
+    output_format = output_format or default_output_format
+    if output_format not in OUTPUT_FORMATS:
+        return f"Invalid output_format: {output_format}. Use one of: {', '.join(OUTPUT_FORMATS)}"
+    try:
+        rows, next_token = result_pager.next_page(page_token, page_size, current_session_id())
+    except KeyError:
+        return "Unknown or expired page_token. Re-run the query with page_size to start over."
+    except Exception as e:
+        return f"Error fetching next page: {e}"
+    return format_page(rows, next_token, output_format)
+
+
+@mcp.tool()
+def submit_query(
+    table_name: str,
+    columns: list[str] = ["*"],
+    join_tables: list[str] | None = None,
+    where_clause: str | None = None,
+    group_by: list[str] | None = None,
+    order_by: str | None = None,
+    limit: int = 10000,
+    join_conditions: dict[str, str] | None = None
+) -> dict[str, Any]:
+    """
+    Start a query in the background and return its job_id immediately. Use this instead of
+    query_single_view / query_joined_views for heavy rollups (e.g. over item_account_bidding) that may
+    take longer than the tool timeout. Arguments are the same as those tools; pass join_tables to join.
+    limit is capped at 100,000 rows by default; use export_query for larger results.
+    Then poll get_query_status(job_id), read rows with get_query_result(job_id), or stop it with cancel_query(job_id).
+    """
+    capped = limit is None or limit <= 0 or limit > job_max_rows
+    if capped:
+        limit = job_max_rows
+    if join_tables:
+        plan = plan_joined_query(
+            columns, table_name, join_tables, where_clause, group_by, order_by, limit, join_conditions,
+        )
+    else:
+        plan = plan_single_view_query(table_name, columns, where_clause, group_by, order_by, limit)
+    if isinstance(plan, str):
+        return {"error": plan}
+    checked = preflight(plan)
+    if checked.rejection:
+        return {"error": checked.rejection}
+    plan = checked.plan
+
+    query = plan.to_sql()
+    cached = result_cache.get(canonicalize(query))
+    metrics.cache_lookup(cached is not None)
+    session_id = current_session_id()
+    try:
+        job = job_manager.submit(
+            session_id, query, {"tables": plan.tables, "sql": query},
+            cached=cached.result if cached is not None else None,
+        )
+    except QuotaExceeded as e:
+        return {"error": f"Error submitting query: {e} Wait for a job to finish or cancel one with cancel_query."}
+
+    record_query(session_id, {
+        "tables": plan.tables,
+        "columns": plan.columns,
+        "filters": extract_filters(plan.where),
+        "sql": query,
+    })
+    status = job.status()
+    if capped:
+        status["note"] = f"limit capped at {job_max_rows} rows; use export_query for the full result."
+    if checked.note:
+        status["preflight"] = checked.note
+    return status
+
+
+@mcp.tool()
+def get_query_status(job_id: str | None = None) -> dict[str, Any]:
+    """
+    State of a job started with submit_query: queued, running, succeeded (with its row count), failed
+    (with the error) or cancelled, plus how long it has queued and run. Without a job_id, lists this session's jobs.
+    """
+    if not job_id:
+        return {"jobs": [job.status() for job in job_manager.jobs_for(current_session_id())]}
+    try:
+        return job_manager.get(job_id, current_session_id()).status()
+    except KeyError:
+        return {"error": f"Unknown or expired job_id: {job_id}"}
+
+
+@mcp.tool()
+def get_query_result(
+    job_id: str,
+    offset: int = 0,
+    page_size: int | None = None,
+    output_format: str | None = None
+) -> str:
+    """
+    Rows of a finished submit_query job, one page at a time starting at `offset`.
+    Results are kept for a while after the job finishes, so pages can be re-read in any order.
+    output_format is one of csv (default), tsv, json (column-oriented), markdown or rows.
+    """
+    output_format = output_format or default_output_format
+    if output_format not in OUTPUT_FORMATS:
+        return f"Invalid output_format: {output_format}. Use one of: {', '.join(OUTPUT_FORMATS)}"
+    try:
+        job = job_manager.get(job_id, current_session_id())
+    except KeyError:
+        return f"Unknown or expired job_id: {job_id}. Submit the query again."
+    if job.state == FAILED:
+        return f"Error in query job {job_id}: {job.error}"
+    if job.state == CANCELLED:
+        return f"Query job {job_id} was cancelled."
+    if job.result is None:
+        return f"Query job {job_id} is still {job.state}. Poll get_query_status and try again."
+
+    page_size = page_size or job_page_size
+    page = job.result.slice(max(offset, 0), page_size)
+    metrics.add_rows(page.num_rows)
+    output = format_output(page, None, output_format)
+    next_offset = max(offset, 0) + page_size
+    if next_offset < job.result.num_rows:
+        output += (
+            f"\nRows {offset}-{next_offset - 1} of {job.result.num_rows}. "
+            f'More rows available. Call get_query_result with job_id="{job_id}", offset={next_offset}.'
+        )
+    return output
+
+
+@mcp.tool()
+def cancel_query(job_id: str) -> dict[str, Any]:
+    """Cancel a submit_query job: queued jobs never start, running ones are cancelled on the warehouse."""
+    try:
+        job = job_manager.cancel(job_id, current_session_id())
+    except KeyError:
+        return {"error": f"Unknown or expired job_id: {job_id}"}
+    return job.status() | {"cancel_requested": job.cancel_requested}
+
+
+# Exported files; each export streams from a pooled warehouse session, one batch in memory at a time
+export_dir = os.getenv("EXPORT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "exports"))
+export_batch_rows = int(os.getenv("EXPORT_BATCH_ROWS", "10000"))
+# Exports are deleted after EXPORT_RETENTION_SECONDS, and the oldest first beyond EXPORT_MAX_BYTES in total
+export_retention_seconds = float(os.getenv("EXPORT_RETENTION_SECONDS", "86400"))
+export_max_bytes = int(os.getenv("EXPORT_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+@mcp.tool()
+def export_query(
+    table_name: str,
+    columns: list[str] = ["*"],
+    join_tables: list[str] | None = None,
+    where_clause: str | None = None,
+    group_by: list[str] | None = None,
+    order_by: str | None = None,
+    limit: int | None = None,
+    join_conditions: dict[str, str] | None = None,
+    file_format: str = "csv",
+    file_name: str | None = None,
+) -> dict[str, Any]:
+    """
+    Export a full query result to a file instead of returning rows inline. Use this for report-sized
+    results (up to hundreds of thousands of rows). Arguments are the same as query_single_view /
+    query_joined_views (pass join_tables to join); limit defaults to no limit.
+    file_format is csv, parquet or xlsx (xlsx stops at Excel's 1,048,576-row sheet limit).
+    Returns the file path, row count, columns and a five-row preview. Files are deleted after a day,
+    or sooner when the export directory fills up, so copy anything worth keeping.
+    """
+    if file_format not in EXPORT_FORMATS:
+        return {"error": f"Unknown file_format {file_format!r}. Use one of: {', '.join(EXPORT_FORMATS)}."}
+    if join_tables:
+        plan = plan_joined_query(
+            columns, table_name, join_tables, where_clause, group_by, order_by, limit, join_conditions,
+        )
+    else:
+        plan = plan_single_view_query(table_name, columns, where_clause, group_by, order_by, limit)
+    if isinstance(plan, str):
+        return {"error": plan}
+    checked = preflight(plan)
+    if checked.rejection:
+        return {"error": checked.rejection}
+    plan = checked.plan
+    query = plan.to_sql()
+
+    path = export_path(export_dir, file_name or "_".join(plan.tables), file_format)
+    started = time.perf_counter()
+    try:
+        # A pooled session, held (with this call's admission slot) for the whole stream
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query)
+            export = export_cursor(cursor, path, file_format, export_batch_rows)
+    except Exception as e:
+        return {"error": f"Error exporting query: {str(e)}", "sql": query}
+    finally:
+        prune_exports(export_dir, export_retention_seconds, export_max_bytes, keep=path)
+
+    record_query(current_session_id(), {
+        "tables": plan.tables,
+        "columns": plan.columns,
+        "filters": extract_filters(plan.where),
+        "sql": query,
+    })
+    preview = export.pop("preview")
+    export |= {
+        "seconds": round(time.perf_counter() - started, 2),
+        "preview": preview.format("csv") if preview.num_rows else "No results found.",
+        "sql": query,
+    }
+    if export["truncated"]:
+        export["note"] = "Stopped at the xlsx sheet limit; export as csv or parquet for the full result."
+    if checked.note:
+        export["preflight"] = checked.note
+    return export
+
+
+# Query specs per run_query_batch call, and how many of them run at once
+batch_max_queries = int(os.getenv("BATCH_MAX_QUERIES", "20"))
+batch_max_concurrency = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+BATCH_SPEC_KEYS = {
+    "id", "table_name", "from_table", "columns", "select_columns", "join_tables", "where_clause",
+    "group_by", "order_by", "limit", "join_conditions", "output_format",
+}
+
+def plan_batch_spec(spec: dict[str, Any]) -> QueryPlan | str:
+    """Plan one run_query_batch spec, in query_single_view or query_joined_views argument shape."""
+    unknown = set(spec) - BATCH_SPEC_KEYS
+    if unknown:
+        return f"Unknown arguments: {', '.join(sorted(unknown))}"
+    table_name = spec.get("table_name") or spec.get("from_table")
+    if not table_name:
+        return "Each query needs a table_name (or from_table)."
+    columns = spec.get("columns") or spec.get("select_columns") or ["*"]
+    limit = spec.get("limit", 200)
+    if spec.get("join_tables"):
+        return plan_joined_query(
+            columns, table_name, spec["join_tables"], spec.get("where_clause"), spec.get("group_by"),
+            spec.get("order_by"), limit, spec.get("join_conditions"),
+        )
+    return plan_single_view_query(
+        table_name, columns, spec.get("where_clause"), spec.get("group_by"), spec.get("order_by"), limit,
+    )
+
+@mcp.tool()
+def run_query_batch(
+    queries: list[dict[str, Any]],
+    max_concurrency: int | None = None,
+    output_format: str | None = None
+) -> dict[str, Any]:
+    """
+    Run several independent queries in one call, e.g. the totals, top buyers and category breakdown of a
+    report. Each item of queries takes the query_single_view arguments (table_name, columns, where_clause,
+    group_by, order_by, limit) or, with join_tables, the query_joined_views ones, plus an optional id and
+    output_format. All are validated first; valid ones then run concurrently (up to max_concurrency, fewer when
+    the warehouse is busy).
+    Returns results keyed by id (default q1, q2, ...), each with its output or error and its timing.
+    One failing query does not stop the others.
+    """
+    if not isinstance(queries, list) or not queries:
+        return {"error": "queries must be a non-empty list of query specs."}
+    if len(queries) > batch_max_queries:
+        return {"error": f"At most {batch_max_queries} queries per batch; split the rest into another call."}
+    output_format = output_format or default_output_format
+    workers = max(1, min(max_concurrency or batch_max_concurrency, batch_max_concurrency, connection_pool.max_size))
+    started = time.perf_counter()
+
+    order: list[str] = []
+    specs: dict[str, dict[str, Any]] = {}
+    results: dict[str, dict[str, Any]] = {}
+    for i, spec in enumerate(queries, start=1):
+        spec_id = str(spec.get("id") or f"q{i}") if isinstance(spec, dict) else f"q{i}"
+        if spec_id in order:
+            spec_id = f"{spec_id}_{i}"
+        order.append(spec_id)
+        if not isinstance(spec, dict):
+            results[spec_id] = {"error": "A query spec must be an object of query tool arguments."}
+        elif (spec.get("output_format") or output_format) not in OUTPUT_FORMATS:
+            results[spec_id] = {"error": f"Invalid output_format. Use one of: {', '.join(OUTPUT_FORMATS)}"}
+        else:
+            specs[spec_id] = spec
+
+    # One pass over the metadata: every view the batch names is loaded together, then each spec plans from the cache
+    views = {
+        view for spec in specs.values()
+        for view in [spec.get("table_name") or spec.get("from_table"), *(spec.get("join_tables") or [])]
+        if isinstance(view, str) and view
+    }
+    try:
+        ensure_table_metadata(sorted(views))
+    except Exception:
+        pass  # reported per spec by the planning below
+    plans: dict[str, QueryPlan] = {}
+    notes: dict[str, str] = {}
+    for spec_id, spec in specs.items():
+        try:
+            plan = plan_batch_spec(spec)
+            if not isinstance(plan, str):
+                checked = preflight(plan)
+                plan = checked.rejection or checked.plan
+                if checked.note:
+                    notes[spec_id] = checked.note
+        except Exception as e:
+            plan = f"Error planning query: {e}"
+        if isinstance(plan, str):
+            results[spec_id] = {"error": plan}
+        else:
+            plans[spec_id] = plan
+
+    def execute(plan: QueryPlan) -> tuple[Result, float | None, float]:
+        query_started = time.perf_counter()
+        with metrics.sub_call():
+            result, cached_age = run_query(plan.to_sql(), plan)
+        return result, cached_age, time.perf_counter() - query_started
+
+    session_id = current_session_id()
+    # This call already holds one admission slot; further threads only get slots that are free right now
+    with warehouse_executor.extra_slots(min(workers, len(plans)) - 1) as extra, metrics.phase("execute"):
+        workers = 1 + extra
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="query-batch") as executor:
+            futures = {
+                spec_id: executor.submit(contextvars.copy_context().run, execute, plan)
+                for spec_id, plan in plans.items()
+            }
+            for spec_id, future in futures.items():
+                plan = plans[spec_id]
+                try:
+                    result, cached_age, seconds = future.result()
+                except Exception as e:
+                    results[spec_id] = {"error": f"Error executing query: {str(e)}", "sql": plan.to_sql()}
+                    continue
+                output = format_output(result, cached_age, specs[spec_id].get("output_format") or output_format)
+                results[spec_id] = {
+                    "rows": result.num_rows,
+                    "seconds": round(seconds, 3),
+                    "cached": cached_age is not None,
+                    "output": f"{notes[spec_id]}\n{output}" if spec_id in notes else output,
+                }
+                record_query(session_id, {
+                    "tables": plan.tables,
+                    "columns": plan.columns,
+                    "filters": extract_filters(plan.where),
+                    "sql": plan.to_sql(),
+                })
+
+    failed = sum(1 for r in results.values() if "error" in r)
+    return {
+        "results": {spec_id: results[spec_id] for spec_id in order},
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "max_concurrency": workers,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+@mcp.tool()
+def invalidate_query_cache(view: str | None = None) -> dict[str, Any]:
+    """
+    Drop cached query results and view profiles so the next query reads fresh data from the warehouse.
+    Pass a view name to invalidate only results that read that view and its profile, or nothing to clear everything.
+    """
+    if view:
+        removed = result_cache.invalidate_where(lambda key: view.lower() in key[1])
+        profiles = profile_cache.invalidate_where(lambda key: key[0].lower() == view.lower())
+    else:
+        removed = len(result_cache)
+        profiles = len(profile_cache)
+        result_cache.clear()
+        profile_cache.clear()
+    return {"invalidated": removed, "profiles_invalidated": profiles, "cache": result_cache.stats()}
+
+
 @mcp.tool()
 def fetch_recent_query_context(
-    max_queries: int = 3
+    max_queries: int = 3,
+    query_intent: str | None = None,
 ) -> dict[str, Any]:
     """
     Return the current session’s recent query context — including views, columns, filters, 
     joins, and SQLs — to help the assistant generate follow-up queries that build on prior interactions.
+    Pass the follow-up question as query_intent (e.g. "average sale price by state for trucks") to get
+    only the max_queries past queries and the views, columns and filters most relevant to it;
+    without it, the most recent ones are returned.
+    """
+    context = get_context(current_session_id())
+    return context.get_relevant_context(query_intent, k=max_queries)
+
+
+def server_gauges() -> list[tuple[str, dict[str, str], float]]:
+    gauges = [(f"pool_{k}", {}, v) for k, v in connection_pool.snapshot().items() if isinstance(v, (int, float))]
+    gauges += [(f"executor_{k}", {}, v) for k, v in warehouse_executor.stats.items()]
+    for warehouse, admission in warehouse_executor.admission.items():
+        gauges += [(f"admission_{k}", {"warehouse": warehouse}, v) for k, v in admission.snapshot().items() if isinstance(v, (int, float))]
+    gauges += [(f"coalescing_{k}", {}, v) for k, v in query_flight.snapshot().items()]
+    for cache in (result_cache, allowed_views_cache, valid_columns_cache, table_columns_cache, column_index_cache, relationship_graph_cache, profile_cache, query_preflight.cache):
+        for k, v in cache.stats().items():
+            if isinstance(v, (int, float)):
+                gauges.append((f"cache_{k}", {"cache": cache.name}, v))
+    gauges += [(f"sessions_{k}", {}, v) for k, v in SESSION_CONTEXTS.snapshot().items() if isinstance(v, (int, float))]
+    gauges += [(f"pagination_{k}", {}, v) for k, v in result_pager.snapshot().items()]
+    gauges += [(f"jobs_{k}", {}, v) for k, v in job_manager.snapshot().items()]
+    gauges += [(f"subsumption_{k}", {}, v) for k, v in result_subsumption.snapshot().items()]
+    return gauges
+
+
+@mcp.tool()
+def get_server_metrics(tool: str | None = None) -> dict[str, Any]:
+    """
+    Server performance metrics over the recent window: per-tool call counts and outcomes, latency percentiles,
+    time split into queue / connect / execute / fetch / local / format / server phases, rows and response bytes,
+    and result-cache hits; plus connection pool, executor, admission queue, request coalescing, cache,
+    pagination, query job, session and startup warm-up statistics.
+    Pass a tool name to see only that tool.
     """
-    return context.get_relevant_context("default") | {
-        "recent_queries": context.recent_queries[-max_queries:]
+    return server_metrics.snapshot(tool) | {
+        "pool": connection_pool.snapshot(),
+        "executor": dict(warehouse_executor.stats),
+        "admission": {warehouse: admission.snapshot() for warehouse, admission in warehouse_executor.admission.items()},
+        "coalescing": query_flight.snapshot(),
+        "caches": {
+            cache.name: cache.stats()
+            for cache in (result_cache, allowed_views_cache, valid_columns_cache, table_columns_cache, column_index_cache, relationship_graph_cache, profile_cache)
+        },
+        "pagination": result_pager.snapshot(),
+        "jobs": job_manager.snapshot(),
+        "subsumption": result_subsumption.snapshot(),
+        "preflight": query_preflight.snapshot(),
+        "sessions": SESSION_CONTEXTS.snapshot(),
+        "metadata_snapshot": metadata_store.status(),
+        "startup": dict(warmup_status),
     }
 
 
@@ -513,8 +1585,26 @@ def list_available_tools() -> list[dict[str, Any]]:
 
 import sys
 
+def http_app():
+    """The SSE app, plus a Prometheus text endpoint at METRICS_PATH (set it empty to disable)."""
+    from starlette.responses import PlainTextResponse
+    from starlette.routing import Route
+
+    app = mcp.sse_app()
+    metrics_path = os.getenv("METRICS_PATH", "/metrics")
+    if metrics_path:
+        async def prometheus(request):
+            return PlainTextResponse(
+                server_metrics.prometheus_text(server_gauges()),
+                media_type="text/plain; version=0.0.4",
+            )
+        app.router.routes.append(Route(metrics_path, endpoint=prometheus))
+    return app
+
 if __name__ == "__main__":
     if len(sys.argv) > 1 and sys.argv[1] == "http":
-        mcp.run(transport="http")
+        import uvicorn
+
+        uvicorn.run(http_app(), host=mcp.settings.host, port=mcp.settings.port, log_level=mcp.settings.log_level.lower())
     else:
         mcp.run(transport="stdio")
\ No newline at end of file
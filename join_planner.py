@@ -0,0 +1,159 @@
+# join_planner.py
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+MAX_CACHED_PLANS = 1024
+
+
+@dataclass(frozen=True)
+class Relationship:
+    """One key_relationships row: source_table.foreign_key references primary_key_table.primary_key."""
+
+    source_table: str
+    foreign_key: str
+    primary_key_table: str
+    primary_key: str
+    relationship: str | None = None
+
+    def other(self, table: str) -> str:
+        return self.primary_key_table if table == self.source_table else self.source_table
+
+    @property
+    def condition(self) -> str:
+        # Composite keys are listed comma-separated in the same order on both sides
+        foreign = [c.strip() for c in self.foreign_key.split(",")]
+        primary = [c.strip() for c in self.primary_key.split(",")]
+        return " AND ".join(
+            f"{self.source_table}.{f} = {self.primary_key_table}.{p}" for f, p in zip(foreign, primary)
+        )
+
+    def to_dict(self) -> dict[str, str | None]:
+        return {
+            "source_table": self.source_table,
+            "foreign_key": self.foreign_key,
+            "primary_key_table": self.primary_key_table,
+            "primary_key": self.primary_key,
+            "relationship": self.relationship,
+        }
+
+
+@dataclass
+class JoinStep:
+    table: str
+    on: str
+    via: Relationship | None
+    # False for tables the planner added to connect the requested ones
+    requested: bool = True
+    # Other conditions that would also connect this table to the tables joined before it
+    alternatives: list[str] = field(default_factory=list)
+
+
+@dataclass
+class JoinPlan:
+    from_table: str
+    steps: list[JoinStep] = field(default_factory=list)
+    unreachable: list[str] = field(default_factory=list)
+
+    @property
+    def tables(self) -> list[str]:
+        return [self.from_table] + [step.table for step in self.steps]
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "from_table": self.from_table,
+            "joins": [
+                {
+                    "table": step.table,
+                    "on": step.on,
+                    "requested": step.requested,
+                    "relationship": step.via.relationship if step.via else None,
+                    "alternatives": step.alternatives,
+                }
+                for step in self.steps
+            ],
+            "unreachable": self.unreachable,
+        }
+
+
+class RelationshipGraph:
+    """
+    Undirected graph of views connected by key_relationships rows, built once per metadata snapshot.
+    Plans are the shortest join paths (fewest joins) connecting the requested views and are memoized.
+    """
+
+    def __init__(self, rows: Iterable[Any]):
+        self._edges: dict[str, list[Relationship]] = {}
+        for row in rows:
+            if isinstance(row, dict):
+                row = (row["source_table"], row["foreign_key"], row["primary_key_table"], row["primary_key"], row.get("relationship"))
+            rel = Relationship(*row[:5])
+            if not (rel.source_table and rel.primary_key_table and rel.foreign_key and rel.primary_key):
+                continue
+            self._edges.setdefault(rel.source_table, []).append(rel)
+            if rel.primary_key_table != rel.source_table:
+                self._edges.setdefault(rel.primary_key_table, []).append(rel)
+        # Same-named keys first (item_id = item_id), then alphabetically, so plans are deterministic
+        for edges in self._edges.values():
+            edges.sort(key=lambda r: (r.foreign_key != r.primary_key, r.source_table, r.primary_key_table, r.foreign_key))
+        self._plans: dict[tuple[str, tuple[str, ...]], JoinPlan] = {}
+
+    def __len__(self) -> int:
+        return sum(len(edges) for edges in self._edges.values()) // 2
+
+    def relationships_for(self, table: str) -> list[Relationship]:
+        return list(self._edges.get(table, []))
+
+    def _path(self, joined: list[str], target: str) -> list[tuple[str, Relationship]] | None:
+        """Shortest path from any already-joined table to `target`, as (table, edge) steps."""
+        previous: dict[str, tuple[str, Relationship] | None] = {table: None for table in joined}
+        queue = deque(joined)
+        while queue:
+            table = queue.popleft()
+            if table == target:
+                path = []
+                while previous[table] is not None:
+                    parent, edge = previous[table]
+                    path.append((table, edge))
+                    table = parent
+                return path[::-1]
+            for edge in self._edges.get(table, ()):
+                neighbour = edge.other(table)
+                if neighbour not in previous:
+                    previous[neighbour] = (table, edge)
+                    queue.append(neighbour)
+        return None
+
+    def plan(self, from_table: str, join_tables: list[str]) -> JoinPlan:
+        """
+        Connect `join_tables` to `from_table` with as few joins as possible.
+        The nearest remaining table is joined next, adding any intermediate views on its path.
+        """
+        targets = tuple(dict.fromkeys(t for t in join_tables if t != from_table))
+        key = (from_table, targets)
+        if key in self._plans:
+            return self._plans[key]
+
+        plan = JoinPlan(from_table)
+        joined = [from_table]
+        remaining = list(targets)
+        while remaining:
+            paths = {target: self._path(joined, target) for target in remaining}
+            reachable = [target for target in remaining if paths[target] is not None]
+            if not reachable:
+                plan.unreachable = remaining
+                break
+            target = min(reachable, key=lambda t: len(paths[t]))
+            for table, edge in paths[target]:
+                alternatives = [
+                    other.condition for other in self._edges.get(table, ())
+                    if other is not edge and other.other(table) in joined
+                ]
+                plan.steps.append(JoinStep(table, edge.condition, edge, table in targets, alternatives))
+                joined.append(table)
+            remaining = [t for t in remaining if t not in joined]
+
+        if len(self._plans) >= MAX_CACHED_PLANS:
+            self._plans.clear()
+        self._plans[key] = plan
+        return plan
@@ -0,0 +1,62 @@
+# lazy_imports.py
+import importlib
+import importlib.util
+from types import ModuleType
+from typing import Any
+
+# Every stand-in created, so a warm-up can import them all ahead of the first tool call
+_REGISTERED: list["LazyModule"] = []
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on its first attribute access, keeping heavy imports
+    (sqlglot, pyarrow, the Databricks connector) off the server's startup path. Attributes are
+    copied onto the stand-in as they are used, so later lookups cost a plain attribute read.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module: ModuleType | None = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def load(self) -> ModuleType:
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str) -> Any:
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        value = getattr(self.load(), attr)
+        setattr(self, attr, value)
+        return value
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self._name!r}{' (loaded)' if self.loaded else ''}>"
+
+
+def lazy_module(name: str, optional: bool = False) -> LazyModule | None:
+    """
+    A LazyModule for `name`. With `optional`, None when the package is not installed, so callers can
+    keep their `if module is None` fallbacks without importing it; otherwise a missing package raises
+    ModuleNotFoundError on first use.
+    """
+    if optional and importlib.util.find_spec(name.partition(".")[0]) is None:
+        return None
+    module = LazyModule(name)
+    _REGISTERED.append(module)
+    return module
+
+
+def load_all() -> list[str]:
+    """Import every registered module that is not loaded yet; returns their names."""
+    loaded = []
+    for module in list(_REGISTERED):
+        if not module.loaded:
+            module.load()
+            loaded.append(module._name)
+    return loaded
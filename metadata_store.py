@@ -0,0 +1,258 @@
+# metadata_store.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable
+
+from column_index import ColumnIndex
+from join_planner import RelationshipGraph
+
+CATALOG_SCHEMA = "main.ai_data_assets"
+
+# Catalog tables mirrored locally, with the columns kept for each
+SNAPSHOT_TABLES = {
+    "all_table_description_metadata": ["table_name", "description", "usage"],
+    "all_column_metadata": ["source_table", "column_name", "description", "data_type", "example_value", "table_view"],
+    "key_relationships": ["source_table", "foreign_key", "primary_key_table", "primary_key", "relationship"],
+}
+
+SNAPSHOT_INDEXES = {
+    "all_column_metadata": "source_table",
+    "key_relationships": "source_table",
+}
+
+
+def _as_list(value: Any) -> list[str]:
+    """Normalize an ARRAY column as returned by the connector (list, numpy array or JSON text)."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return [value]
+        if isinstance(value, str):
+            return [value]
+    return [str(v) for v in value]
+
+
+class _SnapshotIndex:
+    """Immutable in-memory lookups built from one snapshot. Swapped atomically on refresh."""
+
+    def __init__(self, rows: dict[str, list[tuple]]):
+        self.views = [
+            {"view": r[0], "description": r[1], "usage": r[2]}
+            for r in rows.get("all_table_description_metadata", [])
+        ]
+
+        self.columns_by_view: dict[str, list[dict[str, Any]]] = {}
+        self.allowed_views: set[str] = set()
+        seen = set()
+        for source_table, column_name, description, data_type, example_value, table_view in rows.get("all_column_metadata", []):
+            for full_view_name in _as_list(table_view):
+                self.allowed_views.add(full_view_name.split(".")[-1].lower())
+            key = (source_table, column_name, description, data_type, example_value)
+            if key in seen:
+                continue
+            seen.add(key)
+            self.columns_by_view.setdefault(source_table, []).append({
+                "column_name": column_name,
+                "description": description,
+                "data_type": data_type,
+                "example_value": example_value,
+            })
+
+        self.column_index = ColumnIndex(self.columns_by_view)
+
+        self.relationships_by_source: dict[str, list[dict[str, str]]] = {}
+        for r in rows.get("key_relationships", []):
+            self.relationships_by_source.setdefault(r[0], []).append({
+                "source_table": r[0],
+                "foreign_key": r[1],
+                "primary_key_table": r[2],
+                "primary_key": r[3],
+                "relationship": r[4],
+            })
+        self.join_graph = RelationshipGraph(rows.get("key_relationships", []))
+
+
+class MetadataStore:
+    """
+    Local snapshot of the `main.ai_data_assets` catalog tables.
+    Rows are persisted to a SQLite file for warm starts and served from in-memory indexes.
+    A refresh only reloads tables whose version fingerprint changed since the last snapshot.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        get_connection: Callable,
+        refresh_seconds: float = 3600,
+        max_age_seconds: float = 86400,
+    ):
+        self.path = path
+        self.get_connection = get_connection
+        self.refresh_seconds = refresh_seconds
+        self.max_age_seconds = max_age_seconds
+        self._index: _SnapshotIndex | None = None
+        self._versions: dict[str, tuple[str, float]] = {}
+        self._refresh_lock = threading.Lock()
+        self._refresher: threading.Thread | None = None
+        self._stop = threading.Event()
+        self.last_refresh: float | None = None
+        self.last_error: str | None = None
+        self.reload_listeners: list[Callable[[list[str]], None]] = []
+
+    @property
+    def ready(self) -> bool:
+        return self._index is not None
+
+    def _open_db(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.path)
+        db.execute("CREATE TABLE IF NOT EXISTS snapshot_versions (table_name TEXT PRIMARY KEY, version TEXT, loaded_at REAL)")
+        for table, columns in SNAPSHOT_TABLES.items():
+            db.execute(f"CREATE TABLE IF NOT EXISTS {table} ({', '.join(columns)})")
+            if column := SNAPSHOT_INDEXES.get(table):
+                db.execute(f"CREATE INDEX IF NOT EXISTS {table}_{column} ON {table} ({column})")
+        return db
+
+    def _read_rows(self, db: sqlite3.Connection) -> dict[str, list[tuple]]:
+        return {
+            table: db.execute(f"SELECT {', '.join(columns)} FROM {table}").fetchall()
+            for table, columns in SNAPSHOT_TABLES.items()
+        }
+
+    def load_from_disk(self) -> bool:
+        """Warm start from the last persisted snapshot. Returns False if there is none."""
+        if not os.path.exists(self.path):
+            return False
+        try:
+            with self._refresh_lock:
+                db = self._open_db()
+                try:
+                    versions = {
+                        table: (version, loaded_at)
+                        for table, version, loaded_at in db.execute("SELECT table_name, version, loaded_at FROM snapshot_versions")
+                    }
+                    if set(versions) != set(SNAPSHOT_TABLES):
+                        return False
+                    rows = self._read_rows(db)
+                finally:
+                    db.close()
+                self._versions = versions
+                self._index = _SnapshotIndex(rows)
+                self.last_refresh = min(loaded_at for _, loaded_at in versions.values())
+            return True
+        except sqlite3.Error as e:
+            self.last_error = f"Could not read metadata snapshot: {e}"
+            return False
+
+    def _fingerprint(self, cursor, table: str) -> str:
+        """Cheap version check: the Delta version if available, otherwise the row count."""
+        try:
+            cursor.execute(f"DESCRIBE HISTORY {CATALOG_SCHEMA}.{table} LIMIT 1")
+            return f"version:{cursor.fetchall()[0][0]}"
+        except Exception:
+            cursor.execute(f"SELECT COUNT(*) FROM {CATALOG_SCHEMA}.{table}")
+            return f"rows:{cursor.fetchall()[0][0]}"
+
+    def refresh(self, force: bool = False) -> dict[str, Any]:
+        """Reload catalog tables whose fingerprint changed (or all of them when `force` is set)."""
+        with self._refresh_lock:
+            now = time.time()
+            reloaded = {}
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                for table, columns in SNAPSHOT_TABLES.items():
+                    version = self._fingerprint(cursor, table)
+                    previous = self._versions.get(table)
+                    if (
+                        not force
+                        and previous is not None
+                        and previous[0] == version
+                        and now - previous[1] < self.max_age_seconds
+                    ):
+                        continue
+                    cursor.execute(f"SELECT {', '.join(columns)} FROM {CATALOG_SCHEMA}.{table}")
+                    reloaded[table] = (version, [
+                        tuple(json.dumps(_as_list(v)) if c == "table_view" else v for c, v in zip(columns, row))
+                        for row in cursor.fetchall()
+                    ])
+
+            if reloaded or self._index is None:
+                db = self._open_db()
+                try:
+                    with db:
+                        for table, (version, rows) in reloaded.items():
+                            placeholders = ", ".join("?" for _ in SNAPSHOT_TABLES[table])
+                            db.execute(f"DELETE FROM {table}")
+                            db.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+                            db.execute("INSERT OR REPLACE INTO snapshot_versions VALUES (?, ?, ?)", (table, version, now))
+                    rows = self._read_rows(db)
+                finally:
+                    db.close()
+                self._index = _SnapshotIndex(rows)
+                for table, (version, _) in reloaded.items():
+                    self._versions[table] = (version, now)
+
+            self.last_refresh = now
+            self.last_error = None
+            result = {"reloaded": sorted(reloaded), "versions": {t: v for t, (v, _) in self._versions.items()}}
+
+        if reloaded:
+            for listener in self.reload_listeners:
+                listener(result["reloaded"])
+        return result
+
+    def start_background_refresh(self):
+        """Refresh on a daemon thread now and then every `refresh_seconds`."""
+        def run():
+            while True:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    self.last_error = f"Metadata snapshot refresh failed: {e}"
+                if self._stop.wait(self.refresh_seconds):
+                    return
+
+        if self._refresher is None:
+            self._refresher = threading.Thread(target=run, name="metadata-snapshot-refresh", daemon=True)
+            self._refresher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "path": self.path,
+            "last_refresh": self.last_refresh,
+            "last_error": self.last_error,
+            "versions": {t: v for t, (v, _) in self._versions.items()},
+            "views": len(self._index.views) if self._index else 0,
+        }
+
+    def list_views(self) -> list[dict[str, str]]:
+        return list(self._index.views)
+
+    def columns_for(self, views: list[str], limit: int = 200) -> dict[str, list[dict[str, Any]]]:
+        return {view: self._index.columns_by_view.get(view, [])[:limit] for view in views}
+
+    def relationships_for(self, source_table: str) -> list[dict[str, str]]:
+        return list(self._index.relationships_by_source.get(source_table, []))
+
+    @property
+    def column_index(self) -> ColumnIndex:
+        return self._index.column_index
+
+    @property
+    def join_graph(self) -> RelationshipGraph:
+        return self._index.join_graph
+
+    def allowed_views(self) -> set[str]:
+        return set(self._index.allowed_views)
+
+    def column_names(self, source_table: str) -> set[str]:
+        return {col["column_name"] for col in self._index.columns_by_view.get(source_table, [])}
@@ -0,0 +1,278 @@
+# metrics.py
+import contextvars
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+# Upper bounds for the cumulative (Prometheus-style) buckets
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (0, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+class RollingHistogram:
+    """
+    Quantiles over the last `window_seconds` (at most `max_samples` observations),
+    plus cumulative bucket counts and totals since start for Prometheus.
+    """
+
+    def __init__(self, buckets: tuple[float, ...], window_seconds: float = 300, max_samples: int = 2048):
+        self.buckets = buckets
+        self.window_seconds = window_seconds
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.total = 0.0
+        self._samples: deque[tuple[float, float]] = deque(maxlen=max_samples)
+
+    def observe(self, value: float, now: float):
+        self.count += 1
+        self.total += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[i] += 1
+                break
+        self._samples.append((now, value))
+
+    def summary(self, now: float) -> dict[str, float]:
+        while self._samples and now - self._samples[0][0] > self.window_seconds:
+            self._samples.popleft()
+        values = sorted(v for _, v in self._samples)
+        if not values:
+            return {"count": 0}
+
+        def quantile(q: float) -> float:
+            return values[min(len(values) - 1, int(q * len(values)))]
+
+        return {
+            "count": len(values),
+            "mean": sum(values) / len(values),
+            "p50": quantile(0.5),
+            "p95": quantile(0.95),
+            "p99": quantile(0.99),
+            "max": values[-1],
+        }
+
+
+class CallMetrics:
+    """Per tool call accounting. Phases are exclusive: a nested phase pauses the one around it."""
+
+    def __init__(self, tool: str, started: float):
+        self.tool = tool
+        self.started = started
+        self.phases: dict[str, float] = {}
+        self.rows = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # Per-query accounting of work fanned out to other threads (see `sub_call`)
+        self.subcalls: list["CallMetrics"] = []
+        self._stack: list[list[Any]] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        now = time.perf_counter()
+        if self._stack:
+            outer = self._stack[-1]
+            self.add_phase(outer[0], now - outer[1])
+        entry = [name, now]
+        self._stack.append(entry)
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self._stack.pop()
+            self.add_phase(name, now - entry[1])
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def add_phase(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def merge(self, subcall: "CallMetrics"):
+        """Count a finished sub-call's rows and cache use towards this call and keep its phases."""
+        with self._lock:
+            self.rows += subcall.rows
+            self.cache_hits += subcall.cache_hits
+            self.cache_misses += subcall.cache_misses
+            self.subcalls.append(subcall)
+
+
+_current_call: contextvars.ContextVar[CallMetrics | None] = contextvars.ContextVar("current_call", default=None)
+# perf_counter() when an async handler queued the call for the executor
+queued_since: contextvars.ContextVar[float | None] = contextvars.ContextVar("queued_since", default=None)
+
+
+class MetricsRegistry:
+    """Thread-safe rolling histograms and counters keyed by metric name and labels."""
+
+    def __init__(self, window_seconds: float = 300, max_samples: int = 2048):
+        self.window_seconds = window_seconds
+        self.max_samples = max_samples
+        self.started_at = time.time()
+        self._histograms: dict[tuple[str, tuple], RollingHistogram] = {}
+        self._counters: dict[tuple[str, tuple], float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, buckets: tuple[float, ...] = SECONDS_BUCKETS, **labels: str):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = RollingHistogram(buckets, self.window_seconds, self.max_samples)
+            histogram.observe(value, time.monotonic())
+
+    def inc(self, name: str, amount: float = 1, **labels: str):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def record_call(self, call: CallMetrics, seconds: float, response_bytes: int | None, outcome: str):
+        tool = call.tool
+        self.inc("tool_calls_total", tool=tool, outcome=outcome)
+        self.observe("tool_seconds", seconds, tool=tool)
+        for phase, spent in call.phases.items():
+            self.observe("tool_phase_seconds", spent, tool=tool, phase=phase)
+        # Time not spent in any instrumented phase: validation, planning, our own bookkeeping
+        self.observe("tool_phase_seconds", max(seconds - sum(call.phases.values()), 0.0), tool=tool, phase="server")
+        if call.rows:
+            self.observe("tool_rows", call.rows, SIZE_BUCKETS, tool=tool)
+        if response_bytes is not None:
+            self.observe("tool_response_bytes", response_bytes, SIZE_BUCKETS, tool=tool)
+        if call.cache_hits:
+            self.inc("tool_cache_hits_total", call.cache_hits, tool=tool)
+        if call.cache_misses:
+            self.inc("tool_cache_misses_total", call.cache_misses, tool=tool)
+        for subcall in call.subcalls:
+            for phase, spent in subcall.phases.items():
+                self.observe("tool_query_phase_seconds", spent, tool=tool, phase=phase)
+
+    def snapshot(self, tool: str | None = None) -> dict[str, Any]:
+        """Rolling-window summaries per tool: latency, phase breakdown, rows, bytes, outcomes and cache use."""
+        now = time.monotonic()
+        tools: dict[str, dict[str, Any]] = {}
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                labels = dict(labels)
+                if tool and labels.get("tool") != tool:
+                    continue
+                entry = tools.setdefault(labels["tool"], {})
+                if name == "tool_calls_total":
+                    entry.setdefault("calls", {})[labels["outcome"]] = int(value)
+                else:
+                    entry[name.removeprefix("tool_").removesuffix("_total")] = int(value)
+            for (name, labels), histogram in self._histograms.items():
+                labels = dict(labels)
+                if tool and labels.get("tool") != tool:
+                    continue
+                summary = {k: round(v, 6) if isinstance(v, float) else v for k, v in histogram.summary(now).items()}
+                entry = tools.setdefault(labels["tool"], {})
+                if name == "tool_phase_seconds":
+                    entry.setdefault("phase_seconds", {})[labels["phase"]] = summary
+                elif name == "tool_query_phase_seconds":
+                    entry.setdefault("query_phase_seconds", {})[labels["phase"]] = summary
+                else:
+                    entry[name.removeprefix("tool_")] = summary
+        return {"window_seconds": self.window_seconds, "uptime_seconds": round(time.time() - self.started_at), "tools": tools}
+
+    def prometheus_text(self, gauges: list[tuple[str, dict[str, str], float]] = (), prefix: str = "databricks_mcp") -> str:
+        """Counters, cumulative histograms and the given point-in-time gauges in the Prometheus text format."""
+        def label_text(labels: tuple, extra: tuple = ()) -> str:
+            pairs = [f'{k}="{str(v)}"' for k, v in labels + extra]
+            return "{" + ",".join(pairs) + "}" if pairs else ""
+
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            typed = set()
+            for (name, labels), value in counters:
+                if name not in typed:
+                    lines.append(f"# TYPE {prefix}_{name} counter")
+                    typed.add(name)
+                lines.append(f"{prefix}_{name}{label_text(labels)} {value:g}")
+            for (name, labels), histogram in histograms:
+                if name not in typed:
+                    lines.append(f"# TYPE {prefix}_{name} histogram")
+                    typed.add(name)
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                    cumulative += count
+                    lines.append(f"{prefix}_{name}_bucket{label_text(labels, (('le', f'{bound:g}'),))} {cumulative}")
+                lines.append(f"{prefix}_{name}_bucket{label_text(labels, (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{prefix}_{name}_sum{label_text(labels)} {histogram.total:g}")
+                lines.append(f"{prefix}_{name}_count{label_text(labels)} {histogram.count}")
+        for name, labels, value in gauges:
+            if name not in typed:
+                lines.append(f"# TYPE {prefix}_{name} gauge")
+                typed.add(name)
+            lines.append(f"{prefix}_{name}{label_text(tuple(sorted(labels.items())))} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def sub_call() -> Iterator[CallMetrics | None]:
+    """
+    Account work a tool call runs on another thread (one query of run_query_batch) to a call of its own:
+    concurrent threads cannot share the parent's phase stack. On exit its rows and cache use are added
+    to the parent, and its phases are recorded per query. A no-op outside a call.
+    """
+    parent = _current_call.get()
+    if parent is None:
+        yield None
+        return
+    call = CallMetrics(parent.tool, time.perf_counter())
+    token = _current_call.set(call)
+    try:
+        yield call
+    finally:
+        _current_call.reset(token)
+        parent.merge(call)
+
+
+def current_call() -> CallMetrics | None:
+    return _current_call.get()
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Attribute the enclosed time to `name` in the current tool call (a no-op outside a call)."""
+    call = _current_call.get()
+    if call is None:
+        yield
+        return
+    with call.phase(name):
+        yield
+
+
+def add_rows(rows: int):
+    if call := _current_call.get():
+        call.rows += rows
+
+
+def cache_lookup(hit: bool):
+    if call := _current_call.get():
+        if hit:
+            call.cache_hits += 1
+        else:
+            call.cache_misses += 1
+
+
+@contextmanager
+def tool_call(tool: str) -> Iterator[CallMetrics | None]:
+    """
+    Track one tool call in the current context. Tools called from inside another tool
+    (e.g. metadata loads during a query) are accounted to the outer call.
+    """
+    if _current_call.get() is not None:
+        yield None
+        return
+    now = time.perf_counter()
+    call = CallMetrics(tool, queued_since.get() or now)
+    if call.started < now:
+        call.add_phase("queue", now - call.started)
+    token = _current_call.set(call)
+    try:
+        yield call
+    finally:
+        _current_call.reset(token)
@@ -0,0 +1,199 @@
+# query_builder.py
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from lazy_imports import lazy_module
+
+sqlglot = lazy_module("sqlglot")
+exp = lazy_module("sqlglot.expressions")
+
+DIALECT = "databricks"
+
+
+@lru_cache(maxsize=4096)
+def _parse(sql: str) -> exp.Expression | None:
+    try:
+        return sqlglot.parse_one(sql, read=DIALECT)
+    except sqlglot.errors.ParseError:
+        return None
+
+
+def parse_expression(sql: str) -> exp.Expression | None:
+    """Parse a SQL fragment through the shared LRU cache. Returns a private copy, or None if unparsable."""
+    tree = _parse(sql.strip())
+    return tree.copy() if tree is not None else None
+
+
+def parse_cache_info() -> dict[str, dict[str, int]]:
+    def info(cached) -> dict[str, int]:
+        stats = cached.cache_info()
+        return {"hits": stats.hits, "misses": stats.misses, "size": stats.currsize, "max_size": stats.maxsize}
+
+    return {"parse": info(_parse), "select_items": info(analyze_select_item)}
+
+
+def is_aggregate(tree: exp.Expression) -> bool:
+    """True if the expression aggregates rows (an aggregate function outside any window)."""
+    return any(agg.find_ancestor(exp.Window) is None for agg in tree.find_all(exp.AggFunc))
+
+
+@dataclass(frozen=True)
+class SelectItem:
+    """One analysed select expression: rendered SQL, its GROUP BY form and the columns it reads."""
+
+    source: str
+    sql: str
+    group_key: str
+    aggregate: bool = False
+    # (table, column) pairs; table is "" for unqualified references
+    columns: tuple[tuple[str, str], ...] = ()
+    parsed: bool = True
+
+
+@lru_cache(maxsize=4096)
+def analyze_select_item(source: str, item_id_table: str | None = None) -> SelectItem:
+    """
+    Parse and analyse one select expression, cached per (expression, item_id table).
+    When `item_id_table` is set, a bare item_id is qualified with it so joins stay unambiguous.
+    """
+    tree = parse_expression(source)
+    if tree is None:
+        # Unparsable fragments are passed through to the warehouse as written
+        return SelectItem(source, source, source, parsed=False)
+    columns = list(tree.find_all(exp.Column))
+    if item_id_table:
+        for column in columns:
+            if column.name.upper() == "ITEM_ID" and not column.table:
+                column.set("this", exp.to_identifier("item_id"))
+                column.set("table", exp.to_identifier(item_id_table))
+    return SelectItem(
+        source=source,
+        sql=tree.sql(dialect=DIALECT),
+        group_key=tree.unalias().sql(dialect=DIALECT),
+        aggregate=is_aggregate(tree),
+        columns=tuple((column.table, column.name) for column in columns),
+    )
+
+
+@dataclass
+class Join:
+    table: str
+    on: str
+
+
+@dataclass
+class QueryPlan:
+    """A validated query, built once from the tool arguments and reused for every later stage."""
+
+    from_table: str
+    items: list[SelectItem]
+    joins: list[Join] = field(default_factory=list)
+    where: str | None = None
+    group_by: list[str] = field(default_factory=list)
+    order_by: str | None = None
+    limit: int | None = None
+    invalid: list[str] = field(default_factory=list)
+    # The offending column references inside the invalid expressions, e.g. "sale_prce" or "nope.item_id"
+    unknown_columns: list[str] = field(default_factory=list)
+    schema: str = "main.prod_gold"
+
+    @property
+    def columns(self) -> list[str]:
+        return [item.sql for item in self.items]
+
+    @property
+    def has_aggregates(self) -> bool:
+        return any(item.aggregate for item in self.items)
+
+    @property
+    def tables(self) -> list[str]:
+        return [self.from_table] + [join.table for join in self.joins]
+
+    def to_sql(self) -> str:
+        sql = f"SELECT {', '.join(self.columns)} FROM {self.schema}.{self.from_table}"
+        for join in self.joins:
+            sql += f" INNER JOIN {self.schema}.{join.table} ON {join.on}"
+        if self.where:
+            sql += f" WHERE {self.where}"
+        if self.group_by:
+            sql += f" GROUP BY {', '.join(self.group_by)}"
+        if self.order_by:
+            sql += f" ORDER BY {self.order_by}"
+        if self.limit is not None:
+            sql += f" LIMIT {self.limit}"
+        return sql
+
+
+def _unknown_columns(item: SelectItem, valid_columns: set[str], allowed_tables: list[str]) -> list[str]:
+    return [
+        f"{table}.{name}" if table else name
+        for table, name in item.columns
+        if not (table in allowed_tables if table else name in valid_columns)
+    ]
+
+
+def _normalize_clause(clause: str | None) -> str | None:
+    """Render a WHERE / GROUP BY fragment through sqlglot when it parses; otherwise pass it through verbatim."""
+    if not clause:
+        return clause
+    tree = parse_expression(clause)
+    return tree.sql(dialect=DIALECT) if tree is not None else clause
+
+
+def _normalize_order(order_by: str | list[str] | None) -> str | None:
+    if not order_by:
+        return None
+    if isinstance(order_by, list):
+        order_by = ", ".join(order_by)
+    tree = _parse(f"SELECT 1 ORDER BY {order_by}")
+    order = tree.args.get("order") if tree is not None else None
+    if order is None:
+        return order_by
+    return ", ".join(o.sql(dialect=DIALECT) for o in order.expressions)
+
+
+def build_query(
+    select: list[str],
+    from_table: str,
+    valid_columns: set[str],
+    joins: list[Join] | None = None,
+    where: str | None = None,
+    group_by: list[str] | None = None,
+    order_by: str | list[str] | None = None,
+    limit: int | None = None,
+    item_id_table: str | None = None,
+) -> QueryPlan:
+    """
+    Turn tool arguments into a QueryPlan in a single pass over the select list.
+    Each expression is parsed and analysed once (and cached), and that analysis is used for
+    validation, item_id disambiguation, aggregate detection, GROUP BY derivation and rendering.
+    A bare item_id is qualified with `item_id_table` when set, so joins stay unambiguous.
+    """
+    joins = joins or []
+    allowed_tables = [from_table] + [join.table for join in joins]
+    items, invalid, unknown = [], [], []
+    for source in select:
+        item = analyze_select_item(source.strip(), item_id_table)
+        if bad := _unknown_columns(item, valid_columns, allowed_tables):
+            invalid.append(source)
+            unknown.extend(bad)
+            continue
+        items.append(item)
+
+    plan = QueryPlan(
+        from_table=from_table,
+        items=items,
+        joins=[join for join in joins if join.table != from_table],
+        where=_normalize_clause(where),
+        order_by=_normalize_order(order_by),
+        limit=limit,
+        invalid=invalid,
+        unknown_columns=list(dict.fromkeys(unknown)),
+    )
+    if plan.has_aggregates:
+        keys = [_normalize_clause(g) for g in group_by or []]
+        keys += [item.group_key for item in items if not item.aggregate]
+        plan.group_by = list(dict.fromkeys(keys))
+    return plan
@@ -1,59 +1,394 @@
 # query_context_manager.py
-from collections import defaultdict
+from collections import OrderedDict, deque
 from typing import Any
+import atexit
+import hashlib
+import heapq
+import json
+import logging
+import math
+import os
 import re
+import threading
+import time
 
 # Session-scoped context container
-default_context_max = 5
+default_context_max = int(os.getenv("SESSION_HISTORY_MAX", "20"))
+# Remembered per session: most used recent views, columns and filtered columns
+default_item_max = int(os.getenv("SESSION_CONTEXT_MAX_ITEMS", "32"))
+# Weight kept per recorded query, so a column used five queries ago counts about a third
+RECENCY_DECAY = 0.8
+# Rough bytes per remembered view, column, filter or join besides its text, for the memory estimate
+ITEM_OVERHEAD_BYTES = 64
+
+logger = logging.getLogger(__name__)
+
+_TERM = re.compile(r"[a-z0-9]+(?:_[a-z0-9]+)*")
+_STOPWORDS = frozenset({
+    "a", "an", "and", "as", "asc", "at", "between", "by", "desc", "distinct", "for", "from", "group",
+    "how", "in", "is", "join", "like", "limit", "me", "not", "null", "of", "on", "or", "order", "per",
+    "select", "show", "the", "to", "what", "where", "which", "with",
+})
+
+
+def terms(text: str) -> set[str]:
+    """Lowercase search terms: identifiers whole and split at underscores, with plurals also singular."""
+    found = set()
+    for token in _TERM.findall(text.lower()):
+        for term in (token, *token.split("_")) if "_" in token else (token,):
+            if len(term) < 2 or term in _STOPWORDS:
+                continue
+            found.add(term)
+            if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+                found.add(term[:-1])
+    return found
+
+
+class RecentItems:
+    """
+    Up to `max_items` keys (views, columns, filtered columns), each with an optional value and a use
+    count that decays by RECENCY_DECAY per recorded query, so keys used often and lately rank first.
+    When a new key does not fit, the lowest-ranked one is dropped.
+    """
+
+    def __init__(self, max_items: int = default_item_max):
+        self.max_items = max_items
+        # key -> (weight at last use, tick of last use, value)
+        self._items: dict[str, tuple[float, int, Any]] = {}
+
+    def weight(self, key: str, tick: int) -> float:
+        weight, last, _ = self._items[key]
+        return weight * RECENCY_DECAY ** (tick - last)
+
+    def add(self, key: str, tick: int, value: Any = None):
+        if key in self._items:
+            self._items[key] = (self.weight(key, tick) + 1, tick, value)
+            return
+        if len(self._items) >= self.max_items:
+            del self._items[min(self._items, key=lambda k: self.weight(k, tick))]
+        self._items[key] = (1.0, tick, value)
+
+    def value(self, key: str) -> Any:
+        return self._items[key][2]
+
+    def approx_size(self) -> int:
+        return sum(len(key) + len(str(entry[2])) + ITEM_OVERHEAD_BYTES for key, entry in self._items.items())
+
+    def ranked(self, tick: int, intent: set[str] = frozenset(), limit: int | None = None) -> list[str]:
+        """Keys matching the intent's terms first, then by decayed weight."""
+        def rank(key: str) -> tuple[int, float]:
+            return (len(intent & terms(key)) if intent else 0, self.weight(key, tick))
+        return sorted(self._items, key=rank, reverse=True)[:limit]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def to_list(self) -> list[list]:
+        return [[key, *entry] for key, entry in self._items.items()]
+
+    @classmethod
+    def from_list(cls, data: list | dict, max_items: int = default_item_max) -> "RecentItems":
+        """Also reads the plain lists / dicts older snapshots stored."""
+        items = cls(max_items)
+        if isinstance(data, dict):
+            data = [[key, 1.0, 0, value] for key, value in data.items()]
+        for entry in data:
+            key, weight, tick, value = entry if isinstance(entry, list) else (entry, 1.0, 0, None)
+            items._items[key] = (weight, tick, value)
+        return items
+
 
 class QueryContext:
-    def __init__(self, max_history: int = default_context_max):
-        self.recent_queries = []
-        self.recent_tables = set()
-        self.recent_columns = set()
-        self.filter_history = {}
-        self.join_history = []
+    """
+    A session's recent query history for follow-up questions, bounded in size however long the session:
+    the last `max_history` queries and joins, the most used recent views, columns and filters, and an
+    inverted index from search terms to the queries in the history, so retrieval can rank by intent.
+    A session's tool calls can run concurrently on executor threads, so updates and reads take a lock.
+    """
+
+    def __init__(self, max_history: int = default_context_max, max_items: int = default_item_max):
         self.max_history = max_history
+        # (sequence number, query info) per recorded query, oldest first
+        self.history: deque[tuple[int, dict[str, Any]]] = deque(maxlen=max_history)
+        self.recent_tables = RecentItems(max_items)
+        self.recent_columns = RecentItems(max_items)
+        self.filter_history = RecentItems(max_items)
+        self.join_history: deque[str] = deque(maxlen=max_history)
         self.custom = {}
+        self.tick = 0
+        # Term lists per query and posting lists per term; both stay as short as the history
+        self._terms: dict[int, tuple[str, ...]] = {}
+        self._index: dict[str, list[int]] = {}
+        # Serialized size per query in the history and their total, for the registry's memory accounting
+        self._query_bytes: dict[int, int] = {}
+        self._history_bytes = 0
+        self._lock = threading.RLock()
+
+    @property
+    def recent_queries(self) -> list[dict[str, Any]]:
+        with self._lock:
+            return [info for _, info in self.history]
+
+    @staticmethod
+    def query_terms(query_info: dict[str, Any]) -> set[str]:
+        tables = [*query_info.get("tables", []), query_info.get("table_name", "")]
+        filters = query_info.get("filters", {})
+        return terms(" ".join([
+            *tables, *query_info.get("columns", []), *filters, *map(str, filters.values()),
+            query_info.get("join") or "", query_info.get("sql", ""),
+        ]))
 
     def add_query(self, query_info: dict[str, Any]):
-        self.recent_queries.append(query_info)
-        if len(self.recent_queries) > self.max_history:
-            self.recent_queries.pop(0)
-
-        for t in query_info.get("tables", []):
-            self.recent_tables.add(t)
-        if "table_name" in query_info:
-            self.recent_tables.add(query_info["table_name"])
-
-        for c in query_info.get("columns", []):
-            self.recent_columns.add(c)
-
-        for col, val in query_info.get("filters", {}).items():
-            self.filter_history[col] = val
-
-        if join := query_info.get("join"):
-            self.join_history.append(join)
-            if len(self.join_history) > self.max_history:
-                self.join_history.pop(0)
-
-    def get_relevant_context(self, query_intent: str) -> dict[str, Any]:
-        return {
-            "recent_tables": list(self.recent_tables),
-            "recent_columns": list(self.recent_columns),
-            "filter_history": self.filter_history,
-            "relevant_joins": self.join_history,
-            "recent_queries": self.recent_queries[-3:]
-        }
+        query_terms = tuple(self.query_terms(query_info))
+        size = len(json.dumps(query_info, default=str))
+        with self._lock:
+            self.tick += 1
+            if len(self.history) == self.history.maxlen:
+                oldest, _ = self.history[0]
+                for term in self._terms.pop(oldest, ()):
+                    postings = self._index[term]
+                    postings.remove(oldest)
+                    if not postings:
+                        del self._index[term]
+                self._history_bytes -= self._query_bytes.pop(oldest, 0)
+            self.history.append((self.tick, query_info))
+            self._terms[self.tick] = query_terms
+            for term in query_terms:
+                self._index.setdefault(term, []).append(self.tick)
+            self._query_bytes[self.tick] = size
+            self._history_bytes += size
+
+            for t in query_info.get("tables", []):
+                self.recent_tables.add(t, self.tick)
+            if "table_name" in query_info:
+                self.recent_tables.add(query_info["table_name"], self.tick)
+
+            for c in query_info.get("columns", []):
+                self.recent_columns.add(c, self.tick)
+
+            for col, val in query_info.get("filters", {}).items():
+                self.filter_history.add(col, self.tick, val)
+
+            if join := query_info.get("join"):
+                self.join_history.append(join)
+
+    def rank_queries(self, intent: set[str], k: int) -> list[dict[str, Any]]:
+        """
+        The `k` history entries sharing the most distinctive terms with `intent` (IDF-weighted, ties to
+        the more recent), or the `k` most recent without intent terms.
+        """
+        if not intent:
+            return [info for _, info in list(self.history)[-k:][::-1]] if k > 0 else []
+        scores: dict[int, float] = {}
+        for term in intent:
+            postings = self._index.get(term)
+            if postings:
+                idf = math.log(1 + len(self.history) / len(postings))
+                for seq in postings:
+                    scores[seq] = scores.get(seq, 0.0) + idf
+        best = heapq.nlargest(k, scores, key=lambda seq: (scores[seq], seq))
+        entries = dict(self.history)
+        return [entries[seq] for seq in best]
+
+    def get_relevant_context(self, query_intent: str | None, k: int = 3, max_items: int = 8) -> dict[str, Any]:
+        """
+        Context for a follow-up about `query_intent`: the `k` most relevant past queries and at most
+        `max_items` views, columns and filters, intent matches first. The size stays constant as the
+        session grows. A blank intent (or "default") returns the most recent items instead.
+        """
+        intent = set() if not query_intent or query_intent == "default" else terms(query_intent)
+        with self._lock:
+            queries = self.rank_queries(intent, k)
+            joins = [q["join"] for q in queries if q.get("join")] or list(self.join_history)[-k:][::-1]
+            filters = self.filter_history.ranked(self.tick, intent, max_items)
+            return {
+                "recent_tables": self.recent_tables.ranked(self.tick, intent, max_items),
+                "recent_columns": self.recent_columns.ranked(self.tick, intent, max_items),
+                "filter_history": {col: self.filter_history.value(col) for col in filters},
+                "relevant_joins": joins[:k],
+                "recent_queries": queries,
+            }
+
     def get(self, key: str, default=None):
         return self.custom.get(key, default)
 
     def set(self, key: str, value: Any):
         self.custom[key] = value
 
+    def to_dict(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "recent_queries": self.recent_queries,
+                "recent_tables": self.recent_tables.to_list(),
+                "recent_columns": self.recent_columns.to_list(),
+                "filter_history": self.filter_history.to_list(),
+                "join_history": list(self.join_history),
+                "tick": self.tick,
+                "custom": dict(self.custom),
+            }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "QueryContext":
+        context = cls()
+        for query_info in data.get("recent_queries", []):
+            context.add_query(query_info)
+        # Restore the saved weights over the ones rebuilt from the (shorter) query history
+        context.tick = max(context.tick, data.get("tick", 0))
+        context.recent_tables = RecentItems.from_list(data.get("recent_tables", []), context.recent_tables.max_items)
+        context.recent_columns = RecentItems.from_list(data.get("recent_columns", []), context.recent_columns.max_items)
+        context.filter_history = RecentItems.from_list(data.get("filter_history", {}), context.filter_history.max_items)
+        context.join_history.extend(data.get("join_history", []))
+        context.custom = dict(data.get("custom", {}))
+        return context
+
+    def approx_size(self) -> int:
+        """
+        Approximate memory held by this context: the serialized size of its queries, tracked as they
+        are added and dropped, plus an estimate for the remembered items. Costs nothing per query.
+        """
+        with self._lock:
+            return (
+                self._history_bytes
+                + self.recent_tables.approx_size()
+                + self.recent_columns.approx_size()
+                + self.filter_history.approx_size()
+                + sum(len(join) + ITEM_OVERHEAD_BYTES for join in self.join_history)
+                + (len(json.dumps(self.custom, default=str)) if self.custom else 0)
+            )
+
+
+class SessionRegistry:
+    """
+    Per-session contexts, capped by count and approximate memory.
+    The least recently used session is evicted first, and sessions idle for `idle_seconds` expire.
+    With a `snapshot_dir`, evicted sessions are written to disk and restored on their next request,
+    and live sessions are saved at exit so they survive a restart.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 256,
+        max_bytes: int = 64 * 1024 * 1024,
+        idle_seconds: float = 4 * 3600,
+        snapshot_dir: str | None = None,
+    ):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.idle_seconds = idle_seconds
+        self.snapshot_dir = snapshot_dir
+        self._sessions: OrderedDict[str, tuple[QueryContext, float]] = OrderedDict()
+        self._sizes: dict[str, int] = {}
+        self._lock = threading.RLock()
+        self.stats = {"created": 0, "restored": 0, "evicted": 0, "expired": 0}
+        if snapshot_dir:
+            os.makedirs(snapshot_dir, exist_ok=True)
+            atexit.register(self.save_all)
+
+    def _snapshot_path(self, session_id: str) -> str:
+        digest = hashlib.sha256(session_id.encode()).hexdigest()[:32]
+        return os.path.join(self.snapshot_dir, f"{digest}.json")
+
+    def _save(self, session_id: str, context: QueryContext):
+        if not self.snapshot_dir:
+            return
+        try:
+            with open(self._snapshot_path(session_id), "w") as f:
+                json.dump({"session_id": session_id, "context": context.to_dict()}, f, default=str)
+        except OSError:
+            pass
+
+    def _restore(self, session_id: str) -> QueryContext | None:
+        if not self.snapshot_dir:
+            return None
+        path = self._snapshot_path(session_id)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("session_id") != session_id:
+            return None
+        return QueryContext.from_dict(data.get("context", {}))
+
+    def _drop(self, session_id: str, counter: str):
+        context, _ = self._sessions.pop(session_id)
+        self._sizes.pop(session_id, None)
+        self.stats[counter] += 1
+        self._save(session_id, context)
+
+    def evict(self):
+        """Expire idle sessions, then evict least recently used ones until within the count and memory caps."""
+        with self._lock:
+            now = time.monotonic()
+            while self._sessions:
+                session_id, (_, last_seen) = next(iter(self._sessions.items()))
+                if now - last_seen <= self.idle_seconds:
+                    break
+                self._drop(session_id, "expired")
+            while len(self._sessions) > self.max_sessions or (
+                len(self._sessions) > 1 and sum(self._sizes.values()) > self.max_bytes
+            ):
+                self._drop(next(iter(self._sessions)), "evicted")
+
+    def get(self, session_id: str) -> QueryContext:
+        with self._lock:
+            if session_id in self._sessions:
+                context, _ = self._sessions[session_id]
+            else:
+                context = self._restore(session_id)
+                self.stats["restored" if context else "created"] += 1
+                context = context or QueryContext()
+            self._sessions[session_id] = (context, time.monotonic())
+            self._sessions.move_to_end(session_id)
+            self.evict()
+            return context
+
+    def record_size(self, session_id: str, context: QueryContext):
+        """Refresh the memory estimate for a session after it recorded a query."""
+        with self._lock:
+            if session_id in self._sessions:
+                self._sizes[session_id] = context.approx_size()
+        self.evict()
+
+    def save_all(self):
+        with self._lock:
+            for session_id, (context, _) in self._sessions.items():
+                self._save(session_id, context)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return self.stats | {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "approx_bytes": sum(self._sizes.values()),
+            }
+
 
 # Central registry for per-session contexts
-SESSION_CONTEXTS = defaultdict(QueryContext)
+SESSION_CONTEXTS = SessionRegistry(
+    max_sessions=int(os.getenv("SESSION_MAX_COUNT", "256")),
+    max_bytes=int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024))),
+    idle_seconds=float(os.getenv("SESSION_IDLE_SECONDS", str(4 * 3600))),
+    snapshot_dir=os.getenv("SESSION_SNAPSHOT_DIR") or None,
+)
 
 def get_context(session_id: str) -> QueryContext:
-    return SESSION_CONTEXTS[session_id]
\ No newline at end of file
+    return SESSION_CONTEXTS.get(session_id)
+
+def record_query(session_id: str, query_info: dict[str, Any]):
+    """
+    Add a query to a session's history and update the registry's memory accounting.
+    Bookkeeping only: a failure is logged, never raised into the tool call that ran the query.
+    """
+    try:
+        context = SESSION_CONTEXTS.get(session_id)
+        context.add_query(query_info)
+        SESSION_CONTEXTS.record_size(session_id, context)
+    except Exception:
+        logger.exception("Could not record a query for session %s", session_id)
\ No newline at end of file
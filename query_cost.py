@@ -0,0 +1,227 @@
+# query_cost.py
+import re
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable
+
+from cache import TTLCache
+from lazy_imports import lazy_module
+from query_builder import QueryPlan, parse_expression
+from result_cache import canonicalize
+
+sqlglot = lazy_module("sqlglot")
+exp = lazy_module("sqlglot.expressions")
+
+# Preflight modes: skip it, run anyway with a note, refuse, or add a partition-date filter first
+PREFLIGHT_MODES = ("off", "warn", "reject", "narrow")
+
+_STATISTICS = re.compile(r"Statistics\(sizeInBytes=([\d.Ee+\-]+)\s*([KMGTPE]i)?B(?:,\s*rowCount=([\d.Ee+\-]+))?")
+_RELATION = re.compile(r"Relation\s+(?:[\w`]+\.)*`?(\w+)`?\[")
+_UNITS = {None: 1, "Ki": 1024, "Mi": 1024 ** 2, "Gi": 1024 ** 3, "Ti": 1024 ** 4, "Pi": 1024 ** 5, "Ei": 1024 ** 6}
+DATE_TYPES = ("DATE", "TIMESTAMP")
+_DATE_LITERAL = re.compile(r"^\d{4}-\d{2}-\d{2}")
+_DATE_FUNCTIONS = ("CurrentDate", "CurrentTimestamp", "DateSub", "DateAdd", "TsOrDsAdd", "DateTrunc", "TimestampTrunc")
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB", "TiB"):
+        if size < 1024 or unit == "TiB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+@dataclass
+class CostEstimate:
+    """Bytes and rows the optimizer expects to read, in total and per scanned view."""
+
+    scan_bytes: float
+    scan_rows: float | None
+    relations: dict[str, tuple[float, float | None]] = field(default_factory=dict)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "scan_bytes": int(self.scan_bytes),
+            "scan": format_bytes(self.scan_bytes),
+            "scan_rows": int(self.scan_rows) if self.scan_rows is not None else None,
+            "relations": {
+                view: {"bytes": int(size), "rows": int(rows) if rows is not None else None}
+                for view, (size, rows) in self.relations.items()
+            },
+        }
+
+
+def parse_explain_cost(text: str) -> CostEstimate:
+    """
+    Read the optimized logical plan printed by `EXPLAIN COST`. The leaf `Relation` nodes are what
+    gets scanned; without any (e.g. a plan printed differently) the largest node stands in for the scan.
+    """
+    relations: dict[str, tuple[float, float | None]] = {}
+    largest = (0.0, None)
+    for line in text.splitlines():
+        stats = _STATISTICS.search(line)
+        if stats is None:
+            continue
+        size = float(stats.group(1)) * _UNITS[stats.group(2)]
+        rows = float(stats.group(3)) if stats.group(3) else None
+        if size > largest[0]:
+            largest = (size, rows)
+        relation = _RELATION.search(line)
+        if relation:
+            view = relation.group(1)
+            old_size, old_rows = relations.get(view, (0.0, None))
+            relations[view] = (old_size + size, (old_rows or 0) + rows if rows is not None else old_rows)
+    if not relations:
+        return CostEstimate(*largest)
+    row_counts = [rows for _, rows in relations.values() if rows is not None]
+    return CostEstimate(
+        sum(size for size, _ in relations.values()),
+        sum(row_counts) if row_counts else None,
+        relations,
+    )
+
+
+def cost_key(query: str, partition_columns: set[str] = frozenset()) -> str:
+    """
+    Cache key for a query's scan estimate: its canonical form with literals replaced by placeholders,
+    so one shape filtered on different values shares an EXPLAIN. Literals that decide partition pruning
+    keep their values: those compared with a column in `partition_columns`, and date ranges (predicates
+    with a date literal or date function), since those change how much is scanned.
+    """
+    canonical = canonicalize(query)[0]
+    try:
+        tree = sqlglot.parse_one(canonical, read="databricks")
+    except sqlglot.errors.ParseError:
+        return canonical
+
+    def prunes(predicate) -> bool:
+        if predicate is None:
+            return False
+        if any(column.name.lower() in partition_columns for column in predicate.find_all(exp.Column)):
+            return True
+        if any(type(node).__name__ in _DATE_FUNCTIONS for node in predicate.walk()):
+            return True
+        return any(
+            literal.is_string and _DATE_LITERAL.match(literal.this) for literal in predicate.find_all(exp.Literal)
+        )
+
+    for literal in list(tree.find_all(exp.Literal)):
+        if not prunes(literal.find_ancestor(exp.Predicate)):
+            literal.replace(exp.Placeholder())
+    return tree.sql(dialect="databricks")
+
+
+@dataclass
+class PreflightOutcome:
+    plan: QueryPlan
+    estimate: CostEstimate | None = None
+    # Prepended to the tool output when the query runs
+    note: str | None = None
+    # Returned instead of running the query
+    rejection: str | None = None
+
+
+class Preflight:
+    """
+    Pre-flight cost check for generated queries: `EXPLAIN COST` through `explain`, cached by query shape
+    (`cost_key`: filter values other than partition and date ranges do not matter) so repeated shapes
+    cost one EXPLAIN per `ttl`. Queries estimated over `max_scan_bytes` or
+    `max_scan_rows` are handled per `mode`:
+
+    - warn:   run anyway, with the estimate in a note
+    - reject: return a "too expensive" message suggesting filters on the views' partition columns
+    - narrow: add `<partition column> >= date_sub(current_date(), narrow_days)` on the largest scanned
+              view that has no filter on it yet, and run if that fits the budget; otherwise reject
+
+    `partition_columns` maps a view to its partition column. Views without one fall back to their
+    DATE / TIMESTAMP columns, which usually drive data skipping on the gold layer.
+    """
+
+    def __init__(
+        self,
+        explain: Callable[[str], str],
+        mode: str = "off",
+        max_scan_bytes: float | None = None,
+        max_scan_rows: float | None = None,
+        partition_columns: dict[str, str] | None = None,
+        narrow_days: int = 90,
+        ttl: float = 3600,
+        max_size: int = 1024,
+    ):
+        if mode not in PREFLIGHT_MODES:
+            raise ValueError(f"Unknown preflight mode {mode!r}; use one of {', '.join(PREFLIGHT_MODES)}")
+        self.explain = explain
+        self.mode = mode
+        self.max_scan_bytes = max_scan_bytes
+        self.max_scan_rows = max_scan_rows
+        self.partition_columns = partition_columns or {}
+        self._partition_names = {column.lower() for column in self.partition_columns.values()}
+        self.narrow_days = narrow_days
+        self.cache = TTLCache("query_cost", max_size=max_size, ttl=ttl)
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off" and (self.max_scan_bytes is not None or self.max_scan_rows is not None)
+
+    def estimate(self, query: str) -> CostEstimate:
+        return self.cache.get_or_load(cost_key(query, self._partition_names), lambda: parse_explain_cost(self.explain(query)))
+
+    def over_budget(self, estimate: CostEstimate) -> str | None:
+        if self.max_scan_bytes is not None and estimate.scan_bytes > self.max_scan_bytes:
+            return f"would scan about {format_bytes(estimate.scan_bytes)} (limit {format_bytes(self.max_scan_bytes)})"
+        if self.max_scan_rows is not None and estimate.scan_rows is not None and estimate.scan_rows > self.max_scan_rows:
+            return f"would scan about {estimate.scan_rows:,.0f} rows (limit {self.max_scan_rows:,.0f})"
+        return None
+
+    def candidate_columns(self, plan: QueryPlan, date_columns: dict[str, list[str]]) -> dict[str, list[str]]:
+        """Partition (or date) columns per view in the query that the WHERE clause does not filter on yet."""
+        filtered = set()
+        tree = parse_expression(plan.where) if plan.where else None
+        if tree is not None:
+            filtered = {(column.table, column.name) for column in tree.find_all(exp.Column)}
+        candidates = {}
+        for view in plan.tables:
+            configured = self.partition_columns.get(view)
+            columns = [configured] if configured else date_columns.get(view, [])
+            free = [c for c in columns if (view, c) not in filtered and ("", c) not in filtered]
+            if free:
+                candidates[view] = free
+        return candidates
+
+    def check(self, plan: QueryPlan, date_columns: Callable[[], dict[str, list[str]]]) -> PreflightOutcome:
+        """Estimate `plan` and decide whether it runs as is, runs narrowed, or is refused."""
+        if not self.enabled:
+            return PreflightOutcome(plan)
+        estimate = self.estimate(plan.to_sql())
+        reason = self.over_budget(estimate)
+        if reason is None:
+            return PreflightOutcome(plan, estimate)
+        if self.mode == "warn":
+            return PreflightOutcome(plan, estimate, note=f"(preflight: this query {reason})")
+
+        candidates = self.candidate_columns(plan, date_columns())
+        if self.mode == "narrow" and candidates:
+            view = max(candidates, key=lambda v: estimate.relations.get(v, (0.0, None))[0])
+            column = candidates[view][0]
+            qualified = f"{view}.{column}" if plan.joins else column
+            condition = f"{qualified} >= DATE_SUB(CURRENT_DATE(), {self.narrow_days})"
+            narrowed = replace(plan, where=f"({plan.where}) AND {condition}" if plan.where else condition)
+            narrowed_estimate = self.estimate(narrowed.to_sql())
+            if self.over_budget(narrowed_estimate) is None:
+                return PreflightOutcome(narrowed, narrowed_estimate, note=(
+                    f"(preflight: the query {reason}, so it was limited to the last {self.narrow_days} days "
+                    f"with {condition}; add your own filter on {qualified} to choose the range)"
+                ))
+
+        hint = "; ".join(f"{view}: {', '.join(columns)}" for view, columns in candidates.items())
+        return PreflightOutcome(plan, estimate, rejection=(
+            f"Query too expensive: it {reason}. Narrow your filter"
+            + (f", e.g. a date range on {hint}" if hint else " or join fewer views")
+            + ", then try again. LIMIT does not reduce the amount scanned."
+        ))
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "max_scan_bytes": self.max_scan_bytes,
+            "max_scan_rows": self.max_scan_rows,
+            "cache": self.cache.stats(),
+        }
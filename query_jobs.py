@@ -0,0 +1,301 @@
+# query_jobs.py
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import AbstractContextManager, nullcontext
+from typing import Any, Callable
+
+from result_format import Result, fetch_result
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class QuotaExceeded(RuntimeError):
+    """The session already has as many unfinished jobs as it is allowed."""
+
+
+class QueryJob:
+    """One submitted statement, its state and, once it succeeds, its result."""
+
+    def __init__(self, job_id: str, session_id: str, sql: str, description: dict[str, Any]):
+        self.job_id = job_id
+        self.session_id = session_id
+        self.sql = sql
+        self.description = description
+        self.state = QUEUED
+        self.submitted_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.error: str | None = None
+        self.result: Result | None = None
+        self.result_bytes = 0
+        self.from_cache = False
+        self.cursor: Any = None
+        self.future: Future | None = None
+        self.cancel_requested = False
+        self.lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINISHED_STATES
+
+    def status(self) -> dict[str, Any]:
+        now = time.time()
+        status = {
+            "job_id": self.job_id,
+            "state": self.state,
+            **self.description,
+            "submitted_at": round(self.submitted_at, 3),
+            "queued_seconds": round((self.started_at or self.finished_at or now) - self.submitted_at, 3),
+        }
+        if self.started_at is not None:
+            status["running_seconds"] = round((self.finished_at or now) - self.started_at, 3)
+        if self.result is not None:
+            status["rows"] = self.result.num_rows
+            status["from_cache"] = self.from_cache
+        if self.error:
+            status["error"] = self.error
+        return status
+
+
+class JobManager:
+    """
+    Runs long queries in the background so a tool call never has to wait for them.
+
+    At most `max_workers` jobs run at once, each on its own warehouse session so it can be cancelled on
+    the warehouse without touching the shared connection pool, inside `admit()` (e.g. holding a warehouse
+    admission slot) and cancelled after `timeout_seconds`. A session may have at most `per_session_limit`
+    jobs queued or running. Finished jobs are kept for `retention_seconds` so their results can be paged
+    through, then expire; beyond `max_retained` jobs or `max_bytes` of results the oldest go first. A
+    result larger than `max_bytes` fails its job.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        max_workers: int = 4,
+        per_session_limit: int = 3,
+        retention_seconds: float = 1800,
+        max_retained: int = 64,
+        max_bytes: int = 128 * 1024 * 1024,
+        on_result: Callable[[str, Result], None] | None = None,
+        admit: Callable[[], AbstractContextManager] = nullcontext,
+        timeout_seconds: float | None = None,
+    ):
+        self.connect = connect
+        self.max_workers = max_workers
+        self.per_session_limit = per_session_limit
+        self.retention_seconds = retention_seconds
+        self.max_retained = max_retained
+        self.max_bytes = max_bytes
+        self.on_result = on_result
+        self.admit = admit
+        self.timeout_seconds = timeout_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="query-job")
+        self._jobs: OrderedDict[str, QueryJob] = OrderedDict()
+        self._lock = threading.Lock()
+        self._reaper: threading.Thread | None = None
+        self.stats = {"submitted": 0, "succeeded": 0, "failed": 0, "cancelled": 0, "rejected": 0, "expired": 0}
+
+    def submit(self, session_id: str, sql: str, description: dict[str, Any] | None = None, cached: Result | None = None) -> QueryJob:
+        """
+        Queue `sql` for `session_id`. A `cached` result completes the job immediately.
+        Raises QuotaExceeded if the session already has `per_session_limit` unfinished jobs.
+        """
+        self.evict_expired()
+        job = QueryJob(secrets.token_urlsafe(12), session_id, sql, description or {})
+        with self._lock:
+            active = sum(1 for j in self._jobs.values() if j.session_id == session_id and not j.finished)
+            if cached is None and active >= self.per_session_limit:
+                self.stats["rejected"] += 1
+                raise QuotaExceeded(
+                    f"Session already has {active} queued or running jobs (limit {self.per_session_limit})."
+                )
+            self._jobs[job.job_id] = job
+            self.stats["submitted"] += 1
+
+        if cached is not None:
+            job.result, job.from_cache = cached, True
+            job.started_at = job.finished_at = job.submitted_at
+            self._finish(job, SUCCEEDED)
+        else:
+            job.future = self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job: QueryJob):
+        try:
+            with self.admit():
+                self._execute(job)
+        except Exception as e:
+            # Not admitted, e.g. the warehouse queue is full
+            job.error = job.error or str(e)
+            job.finished_at = time.time()
+            self._finish(job, FAILED)
+
+    def _time_out(self, job: QueryJob, cursor: Any):
+        with job.lock:
+            if job.finished:
+                return
+            job.error = f"Job timed out after {self.timeout_seconds:.0f}s."
+        try:
+            cursor.cancel()
+        except Exception:
+            pass
+
+    def _execute(self, job: QueryJob):
+        with job.lock:
+            cancelled = job.cancel_requested
+            if not cancelled:
+                job.state = RUNNING
+                job.started_at = time.time()
+        if cancelled:
+            job.finished_at = time.time()
+            self._finish(job, CANCELLED)
+            return
+        connection = timer = None
+        try:
+            connection = self.connect()
+            cursor = connection.cursor()
+            with job.lock:
+                job.cursor = cursor
+                cancelled = job.cancel_requested
+            if cancelled:
+                raise RuntimeError("cancelled before execution")
+            if self.timeout_seconds:
+                timer = threading.Timer(self.timeout_seconds, self._time_out, (job, cursor))
+                timer.daemon = True
+                timer.start()
+            cursor.execute(job.sql)
+            result = fetch_result(cursor)
+        except Exception as e:
+            job.finished_at = time.time()
+            if job.cancel_requested:
+                self._finish(job, CANCELLED)
+            else:
+                job.error = job.error or str(e)
+                self._finish(job, FAILED)
+            return
+        finally:
+            if timer is not None:
+                timer.cancel()
+            job.cursor = None
+            if connection is not None:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+
+        job.finished_at = time.time()
+        size = result.nbytes
+        if size > self.max_bytes:
+            job.error = (
+                f"Result of {result.num_rows} rows ({size} bytes) is larger than the {self.max_bytes}-byte "
+                "job result budget. Narrow the query or use export_query."
+            )
+            self._finish(job, FAILED)
+            return
+        job.result, job.result_bytes = result, size
+        self._finish(job, SUCCEEDED)
+        self.evict_expired()
+        if self.on_result is not None:
+            try:
+                self.on_result(job.sql, result)
+            except Exception:
+                pass
+
+    def _finish(self, job: QueryJob, state: str):
+        with job.lock:
+            if job.finished:
+                return
+            job.state = state
+        with self._lock:
+            self.stats[state] += 1
+
+    def get(self, job_id: str, session_id: str) -> QueryJob:
+        """The job with this id submitted by `session_id`. Raises KeyError if unknown, expired or another session's."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None or job.session_id != session_id or self._expired(job, time.time()):
+            raise KeyError(job_id)
+        return job
+
+    def cancel(self, job_id: str, session_id: str) -> QueryJob:
+        """Cancel a queued job, or ask the warehouse to cancel a running one. Finished jobs are left as they are."""
+        job = self.get(job_id, session_id)
+        with job.lock:
+            if job.finished:
+                return job
+            job.cancel_requested = True
+            queued = job.state == QUEUED
+            cursor = job.cursor
+        if queued:
+            # A worker that picked the job up meanwhile sees cancel_requested before executing
+            if job.future is not None and job.future.cancel():
+                job.finished_at = time.time()
+                self._finish(job, CANCELLED)
+        elif cursor is not None:
+            try:
+                cursor.cancel()
+            except Exception:
+                pass
+        return job
+
+    def jobs_for(self, session_id: str) -> list[QueryJob]:
+        now = time.time()
+        with self._lock:
+            return [j for j in self._jobs.values() if j.session_id == session_id and not self._expired(j, now)]
+
+    def _expired(self, job: QueryJob, now: float) -> bool:
+        return job.finished and job.finished_at is not None and now - job.finished_at > self.retention_seconds
+
+    def evict_expired(self) -> int:
+        """
+        Drop finished jobs past their retention, then the oldest finished ones beyond `max_retained`
+        or while the retained results add up to more than `max_bytes`.
+        """
+        now = time.time()
+        with self._lock:
+            doomed = [job_id for job_id, job in self._jobs.items() if self._expired(job, now)]
+            finished = [job_id for job_id, job in self._jobs.items() if job.finished and job_id not in doomed]
+            excess = max(len(finished) - self.max_retained, 0)
+            doomed += finished[:excess]
+            retained_bytes = sum(self._jobs[job_id].result_bytes for job_id in finished[excess:])
+            for job_id in finished[excess:]:
+                if retained_bytes <= self.max_bytes:
+                    break
+                retained_bytes -= self._jobs[job_id].result_bytes
+                doomed.append(job_id)
+            for job_id in doomed:
+                self._jobs.pop(job_id, None)
+            self.stats["expired"] += len(doomed)
+        return len(doomed)
+
+    def start_reaper(self, interval_seconds: float = 60):
+        def run():
+            while True:
+                time.sleep(interval_seconds)
+                self.evict_expired()
+
+        if self._reaper is None:
+            self._reaper = threading.Thread(target=run, name="query-job-reaper", daemon=True)
+            self._reaper.start()
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            states = [job.state for job in self._jobs.values()]
+            return self.stats | {
+                "queued": states.count(QUEUED),
+                "running": states.count(RUNNING),
+                "retained": sum(1 for s in states if s in FINISHED_STATES),
+                "retained_bytes": sum(job.result_bytes for job in self._jobs.values()),
+                "max_bytes": self.max_bytes,
+                "max_workers": self.max_workers,
+                "timeout_seconds": self.timeout_seconds,
+            }
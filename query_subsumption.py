@@ -0,0 +1,351 @@
+# query_subsumption.py
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from lazy_imports import lazy_module
+from query_builder import DIALECT, QueryPlan, _parse, parse_expression
+from result_format import Result
+
+exp = lazy_module("sqlglot.expressions")
+# pyarrow is optional: without it every query goes to the warehouse
+pa = lazy_module("pyarrow", optional=True)
+pc = lazy_module("pyarrow.compute", optional=True)
+
+# Keyed by sqlglot expression class name, so building them does not import sqlglot
+_COMPARISONS = {
+    "EQ": "equal",
+    "NEQ": "not_equal",
+    "GT": "greater",
+    "GTE": "greater_equal",
+    "LT": "less",
+    "LTE": "less_equal",
+}
+# Aggregates evaluated locally and the Arrow hash aggregation that matches their SQL semantics
+_AGGREGATES = {"Sum": "sum", "Avg": "mean", "Min": "min", "Max": "max"}
+
+
+class NotSubsumed(Exception):
+    """The query cannot be proven to be answerable from the cached result."""
+
+
+def _conjuncts(where: str | None) -> list[exp.Expression]:
+    if not where:
+        return []
+    tree = parse_expression(where)
+    if tree is None:
+        raise NotSubsumed("unparsable WHERE clause")
+    tree = tree.unnest()
+    return list(tree.flatten()) if isinstance(tree, exp.And) else [tree]
+
+
+def _key(predicate: exp.Expression) -> str:
+    return predicate.unnest().sql(dialect=DIALECT)
+
+
+def _column_name(node: exp.Expression, table: str) -> str:
+    if not isinstance(node, exp.Column) or node.table not in ("", table):
+        raise NotSubsumed(f"not a column of {table}: {node.sql(dialect=DIALECT)}")
+    return node.name
+
+
+@dataclass(frozen=True)
+class CoveringQuery:
+    """A cached single-view result that holds every row and raw column its WHERE clause selects."""
+
+    key: Any
+    table: str
+    conjuncts: frozenset[str]
+    columns: frozenset[str]
+
+
+def covering_query(key: Any, plan: QueryPlan, result: Result) -> CoveringQuery | None:
+    """
+    Describe `plan` as a covering query if its result can answer refinements of it: one view,
+    plain columns only (no aggregates or expressions), and every matching row fetched (under the LIMIT).
+    """
+    if pa is None or result.table is None or plan.joins or plan.group_by or plan.has_aggregates:
+        return None
+    if plan.limit is not None and result.num_rows >= plan.limit:
+        return None
+    try:
+        columns = [_column_name(parse_expression(item.sql), plan.from_table) for item in plan.items]
+        conjuncts = frozenset(_key(c) for c in _conjuncts(plan.where))
+    except (NotSubsumed, AttributeError):
+        return None
+    if len(set(columns)) != len(columns) or columns != result.columns:
+        return None
+    return CoveringQuery(key, plan.from_table, conjuncts, frozenset(columns))
+
+
+class LocalEvaluator:
+    """Evaluates the supported SQL subset over an Arrow table with vectorized Arrow compute kernels."""
+
+    def __init__(self, table: Any, view: str):
+        self.table = table
+        self.view = view
+
+    def column(self, node: exp.Expression) -> Any:
+        name = _column_name(node, self.view)
+        if name not in self.table.column_names:
+            raise NotSubsumed(f"column {name} is not in the cached result")
+        return self.table[name]
+
+    def literal(self, node: exp.Expression, like: Any = None) -> Any:
+        if isinstance(node, exp.Neg) and isinstance(node.this, exp.Literal) and not node.this.is_string:
+            value = -self._number(node.this)
+        elif isinstance(node, exp.Literal):
+            value = node.this if node.is_string else self._number(node)
+        elif isinstance(node, exp.Boolean):
+            value = node.this
+        else:
+            raise NotSubsumed(f"unsupported operand: {node.sql(dialect=DIALECT)}")
+        scalar = pa.scalar(value)
+        if like is not None and pa.types.is_string(like.type) and not pa.types.is_string(scalar.type):
+            # Spark compares a string column with a number numerically, not as text
+            raise NotSubsumed("string column compared with a non-string literal")
+        if like is not None and scalar.type != like.type:
+            # Spark casts the literal to the column's type (e.g. '2024-05-01' against a DATE column)
+            try:
+                scalar = scalar.cast(like.type)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+                if not (pa.types.is_integer(scalar.type) or pa.types.is_floating(scalar.type)) or not (
+                    pa.types.is_integer(like.type) or pa.types.is_floating(like.type)
+                ):
+                    raise NotSubsumed(f"cannot compare {like.type} with {scalar.type}")
+        return scalar
+
+    @staticmethod
+    def _number(node: exp.Literal) -> int | float:
+        text = node.this
+        return float(text) if any(ch in text for ch in ".eE") else int(text)
+
+    def operand(self, node: exp.Expression, like: Any = None) -> Any:
+        node = node.unnest()
+        if isinstance(node, exp.Column):
+            return self.column(node)
+        return self.literal(node, like)
+
+    def comparison_operands(self, left: exp.Expression, right: exp.Expression) -> tuple[Any, Any]:
+        left, right = left.unnest(), right.unnest()
+        if isinstance(left, exp.Column):
+            column = self.column(left)
+            return column, self.operand(right, column)
+        if isinstance(right, exp.Column):
+            column = self.column(right)
+            return self.operand(left, column), column
+        raise NotSubsumed("comparison without a column")
+
+    def predicate(self, node: exp.Expression) -> Any:
+        """A boolean array with SQL three-valued logic: null where the predicate is unknown."""
+        node = node.unnest()
+        kind = type(node)
+        if kind.__name__ in _COMPARISONS:
+            left, right = self.comparison_operands(node.this, node.expression)
+            return getattr(pc, _COMPARISONS[kind.__name__])(left, right)
+        if kind is exp.And:
+            return pc.and_kleene(self.predicate(node.this), self.predicate(node.expression))
+        if kind is exp.Or:
+            return pc.or_kleene(self.predicate(node.this), self.predicate(node.expression))
+        if kind is exp.Not:
+            return pc.invert(self.predicate(node.this))
+        if kind is exp.Is and isinstance(node.expression, exp.Null):
+            return pc.is_null(self.column(node.this.unnest()))
+        if kind is exp.Between:
+            column = self.column(node.this.unnest())
+            low, high = self.operand(node.args["low"], column), self.operand(node.args["high"], column)
+            return pc.and_kleene(pc.greater_equal(column, low), pc.less_equal(column, high))
+        if kind is exp.In and not node.args.get("query"):
+            column = self.column(node.this.unnest())
+            values = [self.literal(v.unnest(), column) for v in node.expressions]
+            if not values:
+                raise NotSubsumed("empty IN list")
+            found = pc.is_in(column, value_set=pa.array([v.as_py() for v in values], type=column.type))
+            # x IN (...) is unknown, not false, when x is null
+            return pc.if_else(pc.is_null(column), pa.scalar(None, pa.bool_()), found)
+        if kind is exp.Like and not node.args.get("escape"):
+            column = self.column(node.this.unnest())
+            pattern = node.expression.unnest()
+            if not (isinstance(pattern, exp.Literal) and pattern.is_string) or not pa.types.is_string(column.type):
+                raise NotSubsumed("LIKE needs a string column and a literal pattern")
+            return pc.match_like(column, pattern.this)
+        raise NotSubsumed(f"unsupported predicate: {node.sql(dialect=DIALECT)}")
+
+
+def _sort_keys(order_by: str, names: list[str]) -> list[tuple[str, str, bool]]:
+    tree = _parse(f"SELECT 1 ORDER BY {order_by}")
+    order = tree.args.get("order") if tree is not None else None
+    if order is None:
+        raise NotSubsumed("unparsable ORDER BY")
+    keys = []
+    for ordered in order.expressions:
+        node = ordered.this.unnest()
+        if not isinstance(node, exp.Column) or node.name not in names:
+            raise NotSubsumed(f"ORDER BY on something other than an output column: {node.sql(dialect=DIALECT)}")
+        descending = bool(ordered.args.get("desc"))
+        nulls_first = ordered.args.get("nulls_first")
+        # Spark puts nulls first ascending and last descending unless told otherwise
+        keys.append((node.name, "descending" if descending else "ascending", not descending if nulls_first is None else nulls_first))
+    return keys
+
+
+def _sort(table: Any, keys: list[tuple[str, str, bool]]) -> Any:
+    try:
+        indices = pc.sort_indices(table, sort_keys=[
+            (name, direction, "at_start" if nulls_first else "at_end") for name, direction, nulls_first in keys
+        ])
+    except (TypeError, ValueError, pa.ArrowInvalid):
+        # Older pyarrow: one null placement for every key
+        placements = {nulls_first for name, _, nulls_first in keys if table[name].null_count}
+        if len(placements) > 1:
+            raise NotSubsumed("mixed null ordering")
+        indices = pc.sort_indices(
+            table, sort_keys=[(name, direction) for name, direction, _ in keys],
+            null_placement="at_start" if placements == {True} else "at_end",
+        )
+    return table.take(indices)
+
+
+def evaluate(plan: QueryPlan, covering: CoveringQuery, table: Any) -> Result:
+    """Answer `plan` from the covering query's Arrow table, or raise NotSubsumed."""
+    view = plan.from_table
+    if plan.joins or view != covering.table:
+        raise NotSubsumed("different views")
+    conjuncts = _conjuncts(plan.where)
+    keys = {_key(c) for c in conjuncts}
+    if not covering.conjuncts <= keys:
+        raise NotSubsumed("the query drops a filter of the cached query")
+    evaluator = LocalEvaluator(table, view)
+    residual = [c for c in conjuncts if _key(c) not in covering.conjuncts]
+    if residual:
+        mask = evaluator.predicate(residual[0])
+        for predicate in residual[1:]:
+            mask = pc.and_kleene(mask, evaluator.predicate(predicate))
+        # filter() drops rows where the mask is false or null, like WHERE
+        table = table.filter(mask)
+
+    if plan.has_aggregates:
+        group_keys = [_column_name(parse_expression(key), view) for key in plan.group_by]
+        for name in group_keys:
+            evaluator.column(exp.column(name))
+        # (column, Arrow aggregation) -> the column Arrow names its result
+        aggregations: dict[tuple[str | None, str], str] = {}
+        outputs = []
+        for item in plan.items:
+            tree = parse_expression(item.sql)
+            alias = tree.alias if isinstance(tree, exp.Alias) else None
+            node = tree.unalias()
+            if not item.aggregate:
+                name = _column_name(node, view)
+                outputs.append((name, alias or name))
+                continue
+            if not alias:
+                raise NotSubsumed("unaliased aggregate: the warehouse names it differently")
+            target, function = _aggregation(node, evaluator)
+            source = aggregations.setdefault((target, function), "count_all" if target is None else f"{target}_{function}")
+            outputs.append((source, alias))
+        grouped = table.group_by(group_keys, use_threads=False).aggregate(
+            [([] if target is None else target, function) for target, function in aggregations]
+        )
+        table = pa.table([grouped[source] for source, _ in outputs], names=[name for _, name in outputs])
+        if plan.order_by:
+            table = _sort(table, _sort_keys(plan.order_by, table.column_names))
+    else:
+        outputs = []
+        for item in plan.items:
+            tree = parse_expression(item.sql)
+            alias = tree.alias if isinstance(tree, exp.Alias) else None
+            name = _column_name(tree.unalias(), view)
+            evaluator.column(exp.column(name))
+            outputs.append((name, alias or name))
+        if plan.order_by:
+            # ORDER BY may name an output alias or any column of the view; aliases win, as in Spark
+            sources = {output: source for source, output in outputs}
+            keys = _sort_keys(plan.order_by, list(sources) + table.column_names)
+            table = _sort(table, [(sources.get(name, name), direction, nulls) for name, direction, nulls in keys])
+        table = pa.table([table[source] for source, _ in outputs], names=[name for _, name in outputs])
+
+    if plan.limit is not None:
+        table = table.slice(0, plan.limit)
+    return Result.from_arrow(table)
+
+
+def _aggregation(node: exp.Expression, evaluator: LocalEvaluator) -> tuple[str | None, str]:
+    """The (column, Arrow hash aggregation) computing an aggregate; column is None for COUNT(*)."""
+    if isinstance(node, exp.Count):
+        target = node.this
+        if isinstance(target, exp.Star):
+            return None, "count_all"
+        if isinstance(target, exp.Distinct):
+            if len(target.expressions) != 1:
+                raise NotSubsumed("COUNT(DISTINCT ...) over several columns")
+            evaluator.column(target.expressions[0])
+            return _column_name(target.expressions[0], evaluator.view), "count_distinct"
+        evaluator.column(target)
+        return _column_name(target, evaluator.view), "count"
+    function = _AGGREGATES.get(type(node).__name__)
+    if function is None or isinstance(node.this, exp.Distinct):
+        raise NotSubsumed(f"unsupported aggregate: {node.sql(dialect=DIALECT)}")
+    column = evaluator.column(node.this)
+    if function in ("sum", "mean") and not (pa.types.is_integer(column.type) or pa.types.is_floating(column.type)):
+        raise NotSubsumed(f"{function} over {column.type}")
+    return _column_name(node.this, evaluator.view), function
+
+
+class SubsumptionIndex:
+    """
+    Recent cached single-view results that can answer narrower follow-up queries locally.
+
+    A follow-up is answered from a covering result when it reads the same view, keeps every filter of
+    the cached query (and may add more), uses only cached columns, and aggregates, sorts and limits
+    with the supported functions. Anything that cannot be proven equivalent goes to the warehouse.
+    Entries are looked up in the result cache, so expiry and invalidation apply to them as well.
+    """
+
+    def __init__(self, get_cached: Callable[[Any], Any], max_entries: int = 64):
+        self.get_cached = get_cached
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Any, CoveringQuery] = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"registered": 0, "answered": 0, "not_subsumed": 0}
+
+    def register(self, key: Any, plan: QueryPlan, result: Result):
+        covering = covering_query(key, plan, result)
+        if covering is None:
+            return
+        with self._lock:
+            self._entries[key] = covering
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self.stats["registered"] += 1
+
+    def answer(self, plan: QueryPlan) -> tuple[Result, float] | None:
+        """The locally computed result of `plan` and the age of the cached result it came from, if any."""
+        if pa is None or plan.joins:
+            return None
+        with self._lock:
+            candidates = [c for c in reversed(self._entries.values()) if c.table == plan.from_table]
+        for covering in candidates:
+            cached = self.get_cached(covering.key)
+            if cached is None:
+                with self._lock:
+                    self._entries.pop(covering.key, None)
+                continue
+            try:
+                result = evaluate(plan, covering, cached.result.table)
+            except (NotSubsumed, pa.ArrowException, AttributeError, KeyError):
+                continue
+            with self._lock:
+                self.stats["answered"] += 1
+            return result, cached.age_seconds
+        with self._lock:
+            self.stats["not_subsumed"] += 1
+        return None
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return self.stats | {"entries": len(self._entries), "max_entries": self.max_entries}
@@ -0,0 +1,63 @@
+# result_cache.py
+from __future__ import annotations
+
+import re
+import time
+
+from lazy_imports import lazy_module
+from result_format import Result
+
+sqlglot = lazy_module("sqlglot")
+exp = lazy_module("sqlglot.expressions")
+
+WHITESPACE = re.compile(r"\s+")
+
+
+def _sorted_conjunction(condition: exp.Expression) -> exp.Expression:
+    """Rebuild an AND chain with its predicates in a stable order."""
+    predicates = sorted(condition.flatten() if isinstance(condition, exp.And) else [condition], key=lambda p: p.sql())
+    return exp.and_(*predicates, copy=False) if len(predicates) > 1 else predicates[0]
+
+
+def canonicalize(sql: str) -> tuple[str, frozenset[str]]:
+    """
+    Canonical form of a generated query plus the views it reads.
+    Whitespace, unquoted identifier case, AND-predicate order and GROUP BY order are normalized
+    so trivially reformatted queries share a cache entry. Output aliases keep their case.
+    """
+    try:
+        tree = sqlglot.parse_one(sql, read="databricks")
+    except sqlglot.errors.ParseError:
+        return WHITESPACE.sub(" ", sql).strip(), frozenset()
+
+    for identifier in tree.find_all(exp.Identifier):
+        if identifier.quoted or isinstance(identifier.parent, (exp.Alias, exp.TableAlias)):
+            continue
+        identifier.set("this", identifier.this.lower())
+
+    for select in tree.find_all(exp.Select):
+        for clause in ("where", "having"):
+            node = select.args.get(clause)
+            if node is not None:
+                node.set("this", _sorted_conjunction(node.this))
+        group = select.args.get("group")
+        if group is not None and group.expressions:
+            group.set("expressions", sorted(group.expressions, key=lambda e: e.sql()))
+
+    tables = frozenset(table.name.lower() for table in tree.find_all(exp.Table))
+    return tree.sql(dialect="databricks"), tables
+
+
+class CachedResult:
+    """The result of one canonical query, with when it was fetched."""
+
+    __slots__ = ("result", "created_at", "size")
+
+    def __init__(self, result: Result):
+        self.result = result
+        self.created_at = time.monotonic()
+        self.size = result.nbytes
+
+    @property
+    def age_seconds(self) -> float:
+        return time.monotonic() - self.created_at
@@ -0,0 +1,207 @@
+# result_export.py
+import csv
+import datetime
+import decimal
+import os
+import re
+import time
+from typing import Any, Iterator
+
+from lazy_imports import lazy_module
+from metrics import add_rows, phase
+from result_format import Result, fetch_result, pa
+
+pa_csv = lazy_module("pyarrow.csv", optional=True)
+pq = lazy_module("pyarrow.parquet", optional=True)
+
+# File formats accepted by export_query
+EXPORT_FORMATS = ("csv", "parquet", "xlsx")
+# Worksheet rows Excel can open, header included
+XLSX_MAX_ROWS = 1_048_576
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def export_path(directory: str, name: str, file_format: str) -> str:
+    """A new file in `directory` named after `name` (sanitized) and a timestamp, never an existing file."""
+    os.makedirs(directory, exist_ok=True)
+    stem = _UNSAFE.sub("_", os.path.splitext(os.path.basename(name))[0]).strip("._") or "export"
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    path = os.path.join(directory, f"{stem}_{stamp}.{file_format}")
+    suffix = 1
+    while os.path.exists(path):
+        suffix += 1
+        path = os.path.join(directory, f"{stem}_{stamp}_{suffix}.{file_format}")
+    return path
+
+
+def prune_exports(directory: str, max_age_seconds: float, max_bytes: int, keep: str | None = None) -> int:
+    """
+    Delete exports in `directory` older than `max_age_seconds`, then the oldest ones while they add up
+    to more than `max_bytes`. Only files with an export format's extension are touched, and never `keep`.
+    Returns how many were deleted.
+    """
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return 0
+    files = []
+    for name in names:
+        path = os.path.join(directory, name)
+        if os.path.splitext(name)[1].lstrip(".") not in EXPORT_FORMATS or path == keep:
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    files.sort()
+    total = sum(size for _, size, _ in files) + (os.path.getsize(keep) if keep and os.path.exists(keep) else 0)
+    now = time.time()
+    deleted = 0
+    for mtime, size, path in files:
+        if now - mtime <= max_age_seconds and total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        deleted += 1
+    return deleted
+
+
+def iter_batches(cursor: Any, batch_size: int) -> Iterator[Result]:
+    """Fetch a cursor's rows `batch_size` at a time; only one batch is held at once."""
+    while True:
+        with phase("fetch"):
+            batch = fetch_result(cursor, batch_size)
+        if batch.num_rows:
+            add_rows(batch.num_rows)
+            yield batch
+        if batch.num_rows < batch_size:
+            return
+
+
+def _excel_value(value: Any) -> Any:
+    if isinstance(value, datetime.datetime) and value.tzinfo is not None:
+        # Excel has no time zones: write the UTC wall time
+        return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    if value is None or isinstance(value, (str, int, float, bool, decimal.Decimal, datetime.date, datetime.time)):
+        return value
+    return str(value)
+
+
+class ExportWriter:
+    """
+    Writes result batches to one file as they arrive. Arrow batches go through pyarrow's incremental
+    CSV / Parquet writers, cast to the first batch's schema; XLSX uses openpyxl's write-only mode,
+    which streams rows to disk instead of building the sheet in memory.
+    """
+
+    def __init__(self, path: str, file_format: str):
+        if file_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format {file_format!r}; use one of {', '.join(EXPORT_FORMATS)}")
+        if file_format == "parquet" and pa is None:
+            raise ValueError("Parquet export needs pyarrow; use csv or xlsx.")
+        self.path = path
+        self.file_format = file_format
+        self.rows = 0
+        self.truncated = False
+        self.columns: list[str] | None = None
+        self._writer = None
+        self._schema = None
+        self._file = None
+        self._workbook = None
+        self._sheet = None
+
+    def _open(self, batch: Result):
+        self.columns = batch.columns
+        if self.file_format == "xlsx":
+            from openpyxl import Workbook
+
+            self._workbook = Workbook(write_only=True)
+            self._sheet = self._workbook.create_sheet("export")
+            self._sheet.append(batch.columns)
+        elif batch.table is not None:
+            self._schema = batch.table.schema
+            if self.file_format == "parquet":
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            else:
+                self._writer = pa_csv.CSVWriter(self.path, self._schema)
+        else:
+            self._file = open(self.path, "w", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(batch.columns)
+
+    def write(self, batch: Result):
+        if self.columns is None:
+            self._open(batch)
+        if self.file_format == "xlsx":
+            room = XLSX_MAX_ROWS - 1 - self.rows
+            rows = batch.slice(0, room).to_rows() if batch.num_rows > room else batch.to_rows()
+            self.truncated = self.truncated or batch.num_rows > room
+            for row in rows:
+                self._sheet.append([_excel_value(v) for v in row])
+            self.rows += len(rows)
+            return
+        if self._schema is not None:
+            table = batch.table
+            if table.schema != self._schema:
+                table = table.rename_columns(self._schema.names).cast(self._schema)
+            self._writer.write_table(table)
+        else:
+            self._writer.writerows(batch.to_rows())
+        self.rows += batch.num_rows
+
+    def close(self, columns: list[str] | None = None):
+        """Finish the file. `columns` names the header when no batch arrived (an empty result)."""
+        if self.columns is None:
+            self._open(Result(columns or [], rows=[]))
+        if self._workbook is not None:
+            self._workbook.save(self.path)
+        elif self._file is not None:
+            self._file.close()
+        elif self._writer is not None:
+            self._writer.close()
+
+    def abort(self):
+        try:
+            if self._file is not None:
+                self._file.close()
+            elif self._writer is not None and self._workbook is None:
+                self._writer.close()
+        except Exception:
+            pass
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def export_cursor(cursor: Any, path: str, file_format: str, batch_size: int = 10_000, preview_rows: int = 5) -> dict[str, Any]:
+    """Stream an executed cursor's rows into `path`. Returns the row count, columns and the first rows."""
+    writer = ExportWriter(path, file_format)
+    preview = None
+    try:
+        for batch in iter_batches(cursor, batch_size):
+            if preview is None:
+                preview = batch.slice(0, preview_rows)
+            with phase("format"):
+                writer.write(batch)
+            if writer.truncated:
+                break
+        with phase("format"):
+            writer.close([d[0] for d in cursor.description or []])
+    except BaseException:
+        writer.abort()
+        raise
+    return {
+        "path": os.path.abspath(path),
+        "format": file_format,
+        "rows": writer.rows,
+        "columns": writer.columns,
+        "bytes": os.path.getsize(path),
+        "truncated": writer.truncated,
+        "preview": preview if preview is not None else Result(writer.columns or [], rows=[]),
+    }
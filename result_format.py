@@ -0,0 +1,166 @@
+# result_format.py
+import csv
+import io
+import json
+import sys
+from typing import Any
+
+from lazy_imports import lazy_module
+
+# pyarrow is optional: fall back to per-row formatting
+pa = lazy_module("pyarrow", optional=True)
+pc = lazy_module("pyarrow.compute", optional=True)
+pa_csv = lazy_module("pyarrow.csv", optional=True)
+
+# Output formats accepted by the query tools. "rows" is the original Row(...) repr per line.
+OUTPUT_FORMATS = ("csv", "tsv", "json", "markdown", "rows")
+
+
+def _unique_names(names: list[str]) -> list[str]:
+    """Suffix duplicate column names (e.g. item_id from both sides of a join) so every column is addressable."""
+    seen: dict[str, int] = {}
+    unique = []
+    for name in names:
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        unique.append(name if count == 0 else f"{name}_{count + 1}")
+    return unique
+
+
+class Result:
+    """
+    A fetched result: an Arrow table when the connector and pyarrow support it,
+    otherwise column names plus a list of row tuples.
+    """
+
+    __slots__ = ("table", "columns", "rows")
+
+    def __init__(self, columns: list[str], rows: list[Any] | None = None, table: Any = None):
+        self.columns = _unique_names(columns)
+        self.rows = rows
+        self.table = table
+
+    @classmethod
+    def from_arrow(cls, table: Any) -> "Result":
+        names = _unique_names(table.column_names)
+        if names != table.column_names:
+            table = table.rename_columns(names)
+        return cls(names, table=table)
+
+    @property
+    def num_rows(self) -> int:
+        return self.table.num_rows if self.table is not None else len(self.rows)
+
+    @property
+    def nbytes(self) -> int:
+        if self.table is not None:
+            return self.table.nbytes
+        return sys.getsizeof(self.rows) + sum(
+            sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row) for row in self.rows
+        )
+
+    def to_rows(self) -> list[tuple]:
+        if self.table is None:
+            return [tuple(row) for row in self.rows]
+        return list(zip(*(column.to_pylist() for column in self.table.columns)))
+
+    def to_columns(self) -> dict[str, list[Any]]:
+        if self.table is not None:
+            return {name: column.to_pylist() for name, column in zip(self.columns, self.table.columns)}
+        return {name: [row[i] for row in self.rows] for i, name in enumerate(self.columns)}
+
+    def slice(self, offset: int, length: int) -> "Result":
+        """Rows `offset` to `offset + length`, without copying when the result is an Arrow table."""
+        if self.table is not None:
+            return Result(self.columns, table=self.table.slice(offset, length))
+        return Result(self.columns, rows=self.rows[offset:offset + length])
+
+    def format(self, output_format: str = "csv") -> str:
+        return format_result(self, output_format)
+
+
+def fetch_result(cursor: Any, size: int | None = None) -> Result:
+    """Fetch all remaining rows (or the next `size` rows) from a cursor, as Arrow batches when possible."""
+    if pa is not None and hasattr(cursor, "fetchall_arrow"):
+        table = cursor.fetchall_arrow() if size is None else cursor.fetchmany_arrow(size)
+        return Result.from_arrow(table)
+    rows = cursor.fetchall() if size is None else cursor.fetchmany(size)
+    return Result([d[0] for d in cursor.description or []], rows=rows)
+
+
+def _arrow_delimited(table: Any, delimiter: str) -> str:
+    # Unquoted output is the most compact; Arrow refuses it if a value contains the delimiter or a quote
+    header = io.StringIO()
+    csv.writer(header, delimiter=delimiter, lineterminator="\n").writerow(table.column_names)
+    for quoting_style in ("none", "needed"):
+        buffer = io.BytesIO()
+        try:
+            pa_csv.write_csv(table, buffer, pa_csv.WriteOptions(
+                include_header=False, delimiter=delimiter, quoting_style=quoting_style,
+            ))
+        except pa.ArrowInvalid:
+            if quoting_style == "needed":
+                raise
+            continue
+        return (header.getvalue() + buffer.getvalue().decode("utf-8")).rstrip("\n")
+
+
+def _python_delimited(result: Result, delimiter: str) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter, lineterminator="\n")
+    writer.writerow(result.columns)
+    writer.writerows(result.to_rows())
+    return buffer.getvalue().rstrip("\n")
+
+
+def _string_columns(result: Result) -> list[list[str]]:
+    """Every column cast to display strings, vectorized through Arrow when available."""
+    if result.table is not None:
+        columns = []
+        for column in result.table.columns:
+            try:
+                as_text = pc.fill_null(pc.cast(column, pa.string()), "")
+                columns.append(as_text.to_pylist())
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                columns.append(["" if v is None else str(v) for v in column.to_pylist()])
+        return columns
+    return [["" if row[i] is None else str(row[i]) for row in result.rows] for i in range(len(result.columns))]
+
+
+def _markdown(result: Result) -> str:
+    def cell(text: str) -> str:
+        return text.replace("|", "\\|").replace("\n", " ")
+
+    lines = [
+        "| " + " | ".join(cell(c) for c in result.columns) + " |",
+        "|" + "|".join("---" for _ in result.columns) + "|",
+    ]
+    lines.extend("| " + " | ".join(cell(v) for v in values) + " |" for values in zip(*_string_columns(result)))
+    return "\n".join(lines)
+
+
+def _rows_repr(result: Result) -> str:
+    names = result.columns
+    return "\n".join(
+        "Row(" + ", ".join(f"{name}={value!r}" for name, value in zip(names, row)) + ")"
+        for row in result.to_rows()
+    )
+
+
+def format_result(result: Result, output_format: str = "csv") -> str:
+    """Render a result as csv, tsv, column-oriented json, markdown, or the original Row(...) lines."""
+    if output_format in ("csv", "tsv"):
+        delimiter = "," if output_format == "csv" else "\t"
+        if result.table is not None:
+            try:
+                return _arrow_delimited(result.table, delimiter)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+                pass  # nested types: format per row below
+        return _python_delimited(result, delimiter)
+    if output_format == "json":
+        return json.dumps(result.to_columns(), default=str, separators=(",", ":"))
+    if output_format == "markdown":
+        return _markdown(result)
+    if output_format == "rows":
+        return _rows_repr(result)
+    raise ValueError(f"Unknown output_format {output_format!r}. Use one of: {', '.join(OUTPUT_FORMATS)}")
@@ -0,0 +1,179 @@
+# result_pages.py
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+
+from metrics import add_rows, phase
+from result_format import Result, fetch_result
+
+
+class PagedResult:
+    """A server-side cursor kept open between pages on its own warehouse session, for one client session."""
+
+    def __init__(self, connection: Any, cursor: Any, page_size: int, limit: int | None, session_id: str = "default"):
+        self.session_id = session_id
+        self.connection = connection
+        self.cursor = cursor
+        self.page_size = page_size
+        self.remaining = limit
+        self.rows_returned = 0
+        self.last_used = time.monotonic()
+        self.closed = False
+        # Held while fetching and closing, so a result is never closed under an in-flight fetch
+        self.lock = threading.Lock()
+
+    def fetch(self, page_size: int | None = None) -> tuple[Result, bool]:
+        """Fetch the next page. Returns the rows and whether more rows may follow."""
+        size = page_size or self.page_size
+        if self.remaining is not None:
+            size = min(size, self.remaining)
+        with phase("fetch"):
+            page = fetch_result(self.cursor, max(size, 0))
+        add_rows(page.num_rows)
+        self.rows_returned += page.num_rows
+        if self.remaining is not None:
+            self.remaining -= page.num_rows
+        self.last_used = time.monotonic()
+        exhausted = page.num_rows < size or self.remaining == 0
+        return page, not exhausted
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            for resource in (self.cursor, self.connection):
+                try:
+                    resource.close()
+                except Exception:
+                    pass
+
+
+class ResultPager:
+    """
+    Registry of open paginated results keyed by opaque continuation tokens. A token only pages for
+    the client session that opened it. Each session holds at most `max_open` results, and opening
+    another closes that session's least recently used one; `max_total` bounds the warehouse sessions
+    held across all clients, past which the least recently used result overall is closed.
+    Results idle for `idle_seconds` are closed by the reaper and their tokens expire. Pages are at
+    most `max_page_size` rows, whatever size the caller asks for.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        idle_seconds: float = 300,
+        max_open: int = 4,
+        max_total: int = 32,
+        max_page_size: int = 10000,
+    ):
+        self.connect = connect
+        self.idle_seconds = idle_seconds
+        self.max_open = max_open
+        self.max_total = max_total
+        self.max_page_size = max_page_size
+        self._results: OrderedDict[str, PagedResult] = OrderedDict()
+        self._lock = threading.Lock()
+        self._reaper: threading.Thread | None = None
+        self.stats = {"opened": 0, "pages": 0, "expired": 0, "evicted": 0}
+
+    def open(
+        self, query: str, page_size: int, limit: int | None = None, session_id: str = "default",
+    ) -> tuple[Result, str | None]:
+        """Execute `query` on a dedicated session and return its first page and a continuation token."""
+        page_size = min(page_size, self.max_page_size)
+        connection = self.connect()
+        cursor = None
+        try:
+            cursor = connection.cursor()
+            with phase("execute"):
+                cursor.execute(query)
+            result = PagedResult(connection, cursor, page_size, limit, session_id)
+            rows, more = result.fetch()
+        except Exception:
+            PagedResult(connection, cursor, page_size, limit).close()
+            raise
+        if not more:
+            result.close()
+            return rows, None
+
+        token = secrets.token_urlsafe(16)
+        evicted = []
+        with self._lock:
+            self.stats["opened"] += 1
+            self._results[token] = result
+            own = [t for t, r in self._results.items() if r.session_id == session_id]
+            for old_token in own[:max(len(own) - self.max_open, 0)]:
+                evicted.append(self._results.pop(old_token))
+            while len(self._results) > self.max_total:
+                evicted.append(self._results.popitem(last=False)[1])
+            self.stats["evicted"] += len(evicted)
+        for old in evicted:
+            old.close()
+        return rows, token
+
+    def next_page(self, token: str, page_size: int | None = None, session_id: str = "default") -> tuple[Result, str | None]:
+        """
+        Fetch the page after `token`. Raises KeyError if the token is unknown, expired or was opened
+        by another session.
+        """
+        with self._lock:
+            result = self._results.get(token)
+            if result is None or result.session_id != session_id:
+                raise KeyError(token)
+            self._results.move_to_end(token)
+        if page_size:
+            page_size = min(page_size, self.max_page_size)
+        with result.lock:
+            if result.closed:
+                # Evicted or expired since the lookup
+                raise KeyError(token)
+            rows, more = result.fetch(page_size)
+        with self._lock:
+            self.stats["pages"] += 1
+            if not more:
+                self._results.pop(token, None)
+        if not more:
+            result.close()
+            return rows, None
+        return rows, token
+
+    def close(self, token: str) -> bool:
+        with self._lock:
+            result = self._results.pop(token, None)
+        if result is None:
+            return False
+        result.close()
+        return True
+
+    def evict_idle(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            doomed = [token for token, r in self._results.items() if now - r.last_used > self.idle_seconds]
+            expired = [self._results.pop(token) for token in doomed]
+            self.stats["expired"] += len(expired)
+        for result in expired:
+            result.close()
+        return len(expired)
+
+    def start_reaper(self, interval_seconds: float = 30):
+        def run():
+            while True:
+                time.sleep(interval_seconds)
+                self.evict_idle()
+
+        if self._reaper is None:
+            self._reaper = threading.Thread(target=run, name="result-pager-reaper", daemon=True)
+            self._reaper.start()
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return self.stats | {
+                "open": len(self._results),
+                "sessions": len({r.session_id for r in self._results.values()}),
+                "max_open": self.max_open,
+                "max_total": self.max_total,
+                "max_page_size": self.max_page_size,
+            }
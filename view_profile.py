@@ -0,0 +1,102 @@
+# view_profile.py
+import datetime
+import decimal
+import json
+import re
+from typing import Any
+
+# Types profiled with COUNT only: approx_count_distinct, MIN/MAX and approx_top_k reject them
+COMPLEX_TYPES = ("ARRAY", "MAP", "STRUCT", "VARIANT", "BINARY", "INTERVAL")
+# Continuous types whose most frequent values say little; they get no top-k
+FLOAT_TYPES = ("FLOAT", "DOUBLE", "REAL")
+
+_IDENTIFIER = re.compile(r"^\w+$")
+
+
+def _kind(data_type: str | None) -> str:
+    data_type = str(data_type or "").upper()
+    if data_type.startswith(COMPLEX_TYPES):
+        return "complex"
+    if data_type.startswith(FLOAT_TYPES):
+        return "float"
+    return "scalar"
+
+
+def _quote(column: str) -> str:
+    return "`" + column.replace("`", "``") + "`"
+
+
+def build_profile_query(view: str, columns: list[tuple[str, str | None]], top_k: int = 5) -> str:
+    """
+    One aggregate SELECT over `main.prod_gold.{view}` profiling every (column, data_type) pair:
+    the row count once, then per column its non-null count, approx_count_distinct, MIN / MAX and
+    approx_top_k, each output aliased by the column's position so any column name is safe.
+    """
+    if not _IDENTIFIER.match(view):
+        raise ValueError(f"Invalid view name: {view!r}")
+    selects = ["COUNT(*) AS row_count"]
+    for i, (column, data_type) in enumerate(columns):
+        quoted, kind = _quote(column), _kind(data_type)
+        selects.append(f"COUNT({quoted}) AS n{i}")
+        if kind == "complex":
+            continue
+        selects += [
+            f"APPROX_COUNT_DISTINCT({quoted}) AS d{i}",
+            f"MIN({quoted}) AS lo{i}",
+            f"MAX({quoted}) AS hi{i}",
+        ]
+        if kind != "float" and top_k > 0:
+            selects.append(f"APPROX_TOP_K({quoted}, {int(top_k)}) AS top{i}")
+    return f"SELECT {', '.join(selects)} FROM main.prod_gold.{view}"
+
+
+def _plain(value: Any) -> Any:
+    """A JSON-friendly copy of a warehouse value."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+def _top_values(value: Any) -> list[dict[str, Any]]:
+    """
+    approx_top_k's ARRAY<STRUCT<item, count>>, as the connector hands it over: a list (or array) of
+    dicts, Rows or (item, count) pairs, or a JSON string.
+    """
+    if value is None:
+        return []
+    if isinstance(value, (str, bytes)):
+        value = json.loads(value)
+    top = []
+    for entry in value:
+        if isinstance(entry, dict):
+            item, count = entry.get("item"), entry.get("count")
+        elif hasattr(entry, "asDict"):
+            item, count = entry.asDict().get("item"), entry.asDict().get("count")
+        else:
+            item, count = entry[0], entry[1]
+        top.append({"value": _plain(item), "count": int(count)})
+    return top
+
+
+def parse_profile(row: dict[str, Any], columns: list[tuple[str, str | None]]) -> tuple[int, dict[str, dict[str, Any]]]:
+    """Split the single row of a `build_profile_query` result into the row count and per-column profiles."""
+    row_count = int(row["row_count"] or 0)
+    profiles = {}
+    for i, (column, data_type) in enumerate(columns):
+        non_null = int(row[f"n{i}"] or 0)
+        profile: dict[str, Any] = {
+            "data_type": data_type,
+            "null_fraction": round(1 - non_null / row_count, 4) if row_count else None,
+        }
+        if f"d{i}" in row:
+            profile["approx_distinct"] = int(row[f"d{i}"] or 0)
+            profile["min"] = _plain(row[f"lo{i}"])
+            profile["max"] = _plain(row[f"hi{i}"])
+        if f"top{i}" in row:
+            profile["top_values"] = _top_values(row[f"top{i}"])
+        profiles[column] = profile
+    return row_count, profiles
@@ -0,0 +1,170 @@
+# warehouse_executor.py
+import asyncio
+import contextvars
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator
+
+from admission import PRIORITY_QUERY, AdmissionController
+
+# The event loop and admission controller of the executor call running in this context
+_admission_scope: contextvars.ContextVar[tuple[asyncio.AbstractEventLoop, AdmissionController] | None] = (
+    contextvars.ContextVar("admission_scope", default=None)
+)
+
+
+class WarehouseExecutor:
+    """
+    Runs blocking warehouse work off the event loop.
+    Calls go to a bounded thread pool, are limited to `max_concurrency` in flight per warehouse
+    (admitted by priority, with at most `max_queue` waiting before callers get Overloaded),
+    and are abandoned with a TimeoutError after `timeout` seconds. An abandoned call keeps its
+    admission slot until its thread finishes, so timeouts never let more work reach the warehouse.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 16,
+        max_concurrency: int = 8,
+        timeout: float | None = 120,
+        limits: dict[str, int] | None = None,
+        max_queue: int = 64,
+    ):
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.limits = limits or {}
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="warehouse")
+        self.admission: dict[str, AdmissionController] = {}
+        # The event loop admission runs on, once a tool call has come through `run`
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.stats = {"calls": 0, "timeouts": 0, "in_flight": 0, "waiting": 0}
+
+    def _admission(self, warehouse: str) -> AdmissionController:
+        if warehouse not in self.admission:
+            self.admission[warehouse] = AdmissionController(self.limits.get(warehouse, self.max_concurrency), self.max_queue)
+        return self.admission[warehouse]
+
+    async def run(
+        self,
+        func: Callable[..., Any],
+        *args,
+        warehouse: str = "default",
+        timeout: float | None = None,
+        priority: int = PRIORITY_QUERY,
+        admit: bool = True,
+        **kwargs,
+    ) -> Any:
+        """
+        Run `func(*args, **kwargs)` on the pool, keeping the caller's context variables.
+        Lower `priority` values are admitted first when the warehouse is at its limit. With `admit`
+        false the call skips admission, for bookkeeping that never reaches the warehouse.
+        """
+        loop = self._loop = asyncio.get_running_loop()
+        admission = self._admission(warehouse)
+        token = _admission_scope.set((loop, admission))
+        try:
+            call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+        finally:
+            _admission_scope.reset(token)
+        if admit:
+            self.stats["waiting"] += 1
+            try:
+                await admission.acquire(priority)
+            finally:
+                self.stats["waiting"] -= 1
+        self.stats["calls"] += 1
+        self.stats["in_flight"] += 1
+        started = time.perf_counter()
+
+        def release():
+            self.stats["in_flight"] -= 1
+            if admit:
+                admission.release(time.perf_counter() - started)
+
+        def finished(_):
+            # Runs on the worker thread; admission lives on the event loop
+            try:
+                loop.call_soon_threadsafe(release)
+            except RuntimeError:  # the loop has closed
+                pass
+
+        try:
+            future = self._executor.submit(call)
+        except BaseException:
+            release()
+            raise
+        future.add_done_callback(finished)
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future, loop=loop), timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise TimeoutError(f"Warehouse call timed out after {timeout:.0f}s") from None
+
+    @contextmanager
+    def slot(self, warehouse: str = "default", priority: int = PRIORITY_QUERY) -> Iterator[None]:
+        """
+        Hold an admission slot on `warehouse` from a thread outside the event loop (background query
+        jobs), waiting in the same queue as tool calls; Overloaded if it is full. Before any call has
+        come through `run` there is no event loop to admit on (e.g. tools called directly from Python).
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            yield
+            return
+
+        async def acquire() -> AdmissionController:
+            admission = self._admission(warehouse)
+            self.stats["waiting"] += 1
+            try:
+                await admission.acquire(priority)
+            finally:
+                self.stats["waiting"] -= 1
+            self.stats["calls"] += 1
+            self.stats["in_flight"] += 1
+            return admission
+
+        admission = asyncio.run_coroutine_threadsafe(acquire(), loop).result()
+        started = time.perf_counter()
+
+        def release():
+            self.stats["in_flight"] -= 1
+            admission.release(time.perf_counter() - started)
+
+        try:
+            yield
+        finally:
+            try:
+                loop.call_soon_threadsafe(release)
+            except RuntimeError:  # the loop has closed
+                pass
+
+    @contextmanager
+    def extra_slots(self, wanted: int) -> Iterator[int]:
+        """
+        From inside a call on this executor, reserve up to `wanted` more admission slots for work it fans
+        out to other threads (run_query_batch). Only capacity free right now is taken, so this never waits
+        and never jumps the queue. Yields the number reserved; they are released on exit. Outside an
+        executor call (e.g. a tool called directly from Python) nothing is admitted and `wanted` is granted.
+        """
+        scope = _admission_scope.get()
+        if scope is None or wanted <= 0:
+            yield max(wanted, 0)
+            return
+        loop, admission = scope
+
+        async def reserve() -> int:
+            return admission.try_acquire(wanted)
+
+        granted = asyncio.run_coroutine_threadsafe(reserve(), loop).result()
+        try:
+            yield granted
+        finally:
+            for _ in range(granted):
+                loop.call_soon_threadsafe(admission.release)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)